@@ -1,8 +1,13 @@
+import os
+import logging
 from fastapi import APIRouter, HTTPException, Depends
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.schemas.payload import (
     StructuredSchemaRequest, SQLResponse, IndexSuggestionRequest, IndexSuggestionResponse,
+    WorkloadIndexResponse, TableDef, RelationshipDef,
+    SchemaRegisterRequest, SchemaRegisterResponse,
     SMLImportRequest, SMLImportResponse, SMLExportRequest, SMLExportResponse
 )
 from app.schemas.project import ProjectCreate, ProjectResponse, ProjectDetailResponse, ProjectUpdate
@@ -13,23 +18,30 @@ from app.models.history import QueryHistory
 from app.core.database import get_db
 from app.core.auth import get_current_user, get_optional_current_user
 from app.core.semantic_cache import get_semantic_cache
-from app.models.cache import SemanticQueryCache
-from app.core.cache_config import is_cache_enabled, get_similarity_threshold
-from app.services.model_service import model_service
+from app.core.lexical_index import get_lexical_index
+from app.core.cache_eviction import get_cache_evictor
+from app.core.hit_stats import get_hit_stats
+from app.core.single_flight import get_generation_flight, get_async_generation_flight
+from app.services import query_pipeline
 from app.services.index_advisor import index_advisor
-from app.core.security import validate_sql
-from app.core.schema_validator import (
-    validate_schema,
-    format_schema_for_model,
-    SchemaValidationError
-)
+from app.services.llm_provider import get_llm_provider
+from app.services.workload_advisor import get_workload_advisor
+from app.core.schema_validator import SchemaValidationError
+from app.core.schema_registry import get_schema_registry, SchemaNotFoundError
+from app.core.security import validation_cache
+from app.core.logging_config import get_logging_state
 from app.core.sml_parser import parse_sml, SMLParseError, SMLValidationError
 from app.core.sml_generator import generate_sml_with_metadata
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+# Set ASYNC_GENERATE=false to fall back to the synchronous /generate pipeline
+ASYNC_GENERATE = os.getenv("ASYNC_GENERATE", "true").lower() not in ("0", "false", "no")
+
 @router.post("/generate", response_model=SQLResponse)
-def generate_query(
+async def generate_query(
     request: StructuredSchemaRequest,
     db: Session = Depends(get_db),
     current_user: Optional[User] = Depends(get_optional_current_user)
@@ -37,6 +49,10 @@ def generate_query(
     """
     Generate SQL from natural language question with structured schema.
     
+    Runs the async pipeline (non-blocking LLM call and embedding) unless
+    ASYNC_GENERATE=false, in which case the synchronous pipeline runs in
+    the threadpool as before.
+    
     Args:
         request: Contains question, tables, and relationships
         db: Database session
@@ -45,163 +61,78 @@ def generate_query(
     Returns:
         SQLResponse with generated SQL and validation status
     """
-    print(f"\n{'='*20} RECEIVED REQUEST {'='*20}")
-    print(f"Question: {request.question}")
-    print(f"Dialect: {request.database_type}")
-    print(f"Tables: {[t.name for t in request.tables]}")
-    print(f"Relationships: {len(request.relationships)} defined")
-    
     try:
-        # Validate inputs
-        if not request.question.strip():
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
-        
-        if not request.tables:
-            raise HTTPException(status_code=400, detail="Tables definition cannot be empty")
-        
-        # Validate schema
-        try:
-            # Pydantic models are already parsed, just validate semantics
-            is_valid, error_msg = validate_schema(request.tables, request.relationships)
-            if not is_valid:
-                raise HTTPException(status_code=400, detail=f"Schema validation error: {error_msg}")
-            
-            # Format schema for model
-            formatted_schema = format_schema_for_model(request.tables, request.relationships)
-            
-        except SchemaValidationError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-        
-        # --- Semantic Cache Logic ---
-        cache_hit = None
-        best_similarity = 0.0
-        question_embedding = None
-        schema_hash = None
-        from_cache = False
-        cache_similarity = 0.0
-        original_question = None
-        
-        # --- Semantic Cache & Schema Fingerprinting ---
-        sem_cache = get_semantic_cache()
-        schema_hash = sem_cache.generate_schema_hash(request.tables, request.relationships, request.database_type)
-        print(f"DEBUG: Schema Hash: {schema_hash}")
-        
-        if is_cache_enabled():
-            question_embedding = sem_cache.generate_embedding(request.question)
-            
-            print(f"DEBUG: Dialect: {request.database_type}")
-            
-            # Fetch candidates from database for this schema
-            candidates = db.query(SemanticQueryCache).filter(
-                SemanticQueryCache.schema_hash == schema_hash,
-                SemanticQueryCache.database_type == request.database_type
-            ).all()
-            
-            print(f"DEBUG: Found {len(candidates)} candidates in cache")
-            
-            if candidates:
-                raw_type = type(candidates[0].question_embedding)
-                print(f"DEBUG: Raw DB Embedding Type: {raw_type}")
-                print(f"DEBUG: Raw DB Embedding Preview: {str(candidates[0].question_embedding)[:50]}")
-            
-            # Convert candidates to the format expected by find_similar_query
-            candidate_dicts = [
-                {
-                    "id": c.id,
-                    "question": c.question,
-                    "question_embedding": c.question_embedding,
-                    "schema_hash": c.schema_hash,
-                    "sql_generated": c.sql_generated,
-                    "db_obj": c
-                } for c in candidates
-            ]
-            
-            result_tuple = sem_cache.find_similar_query(
-                request.question,
-                question_embedding,
-                schema_hash,
-                candidate_dicts
-            )
-            
-            if result_tuple and isinstance(result_tuple, tuple) and len(result_tuple) == 2:
-                 match_result, similarity = result_tuple
-            else:
-                 print(f"DEBUG: find_similar_query returned unexpected value: {result_tuple}")
-                 match_result, similarity = None, 0.0
-            
-            # Capture for debug printing
-            best_similarity = similarity
-            
-            if match_result:
-                cache_hit = match_result["db_obj"]
-                
-                # Update hit stats
-                cache_hit.hit_count += 1
-                from datetime import datetime
-                cache_hit.last_hit_at = datetime.now()
-                db.commit()
-                
-                print(f"CACHE HIT: Found similar question '{cache_hit.question}' with {best_similarity:.2f} similarity")
-                
-                sql = cache_hit.sql_generated
-                from_cache = True
-                cache_similarity = best_similarity
-                original_question = cache_hit.question
-                
-                # Validate the cached SQL (just to be safe)
-                is_valid, message = validate_sql(sql, dialect=request.database_type)
-            
-            if not from_cache:
-                print(f"CACHE MISS: Best similarity was {best_similarity:.4f} (Threshold: {get_similarity_threshold()})")
-        # --- End Cache Logic ---
-
-        # Generate SQL using the model if not from cache
-        if not from_cache:
-            sql = model_service.generate_sql(formatted_schema, request.question, database_type=request.database_type)
-            
-            # Validate the generated SQL
-            is_valid, message = validate_sql(sql, dialect=request.database_type)
-            
-            # Store in semantic cache if result is valid
-            if is_cache_enabled() and is_valid and question_embedding is not None and schema_hash is not None:
-                new_cache_entry = SemanticQueryCache(
-                    question=request.question,
-                    question_embedding=question_embedding,
-                    schema_hash=schema_hash,
-                    sql_generated=sql,
-                    database_type=request.database_type,
-                    user_id=current_user.id if current_user else None
-                )
-                db.add(new_cache_entry)
-                db.commit()
-                print("CACHE MISS: New query stored in semantic cache")
-        
-        # Log to history if user is logged in (regardless of cache status)
-        if current_user:
-            history_entry = QueryHistory(
-                user_id=current_user.id,
-                question=request.question,
-                sql_generated=sql,
-                database_type=request.database_type,
-                project_id=request.project_id,
-                schema_hash=schema_hash
-            )
-            db.add(history_entry)
-            db.commit()
-        
-        return SQLResponse(
-            sql=sql, 
-            is_valid=is_valid, 
-            message=message,
-            from_cache=from_cache,
-            cache_similarity=cache_similarity,
-            original_question=original_question
-        )
+        if ASYNC_GENERATE:
+            return await query_pipeline.run_async(request, db, current_user)
+        return await run_in_threadpool(query_pipeline.run_sync, request, db, current_user)
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SchemaNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except HTTPException:
         raise
+    except Exception as e:
+        logger.exception("SQL generation failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/schemas", response_model=SchemaRegisterResponse)
+def register_schema(
+    request: SchemaRegisterRequest,
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_current_user)
+):
+    """
+    Register a schema and get its hash.
+    
+    Send the returned schema_hash (instead of tables/relationships) with
+    /generate requests to skip per-request schema parsing and validation.
+    Registering the same schema again returns the same hash. Registrations
+    are immutable: a schema with the same names and types but other
+    constraints gets the first registration's stored definition back.
+    """
+    try:
+        parsed = get_schema_registry().register(
+            db,
+            request.tables,
+            request.relationships,
+            request.database_type,
+            user_id=current_user.id if current_user else None
+        )
+        return SchemaRegisterResponse(
+            schema_hash=parsed.schema_hash,
+            database_type=parsed.database_type,
+            table_count=len(parsed.tables),
+            relationship_count=len(parsed.relationships),
+            message=f"Registered schema with {len(parsed.tables)} tables and {len(parsed.relationships)} relationships"
+        )
+    except SchemaValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/cache/stats")
+def get_cache_stats():
+    """
+    Get semantic cache hit/miss counters for this worker.
+
+    Exact fingerprint hits are reported separately from semantic (embedding) hits.
+    """
+    sem_cache = get_semantic_cache()
+    stats = sem_cache.statistics.snapshot()
+    stats["embedding_model"] = sem_cache.model_status()
+    stats["lexical_index"] = get_lexical_index().snapshot()
+    if sem_cache.batcher is not None:
+        stats["embedding_batcher"] = sem_cache.batcher.snapshot()
+    stats["hit_stats"] = get_hit_stats().snapshot()
+    stats["generation_single_flight"] = get_generation_flight().snapshot()
+    stats["async_generation_single_flight"] = get_async_generation_flight().snapshot()
+    stats["schema_registry"] = get_schema_registry().snapshot()
+    stats["sql_validation_cache"] = validation_cache.snapshot()
+    stats["last_eviction"] = get_cache_evictor().last_run
+    stats["logging"] = get_logging_state().snapshot()
+    stats["llm_provider"] = get_llm_provider().snapshot()
+    return stats
+
 @router.post("/suggest-indexes", response_model=IndexSuggestionResponse)
 def suggest_indexes(request: IndexSuggestionRequest):
     """
@@ -212,12 +143,67 @@ def suggest_indexes(request: IndexSuggestionRequest):
         response = index_advisor.suggest_indexes(
             sql=request.sql,
             tables=request.tables,
-            database_type=request.database_type
+            database_type=request.database_type,
+            use_llm=request.use_llm
         )
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/indexes/workload", response_model=WorkloadIndexResponse)
+def recommend_workload_indexes(
+    project_id: Optional[int] = None,
+    schema_hash: Optional[str] = None,
+    limit: int = 10,
+    min_queries: int = 1,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Recommend indexes for the query history of a project or registered schema.
+    
+    Only history rows added since the previous call are parsed.
+    """
+    if project_id is None and schema_hash is None:
+        raise HTTPException(status_code=400, detail="Provide project_id or schema_hash")
+
+    try:
+        if project_id is not None:
+            project = db.query(Project).filter(
+                Project.id == project_id,
+                Project.user_id == current_user.id
+            ).first()
+            if not project:
+                raise HTTPException(status_code=404, detail="Project not found")
+            state = project.state or {}
+            tables = [TableDef(**t) for t in state.get("tables", [])]
+            relationships = [RelationshipDef(**r) for r in state.get("relationships", [])]
+            database_type = state.get("databaseType") or "MySQL"
+        else:
+            parsed = get_schema_registry().resolve(db, schema_hash)
+            tables, relationships, database_type = parsed.tables, parsed.relationships, parsed.database_type
+
+        advisor = get_workload_advisor()
+        workload, new_rows = advisor.sync(
+            db, current_user.id, tables, relationships, database_type,
+            project_id=project_id, schema_hash=schema_hash
+        )
+        result = advisor.recommend(workload, limit=limit, min_queries=min_queries)
+        return WorkloadIndexResponse(
+            new_queries_parsed=new_rows,
+            summary=(
+                f"{len(result['recommendations'])} index(es) cover {result['covered_queries']} of "
+                f"{result['analyzed_queries'] - result['unparsed_queries']} parsed queries"
+            ),
+            **result
+        )
+    except SchemaNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # SML Import/Export Endpoints
 
 @router.post("/schema/import", response_model=SMLImportResponse)
@@ -316,7 +302,7 @@ def list_projects(
         from sqlalchemy import func
         return db.query(Project).filter(Project.user_id == current_user.id).order_by(func.coalesce(Project.updated_at, Project.created_at).desc()).all()
     except Exception as e:
-        print(f"ERROR: list_projects failed: {str(e)}")
+        logger.exception("list_projects failed")
         raise HTTPException(status_code=500, detail=f"Failed to list projects: {str(e)}")
 
 @router.get("/projects/{project_id}", response_model=ProjectDetailResponse)
@@ -337,7 +323,7 @@ def get_project(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"ERROR: get_project failed: {str(e)}")
+        logger.exception("get_project failed")
         raise HTTPException(status_code=500, detail=f"Failed to get project: {str(e)}")
 
 @router.delete("/projects/{project_id}")
@@ -360,7 +346,7 @@ def delete_project(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"ERROR: delete_project failed: {str(e)}")
+        logger.exception("delete_project failed")
         raise HTTPException(status_code=500, detail=f"Failed to delete project: {str(e)}")
 
 # Query History Endpoints
@@ -1,4 +1,5 @@
 import os
+import logging
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -12,6 +13,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -67,12 +70,10 @@ def get_current_user(
     """
     token = credentials.credentials
     try:
-        # Debug logging
-        print(f"DEBUG: verifying token: {token[:10]}...")
+        # Never log the token or its claims
         payload = decode_access_token(token)
-        print(f"DEBUG: payload: {payload}")
     except Exception as e:
-        print(f"DEBUG: Token decode error: {e}")
+        logger.debug("Token rejected", extra={"reason": type(e).__name__})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
@@ -81,21 +82,18 @@ def get_current_user(
     
     user_id = payload.get("sub")
     if user_id is None:
-        print("DEBUG: No sub in payload")
+        logger.debug("Token rejected", extra={"reason": "missing sub"})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Ensure user_id is correct type if needed, though SQLAlchemy handles it.
-    print(f"DEBUG: lookup user_id: {user_id} (type: {type(user_id)})")
-    
     # Cast to int if it's a string (since we stored it as string)
     try:
         user_id = int(user_id)
     except ValueError:
-        print(f"DEBUG: Invalid user_id format: {user_id}")
+        logger.debug("Token rejected", extra={"reason": "invalid sub format"})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credential format",
@@ -104,7 +102,7 @@ def get_current_user(
     
     user = db.query(User).filter(User.id == user_id).first()
     if user is None:
-        print(f"DEBUG: User not found for id {user_id}")
+        logger.debug("Token rejected", extra={"reason": "user not found", "user_id": user_id})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
@@ -112,7 +110,7 @@ def get_current_user(
         )
     
     if not user.is_active:
-        print("DEBUG: User inactive")
+        logger.debug("Token rejected", extra={"reason": "user inactive", "user_id": user_id})
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Inactive user"
@@ -39,6 +39,167 @@ SEMANTIC_CACHE_CONFIG = {
     
     # Maximum age difference (in days) for "recent" preference
     "recent_threshold_days": 7,
+    
+    # Top candidates ranked by the similarity index before keyword validation
+    # falls back to a full sort
+    "index_top_k": 8,
+    
+    # Score only index entries that can pass keyword validation (same
+    # impact words, via precomputed per-entry bitmasks) and rank hits by
+    # BM25 + cosine. Other entries are pruned before any vector math
+    "hybrid_prefilter_enabled": True,
+    
+    # Opt-in: content terms (words minus stopwords and impact words) a
+    # candidate must also share with the question, found through the
+    # inverted index. Faster on large caches, but drops paraphrases that
+    # share no word ("pupils" vs "students"), so 0 (off) by default
+    "hybrid_min_shared_terms": 0,
+    
+    # Share of BM25 in the hybrid ranking (the rest is cosine similarity);
+    # hits still need the cosine similarity threshold
+    "hybrid_bm25_weight": 0.3,
+    
+    # Maximum (schema_hash, dialect) indexes kept resident per worker (LRU)
+    "index_max_schemas": 256,
+    
+    # On-disk embedding format: "float32" (exact) or "float16" (half the size)
+    "embedding_storage_dtype": "float32",
+    
+    # Embedding backend:
+    # - "sentence_transformers": PyTorch model (model_name)
+    # - "onnx": exported, int8-quantized model from embedding_onnx_dir
+    #   (python export_onnx_embedding.py; needs onnxruntime and tokenizers,
+    #   no torch and no network at runtime). Check agreement with the
+    #   PyTorch vectors with check_embedding_parity.py before switching.
+    "embedding_backend": "sentence_transformers",
+    
+    # Directory written by export_onnx_embedding.py
+    "embedding_onnx_dir": "models/all-MiniLM-L6-v2-onnx",
+    
+    # ONNX file in that directory (None: the int8 model named in its config)
+    "embedding_onnx_file": None,
+    
+    # ONNX Runtime threads per encode call (0: runtime default, all cores)
+    "embedding_onnx_threads": 0,
+    
+    # Offline model bundle (build_model_bundle.py). When set, the embedding
+    # model is loaded only from this directory, never from the hub. The
+    # bundle must hold model_name (and model_bundle_revision, if set), and
+    # its files must match their checksums; otherwise the load fails and
+    # /ready reports the reason.
+    "model_bundle_path": None,
+    
+    # Pinned hub revision (commit hash) the bundle must have been built from
+    "model_bundle_revision": None,
+    
+    # Hash every bundle file at load (False: compare sizes only, faster boot)
+    "model_bundle_verify_checksums": True,
+    
+    # Memory-map the bundle's safetensors weights so workers on one host
+    # share the pages instead of each holding a private copy. transformers
+    # >= 5 already loads safetensors this way; older versions copy them
+    "model_bundle_mmap": True,
+    
+    # Keep /ready at 503 while the embedding model is unavailable instead of
+    # serving with the semantic cache disabled
+    "embedding_model_required": False,
+    
+    # Retry a failed embedding model load after this many seconds (0: never)
+    "model_retry_seconds": 300,
+    
+    # While the embedding model is unavailable, match cached questions by
+    # character n-gram similarity instead of missing every lookup
+    "lexical_fallback_enabled": True,
+    
+    # Minimum lexical similarity for a fallback hit (hits also need the same
+    # terms). Rewordings that only differ in articles, plurals or punctuation
+    # score 1.0; the same words in another order scored at most 0.78
+    "lexical_fallback_threshold": 0.9,
+    
+    # Micro-batch concurrent embedding requests into one model.encode() call
+    "embedding_batching": True,
+    
+    # Maximum questions encoded per batch
+    "embedding_max_batch_size": 32,
+    
+    # How long (ms) the first request in a batch waits for others to join.
+    # Requests that queue up while a batch is encoding are always merged.
+    "embedding_batch_wait_ms": 2.0,
+    
+    # Run the background evictor that enforces cache_ttl_days and
+    # max_cache_size_per_schema
+    "eviction_enabled": True,
+    
+    # Seconds between eviction passes
+    "eviction_interval_seconds": 600,
+    
+    # Maximum rows deleted per transaction (keeps lock times short)
+    "eviction_batch_size": 500,
+    
+    # Which entries to trim first when a schema exceeds its cap:
+    # - "lru": least recently hit
+    # - "lfu": fewest hits
+    # - "recency_weighted": hits decayed by age (uses prefer_recent and
+    #   recent_threshold_days as the half-life)
+    "eviction_policy": "recency_weighted",
+    
+    # Cache hit counters are buffered in memory and written in one batched
+    # UPDATE at this interval (seconds) ...
+    "hit_stats_flush_interval_seconds": 5.0,
+    
+    # ... or as soon as this many hits are pending
+    "hit_stats_flush_threshold": 100,
+    
+    # Registered schemas kept parsed in memory per worker (LRU); requests that
+    # send a schema_hash skip schema validation, formatting and hashing
+    "schema_registry_max_entries": 128,
+    
+    # Memoized validate_sql results per worker (LRU keyed by hash of dialect + SQL)
+    "sql_validation_cache_size": 2048,
+    
+    # Schema pruning: send the LLM only the tables relevant to the question
+    "schema_pruning_enabled": True,
+    
+    # Schemas with fewer tables than this are always sent in full
+    "schema_pruning_min_tables": 8,
+    
+    # Highest-scoring tables kept; tables needed to join them are added on top
+    "schema_pruning_top_k": 5,
+    
+    # Maximum estimated tokens for the pruned schema text
+    "schema_pruning_token_budget": 1500,
+    
+    # Weight of name/keyword matches vs embedding similarity (0-1)
+    "schema_pruning_lexical_weight": 0.4,
+    
+    # Template cache: a cached query whose question differs only in literal
+    # values ("class tenth" vs "class twelfth") is reused with the new values
+    # filled into its SQL, without an LLM call
+    "template_cache_enabled": True,
+    
+    # Minimum similarity for a cached entry to be tried as a template. Lower
+    # than similarity_threshold because changed literal values lower the
+    # score, but high enough that only rewordings of the same request are
+    # tried; the question must also match the template's pattern word for word
+    "template_min_similarity": 0.8,
+    
+    # Cross-dialect reuse: on a miss, a hit cached for the same tables in
+    # another dialect is transpiled with sqlglot, validated and stored as a
+    # native entry for the requested dialect
+    "cross_dialect_reuse_enabled": True,
+    
+    # Table-subset keys: entries also match schemas in which every table their
+    # SQL references is unchanged, so edits to unrelated tables keep the cache warm
+    "subset_cache_keys_enabled": True,
+    
+    # Resident indexes pick up compatible entries of other schema versions
+    # incrementally; this full reload also catches their deletions
+    "subset_reload_seconds": 300,
+    
+    # Load the embedding model, SQL parser dialects and LLM provider in a
+    # background thread at startup instead of on the first request (/ready
+    # reports progress)
+    "startup_warmup_enabled": True,
 }
 
 
@@ -0,0 +1,312 @@
+"""
+Cache Eviction Module
+
+Background enforcement of the semantic cache limits declared in cache_config:
+- cache_ttl_days: entries older than this are deleted
+- max_cache_size_per_schema: each (schema_hash, database_type) is trimmed to this size
+
+Each pass also embeds entries stored while the embedding model was
+unavailable, once it is loaded again.
+
+Which entries are trimmed first is decided by a pluggable eviction policy.
+All deletes run in bounded, individually committed batches so the table is
+never locked for long.
+"""
+
+import logging
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.cache_config import get_cache_config
+from app.core.database import SessionLocal
+from app.core.embedding_codec import encode_embedding, DEFAULT_EMBEDDING_DTYPE
+from app.core.similarity_index import get_similarity_index
+from app.core.lexical_index import get_lexical_index
+from app.core.semantic_cache import get_semantic_cache
+from app.models.cache import SemanticQueryCache, CacheTableRef
+
+logger = logging.getLogger(__name__)
+
+
+def _age_days(value: Optional[datetime], now: datetime) -> float:
+    """Age of a timestamp in days (naive timestamps are compared as UTC)."""
+    if value is None:
+        return float("inf")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return max((now - value).total_seconds() / 86400.0, 0.0)
+
+
+# --- Eviction policies ---
+# A policy maps a cache row to a retention score; lowest scores are evicted first.
+
+def lru_score(row: Any, now: datetime) -> float:
+    """Least recently used: last hit (or creation) time."""
+    return -_age_days(row.last_hit_at or row.created_at, now)
+
+
+def lfu_score(row: Any, now: datetime) -> float:
+    """Least frequently used: hit count, ties broken by recency."""
+    return (row.hit_count or 0) - _age_days(row.last_hit_at or row.created_at, now) * 1e-6
+
+
+def recency_weighted_score(row: Any, now: datetime) -> float:
+    """
+    Hit count decayed by age: halves every recent_threshold_days since last use.
+
+    With prefer_recent disabled this degrades to plain LFU.
+    """
+    hits = (row.hit_count or 0) + 1
+    if not get_cache_config("prefer_recent"):
+        return lfu_score(row, now)
+    half_life = get_cache_config("recent_threshold_days") or 7
+    age = _age_days(row.last_hit_at or row.created_at, now)
+    if math.isinf(age):
+        return 0.0
+    return hits * 0.5 ** (age / half_life)
+
+
+EVICTION_POLICIES: Dict[str, Callable[[Any, datetime], float]] = {
+    "lru": lru_score,
+    "lfu": lfu_score,
+    "recency_weighted": recency_weighted_score,
+}
+
+
+def register_eviction_policy(name: str, score: Callable[[Any, datetime], float]) -> None:
+    """Register a custom eviction policy (lowest score is evicted first)."""
+    EVICTION_POLICIES[name] = score
+
+
+class CacheEvictor:
+    """
+    Periodically removes expired and over-cap semantic cache entries.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval_seconds: float = 600,
+        batch_size: int = 500,
+        policy: str = "recency_weighted"
+    ):
+        """
+        Initialize the evictor.
+
+        Args:
+            session_factory: Callable returning a new DB session
+            interval_seconds: Seconds between eviction passes
+            batch_size: Maximum rows deleted per transaction
+            policy: Name of a registered eviction policy
+        """
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}'. Use one of: {', '.join(EVICTION_POLICIES)}")
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.batch_size = max(1, batch_size)
+        self.policy = policy
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def _delete_batch(self, db: Session, rows: List[Any]) -> int:
+        """Delete one batch of rows and drop them from resident similarity indexes."""
+        ids = [r.id for r in rows]
+        db.query(CacheTableRef).filter(
+            CacheTableRef.entry_id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.query(SemanticQueryCache).filter(
+            SemanticQueryCache.id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        by_key: Dict[tuple, List[int]] = {}
+        for r in rows:
+            by_key.setdefault((r.schema_hash, r.database_type), []).append(r.id)
+        registry = get_similarity_index()
+        lexical = get_lexical_index()
+        for (schema_hash, database_type), key_ids in by_key.items():
+            registry.remove_entries(schema_hash, database_type, key_ids)
+            lexical.remove_entries(schema_hash, database_type, key_ids)
+        return len(ids)
+
+    def evict_expired(self, db: Session, ttl_days: float) -> int:
+        """
+        Delete entries created more than ttl_days ago.
+
+        Returns:
+            Number of rows deleted
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(days=ttl_days)
+        deleted = 0
+        while not self._stop.is_set():
+            rows = db.query(
+                SemanticQueryCache.id,
+                SemanticQueryCache.schema_hash,
+                SemanticQueryCache.database_type
+            ).filter(
+                SemanticQueryCache.created_at < cutoff
+            ).order_by(SemanticQueryCache.id).limit(self.batch_size).all()
+            if not rows:
+                break
+            deleted += self._delete_batch(db, rows)
+        return deleted
+
+    def evict_over_capacity(self, db: Session, max_size: int) -> int:
+        """
+        Trim every (schema_hash, database_type) to max_size entries using the policy.
+
+        Returns:
+            Number of rows deleted
+        """
+        score = EVICTION_POLICIES[self.policy]
+        over_cap = db.query(
+            SemanticQueryCache.schema_hash,
+            SemanticQueryCache.database_type,
+            func.count(SemanticQueryCache.id)
+        ).group_by(
+            SemanticQueryCache.schema_hash,
+            SemanticQueryCache.database_type
+        ).having(func.count(SemanticQueryCache.id) > max_size).all()
+
+        deleted = 0
+        for schema_hash, database_type, count in over_cap:
+            if self._stop.is_set():
+                break
+            # Only the small scoring columns are fetched, never embeddings or SQL
+            rows = db.query(
+                SemanticQueryCache.id,
+                SemanticQueryCache.schema_hash,
+                SemanticQueryCache.database_type,
+                SemanticQueryCache.hit_count,
+                SemanticQueryCache.created_at,
+                SemanticQueryCache.last_hit_at
+            ).filter(
+                SemanticQueryCache.schema_hash == schema_hash,
+                SemanticQueryCache.database_type == database_type
+            ).all()
+
+            now = datetime.now(timezone.utc)
+            rows.sort(key=lambda r: (score(r, now), r.id))
+            victims = rows[:max(len(rows) - max_size, 0)]
+
+            for start in range(0, len(victims), self.batch_size):
+                if self._stop.is_set():
+                    break
+                deleted += self._delete_batch(db, victims[start:start + self.batch_size])
+        return deleted
+
+    def backfill_embeddings(self, db: Session) -> int:
+        """
+        Embed entries stored without an embedding during a model outage.
+
+        Does nothing until the embedding model is loaded; never triggers the
+        load itself. Resident similarity indexes pick the rows up on their
+        next sync.
+
+        Returns:
+            Number of rows embedded
+        """
+        sem_cache = get_semantic_cache()
+        if sem_cache.model_state != "warm":
+            return 0
+        embedding_dtype = get_cache_config("embedding_storage_dtype") or DEFAULT_EMBEDDING_DTYPE
+        embedded = 0
+        last_id = 0
+        while not self._stop.is_set():
+            rows = db.query(SemanticQueryCache.id, SemanticQueryCache.question).filter(
+                SemanticQueryCache.id > last_id,
+                SemanticQueryCache.embedding_vector.is_(None),
+                SemanticQueryCache.question_embedding.is_(None)
+            ).order_by(SemanticQueryCache.id).limit(self.batch_size).all()
+            if not rows:
+                break
+            vectors = sem_cache.model.encode(
+                [r.question for r in rows], batch_size=len(rows), convert_to_numpy=True
+            )
+            for row, vector in zip(rows, vectors):
+                db.query(SemanticQueryCache).filter(SemanticQueryCache.id == row.id).update({
+                    SemanticQueryCache.embedding_vector: encode_embedding(vector, embedding_dtype),
+                    SemanticQueryCache.embedding_dtype: embedding_dtype,
+                }, synchronize_session=False)
+            db.commit()
+            embedded += len(rows)
+            last_id = rows[-1].id
+        return embedded
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Run a single eviction pass.
+
+        Returns:
+            Summary with rows deleted by TTL and by capacity
+        """
+        summary = {"expired": 0, "over_capacity": 0, "embedded": 0, "policy": self.policy}
+        db = self.session_factory()
+        try:
+            ttl_days = get_cache_config("cache_ttl_days")
+            if ttl_days:
+                summary["expired"] = self.evict_expired(db, ttl_days)
+
+            max_size = get_cache_config("max_cache_size_per_schema")
+            if max_size:
+                summary["over_capacity"] = self.evict_over_capacity(db, max_size)
+
+            summary["embedded"] = self.backfill_embeddings(db)
+        except Exception as e:
+            db.rollback()
+            summary["error"] = str(e)
+            logger.exception("Cache eviction failed")
+        finally:
+            db.close()
+
+        summary["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self.last_run = summary
+        if summary["expired"] or summary["over_capacity"]:
+            logger.info("Cache eviction", extra={
+                "expired": summary["expired"], "over_capacity": summary["over_capacity"], "policy": self.policy
+            })
+        if summary["embedded"]:
+            logger.info("Cache maintenance: embedded entries stored during a model outage", extra={"embedded": summary["embedded"]})
+        return summary
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.run_once()
+
+    def start(self) -> None:
+        """Start the periodic eviction thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="cache-evictor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the eviction thread, interrupting any pass between batches."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+# Global evictor instance (singleton)
+_cache_evictor_instance = None
+
+
+def get_cache_evictor() -> CacheEvictor:
+    """Get or create global cache evictor instance."""
+    global _cache_evictor_instance
+    if _cache_evictor_instance is None:
+        _cache_evictor_instance = CacheEvictor(
+            interval_seconds=get_cache_config("eviction_interval_seconds") or 600,
+            batch_size=get_cache_config("eviction_batch_size") or 500,
+            policy=get_cache_config("eviction_policy") or "recency_weighted"
+        )
+    return _cache_evictor_instance
@@ -0,0 +1,212 @@
+"""
+Embedding Backend Module
+
+Encoders behind SemanticCache.model, selected by the embedding_backend
+setting in cache_config:
+
+- "sentence_transformers" (default): the PyTorch SentenceTransformer model.
+- "onnx": an ONNX Runtime session over a model exported by
+  export_onnx_embedding.py (int8 dynamic quantization by default). It is
+  loaded only from embedding_onnx_dir, so it needs no network access and
+  no torch. It needs the onnxruntime and tokenizers packages.
+
+With model_bundle_path set, either backend loads from that offline bundle
+instead (see model_bundle).
+
+Every backend exposes the SentenceTransformer calls the cache uses:
+encode(text or texts, batch_size=..., convert_to_numpy=True) and
+get_sentence_embedding_dimension(). Vectors come back L2-normalized
+float32, like all-MiniLM-L6-v2's own Normalize layer produces.
+Check that the two backends agree before switching a populated cache with
+check_embedding_parity.py.
+"""
+
+import json
+import logging
+import os
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.cache_config import get_cache_config
+from app.core.model_bundle import load_bundle_model, verify_bundle
+
+logger = logging.getLogger(__name__)
+
+# Written by export_onnx_embedding.py next to the model
+ONNX_CONFIG_FILE = "embedding_config.json"
+
+
+class OnnxEmbeddingBackend:
+    """
+    Sentence embeddings from an exported transformer with ONNX Runtime.
+
+    The model directory holds the ONNX graph (last_hidden_state output),
+    tokenizer.json and embedding_config.json (model file, max sequence
+    length, pooling, normalization).
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, model_file: Optional[str] = None, intra_op_threads: int = 0):
+        """
+        Args:
+            model_dir: Directory written by export_onnx_embedding.py
+            model_file: ONNX file inside model_dir (default: the config's, usually the int8 model)
+            intra_op_threads: ONNX Runtime threads per call (0 = runtime default)
+        """
+        # Imported here: optional dependencies, only needed for this backend
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.model_dir = model_dir
+        self.model_file = model_file or self.config.get("model_file", "model_quantized.onnx")
+        self.max_seq_length = int(self.config.get("max_seq_length", 256))
+        self.normalize = bool(self.config.get("normalize", True))
+        self.pooling = self.config.get("pooling", "mean")
+        if self.pooling not in ("mean", "cls"):
+            raise ValueError(f"Unsupported pooling '{self.pooling}'")
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        pad_token = self.config.get("pad_token", "[PAD]")
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, self.model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension = self.config.get("dimension")
+
+    def get_sentence_embedding_dimension(self) -> Optional[int]:
+        return self._dimension
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, feeds)[0]
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention_mask[:, :, None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled = pooled / np.clip(norms, 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: Optional[int] = None,
+        convert_to_numpy: bool = True,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        Encode one text (returns a vector) or a list of texts (returns a matrix).
+
+        Texts are encoded in chunks of batch_size (default 32), padded to the
+        longest text of their chunk.
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self._dimension or 0), dtype=np.float32)
+        batch_size = batch_size or 32
+        vectors = np.vstack([
+            self._encode_batch(texts[start:start + batch_size])
+            for start in range(0, len(texts), batch_size)
+        ])
+        if self._dimension is None:
+            self._dimension = int(vectors.shape[1])
+        return vectors[0] if single else vectors
+
+
+def _onnx_backend(model_dir: str) -> OnnxEmbeddingBackend:
+    return OnnxEmbeddingBackend(
+        model_dir,
+        model_file=get_cache_config("embedding_onnx_file"),
+        intra_op_threads=get_cache_config("embedding_onnx_threads") or 0
+    )
+
+
+def load_embedding_model(model_name: str, backend: Optional[str] = None) -> Tuple[object, dict]:
+    """
+    Load the embedding model for the configured backend.
+
+    With model_bundle_path set, the model comes from that verified offline
+    bundle (see model_bundle) and nothing is fetched from the hub; a bad
+    bundle raises ModelBundleError. The "onnx" backend then uses the
+    bundle's onnx/ directory.
+
+    An ONNX backend that cannot be loaded (missing directory or package)
+    falls back to SentenceTransformer with a warning, so a misconfiguration
+    does not disable the cache.
+
+    Args:
+        model_name: Model to load (and the model_id a bundle must be pinned to)
+        backend: Override of the embedding_backend setting
+
+    Returns:
+        (object with SentenceTransformer's encode() interface, info for health reporting)
+    """
+    backend = (backend or get_cache_config("embedding_backend") or "sentence_transformers").lower()
+    if backend not in ("sentence_transformers", "onnx"):
+        raise ValueError(f"Unknown embedding backend '{backend}'")
+    bundle_path = get_cache_config("model_bundle_path")
+
+    if bundle_path:
+        revision = get_cache_config("model_bundle_revision")
+        verify_checksums = get_cache_config("model_bundle_verify_checksums") is not False
+        manifest = verify_bundle(bundle_path, model_id=model_name, revision=revision, verify_checksums=verify_checksums)
+        onnx_dir = os.path.join(bundle_path, "onnx")
+        if backend == "onnx" and os.path.isdir(onnx_dir):
+            try:
+                return _onnx_backend(onnx_dir), {
+                    "backend": "onnx",
+                    "source": "bundle",
+                    "path": bundle_path,
+                    "model_id": manifest.get("model_id"),
+                    "revision": manifest.get("revision"),
+                    "checksums_verified": verify_checksums,
+                }
+            except Exception as e:
+                logger.warning(
+                    "Bundle ONNX model unavailable, using its safetensors weights",
+                    extra={"path": onnx_dir, "error": str(e)}
+                )
+        model, info = load_bundle_model(
+            bundle_path,
+            model_id=model_name,
+            revision=revision,
+            verify_checksums=False,  # Verified above
+            mmap_weights=get_cache_config("model_bundle_mmap") is not False
+        )
+        return model, dict(info, backend="sentence_transformers", checksums_verified=verify_checksums)
+
+    if backend == "onnx":
+        model_dir = get_cache_config("embedding_onnx_dir") or "models/all-MiniLM-L6-v2-onnx"
+        try:
+            model = _onnx_backend(model_dir)
+            logger.info("ONNX embedding backend loaded", extra={"model_dir": model_dir, "model_file": model.model_file})
+            return model, {"backend": "onnx", "source": "local", "path": model_dir}
+        except Exception as e:
+            logger.warning(
+                "ONNX embedding backend unavailable, using SentenceTransformer",
+                extra={"model_dir": model_dir, "error": str(e)}
+            )
+
+    # Imported here: sentence_transformers (and torch) take seconds to import
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name), {"backend": "sentence_transformers", "source": "hub", "model_id": model_name}
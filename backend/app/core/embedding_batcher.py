@@ -0,0 +1,211 @@
+"""
+Embedding Batcher Module
+
+Micro-batching scheduler for embedding requests.
+
+Concurrent /generate requests each need one question embedding. Instead of
+calling model.encode() once per request (and serializing on the model), a
+single worker thread collects pending texts for a short window or until a
+maximum batch size is reached, runs one batched encode, and hands each
+caller its own vector.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingEncode:
+    """A single caller waiting for its embedding."""
+
+    __slots__ = ("text", "future")
+
+    def __init__(self, text: str):
+        self.text = text
+        # concurrent.futures.Future so both threads and coroutines can wait on it
+        self.future: "Future[np.ndarray]" = Future()
+
+
+class EmbeddingBatcher:
+    """
+    Collects encode requests from concurrent callers into batched encode calls.
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], Any],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            encode_batch: Callable taking a list of texts and returning one vector per text
+            max_batch_size: Maximum texts encoded in one call
+            max_wait_ms: How long to wait for more requests after the first one arrives
+        """
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: "queue.Queue[_PendingEncode]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._largest_batch = 0
+        self._batch_histogram: Dict[str, int] = {}
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def submit(self, text: str) -> "Future[np.ndarray]":
+        """
+        Queue a text for the next batch.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Future resolving to the embedding vector
+        """
+        self._ensure_worker()
+        pending = _PendingEncode(text)
+        self._queue.put(pending)
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return pending.future
+
+    def encode(self, text: str, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Encode a single text, batched with any concurrent callers.
+
+        Args:
+            text: Input text
+            timeout: Maximum seconds to wait for the result
+
+        Returns:
+            Embedding vector
+
+        Raises:
+            TimeoutError: If the batch did not complete in time
+            Exception: Whatever the underlying encode raised
+        """
+        return self.submit(text).result(timeout)
+
+    async def encode_async(self, text: str) -> np.ndarray:
+        """Encode a single text without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def _collect(self) -> List[_PendingEncode]:
+        """Block for the first request, then gather more up to the window/size limit."""
+        batch = [self._queue.get()]
+
+        # Take everything already queued (arrived while the last batch ran)
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        # Then give concurrent callers a short window to join
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._process(self._collect())
+            except Exception:
+                # Never let one batch end the worker: later callers would wait forever
+                logger.exception("Embedding batch failed")
+
+    def _process(self, batch: List[_PendingEncode]) -> None:
+        # Claim each future; callers that cancelled while queued drop out here
+        batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            vectors = self.encode_batch([p.text for p in batch])
+            if len(vectors) != len(batch):
+                raise RuntimeError(
+                    f"Batched encode returned {len(vectors)} vectors for {len(batch)} texts"
+                )
+        except Exception as e:
+            for pending in batch:
+                self._resolve(pending, error=e)
+        else:
+            for pending, vector in zip(batch, vectors):
+                self._resolve(pending, result=vector)
+        finally:
+            self._record_batch(len(batch))
+
+    @staticmethod
+    def _resolve(pending: _PendingEncode, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Complete one caller's future; a future that is already done is skipped."""
+        try:
+            if error is not None:
+                pending.future.set_exception(error)
+            else:
+                pending.future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _record_batch(self, size: int) -> None:
+        # Power-of-two buckets: "1", "2", "3-4", "5-8", ...
+        upper = 1
+        while upper < size:
+            upper *= 2
+        lower = upper // 2 + 1 if upper > 2 else upper
+        bucket = str(upper) if lower == upper else f"{lower}-{upper}"
+
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._largest_batch = max(self._largest_batch, size)
+            self._batch_histogram[bucket] = self._batch_histogram.get(bucket, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return queue-depth and batch-size metrics."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "batch_size_histogram": dict(self._batch_histogram),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
@@ -0,0 +1,92 @@
+"""
+Embedding Codec Module
+
+Compact binary storage for question embeddings.
+
+Embeddings are stored as raw little-endian float32 (or float16) bytes and
+read back with np.frombuffer, which avoids parsing 384 floats out of JSON
+text for every cached row.
+"""
+
+import json
+from typing import Any, Optional
+
+import numpy as np
+
+# Supported on-disk dtypes (explicit little-endian so blobs are portable)
+EMBEDDING_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+DEFAULT_EMBEDDING_DTYPE = "float32"
+
+
+def _resolve_dtype(dtype: Optional[str]) -> np.dtype:
+    if not dtype:
+        dtype = DEFAULT_EMBEDDING_DTYPE
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype '{dtype}'. Use one of: {', '.join(EMBEDDING_DTYPES)}")
+    return EMBEDDING_DTYPES[dtype]
+
+
+def encode_embedding(embedding: Any, dtype: str = DEFAULT_EMBEDDING_DTYPE) -> bytes:
+    """
+    Encode an embedding vector as raw bytes.
+
+    Args:
+        embedding: List of floats or numpy array
+        dtype: Storage dtype ("float32" or "float16")
+
+    Returns:
+        Packed little-endian bytes
+    """
+    return np.asarray(embedding, dtype=_resolve_dtype(dtype)).ravel().tobytes()
+
+
+def decode_embedding(blob, dtype: str = DEFAULT_EMBEDDING_DTYPE) -> np.ndarray:
+    """
+    Decode raw bytes into an embedding vector without copying.
+
+    Args:
+        blob: Bytes (or memoryview) produced by encode_embedding
+        dtype: Storage dtype the blob was written with
+
+    Returns:
+        Read-only numpy view over the blob
+    """
+    return np.frombuffer(blob, dtype=_resolve_dtype(dtype))
+
+
+def load_embedding(
+    blob: Optional[bytes],
+    dtype: Optional[str] = None,
+    legacy: Any = None
+) -> Optional[np.ndarray]:
+    """
+    Load a stored embedding, falling back to the legacy JSON column.
+
+    Rows that have not been migrated yet only carry the JSON array (which
+    SQLite may return as a string), so both representations are accepted.
+
+    Args:
+        blob: Binary embedding column value
+        dtype: Binary embedding dtype column value
+        legacy: Legacy JSON embedding column value
+
+    Returns:
+        Embedding vector, or None if the row has no usable embedding
+    """
+    if blob:
+        # psycopg2 returns bytea as memoryview, which frombuffer reads in place
+        return decode_embedding(blob, dtype)
+
+    if legacy is None:
+        return None
+    if isinstance(legacy, str):
+        try:
+            legacy = json.loads(legacy)
+        except json.JSONDecodeError:
+            return None
+    vector = np.asarray(legacy, dtype=np.float32).ravel()
+    return vector if vector.size else None
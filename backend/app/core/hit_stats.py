@@ -0,0 +1,206 @@
+"""
+Hit Statistics Module
+
+Write-behind buffer for semantic cache hit statistics.
+
+Cache hits only bump in-memory counters; a background thread flushes them
+to semantic_query_cache in a single batched UPDATE every few seconds or
+once enough hits have accumulated. A failed flush puts its counts back in
+the buffer so they are retried, and the buffer is flushed on shutdown. At
+most one flush interval of hits can be lost if the process is killed.
+"""
+
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.cache_config import get_cache_config
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Keeps the VALUES list well under PostgreSQL's bind-parameter limit
+_MAX_ROWS_PER_STATEMENT = 1000
+
+
+class HitStatsBuffer:
+    """
+    Accumulates (hit_count, last_hit_at) deltas per cache entry and flushes them in batches.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_interval_seconds: float = 5.0,
+        flush_threshold: int = 100
+    ):
+        """
+        Initialize the buffer.
+
+        Args:
+            session_factory: Callable returning a new DB session
+            flush_interval_seconds: Maximum seconds between flushes
+            flush_threshold: Pending hits that trigger an early flush
+        """
+        self.session_factory = session_factory
+        self.flush_interval_seconds = flush_interval_seconds
+        self.flush_threshold = max(1, flush_threshold)
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[int, Tuple[int, datetime]] = {}
+        self._pending_hits = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.flushes = 0
+        self.flushed_hits = 0
+        self.failed_flushes = 0
+
+    def record(self, entry_id: int, at: Optional[datetime] = None) -> None:
+        """
+        Record a cache hit (in memory only).
+
+        Args:
+            entry_id: ID of the cache entry that was hit
+            at: Time of the hit (defaults to now, UTC)
+        """
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            hits, last = self._pending.get(entry_id, (0, at))
+            self._pending[entry_id] = (hits + 1, max(last, at))
+            self._pending_hits += 1
+            if self._pending_hits >= self.flush_threshold:
+                self._wake.set()
+
+    def _merge_back(self, batch: Dict[int, Tuple[int, datetime]]) -> None:
+        """Return an unflushed batch to the buffer so it is retried."""
+        with self._lock:
+            for entry_id, (hits, last) in batch.items():
+                pending_hits, pending_last = self._pending.get(entry_id, (0, last))
+                self._pending[entry_id] = (pending_hits + hits, max(pending_last, last))
+                self._pending_hits += hits
+
+    def _write(self, db: Session, batch: Dict[int, Tuple[int, datetime]]) -> None:
+        rows: List[Tuple[int, int, datetime]] = [
+            (entry_id, hits, last) for entry_id, (hits, last) in batch.items()
+        ]
+
+        if db.get_bind().dialect.name == "postgresql":
+            # One UPDATE ... FROM (VALUES ...) statement per chunk of rows
+            for start in range(0, len(rows), _MAX_ROWS_PER_STATEMENT):
+                chunk = rows[start:start + _MAX_ROWS_PER_STATEMENT]
+                params = {}
+                values = []
+                for i, (entry_id, hits, last) in enumerate(chunk):
+                    values.append(
+                        f"(CAST(:id{i} AS INTEGER), CAST(:hits{i} AS INTEGER), CAST(:last{i} AS TIMESTAMPTZ))"
+                    )
+                    params.update({f"id{i}": entry_id, f"hits{i}": hits, f"last{i}": last})
+                db.execute(text(f"""
+                    UPDATE semantic_query_cache AS c
+                    SET hit_count = COALESCE(c.hit_count, 0) + v.hits,
+                        last_hit_at = GREATEST(COALESCE(c.last_hit_at, v.last_hit), v.last_hit)
+                    FROM (VALUES {', '.join(values)}) AS v(id, hits, last_hit)
+                    WHERE c.id = v.id
+                """), params)
+        else:
+            # Portable fallback: a single executemany round trip
+            db.execute(text("""
+                UPDATE semantic_query_cache
+                SET hit_count = COALESCE(hit_count, 0) + :hits,
+                    last_hit_at = CASE
+                        WHEN last_hit_at IS NULL OR last_hit_at < :last_hit THEN :last_hit
+                        ELSE last_hit_at
+                    END
+                WHERE id = :id
+            """), [{"id": entry_id, "hits": hits, "last_hit": last} for entry_id, hits, last in rows])
+        db.commit()
+
+    def flush(self) -> int:
+        """
+        Write all pending hits to the database.
+
+        Returns:
+            Number of hits flushed (0 if nothing was pending or the write failed)
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch = self._pending
+                self._pending = {}
+                self._pending_hits = 0
+                self._wake.clear()
+
+            total = sum(hits for hits, _ in batch.values())
+            db = self.session_factory()
+            try:
+                self._write(db, batch)
+            except Exception as e:
+                db.rollback()
+                self._merge_back(batch)
+                self.failed_flushes += 1
+                logger.warning("Hit stats flush failed, hits kept for retry", extra={"hits": total, "error": str(e)})
+                return 0
+            finally:
+                db.close()
+
+            self.flushes += 1
+            self.flushed_hits += total
+            return total
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self.flush()
+
+    def start(self) -> None:
+        """Start the background flush thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="hit-stats-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the flush thread and write any remaining hits."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            pending = self._pending_hits
+        return {
+            "pending_hits": pending,
+            "flushes": self.flushes,
+            "flushed_hits": self.flushed_hits,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+# Global buffer instance (singleton)
+_hit_stats_instance = None
+
+
+def get_hit_stats() -> HitStatsBuffer:
+    """Get or create global hit statistics buffer."""
+    global _hit_stats_instance
+    if _hit_stats_instance is None:
+        _hit_stats_instance = HitStatsBuffer(
+            flush_interval_seconds=get_cache_config("hit_stats_flush_interval_seconds") or 5.0,
+            flush_threshold=get_cache_config("hit_stats_flush_threshold") or 100
+        )
+        # Last-chance flush if the process exits without running the app lifespan
+        atexit.register(_hit_stats_instance.flush)
+    return _hit_stats_instance
@@ -0,0 +1,57 @@
+"""
+Keyword Filter Module
+
+Question keys computed once per cache entry (when it enters an index)
+instead of on every lookup:
+
+- impact mask: bitmask of the high-impact words ("each", "total", "top",
+  ...) a question contains. Keyword validation requires equal masks, so
+  entries with a different mask are pruned before any vector math.
+- content terms: lowercased words minus stopwords, impact words and words
+  every question shares ("show", "list"). They feed the inverted index and
+  BM25 scoring of SchemaIndex.search_hybrid.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List
+
+# Words that strongly change the SQL structure/logic
+IMPACT_WORDS = (
+    'each', 'every', 'all', 'total', 'average', 'avg', 'sum',
+    'count', 'min', 'max', 'top', 'bottom', 'tenth', 'twelfth'
+)
+_IMPACT_BITS = {word: 1 << bit for bit, word in enumerate(IMPACT_WORDS)}
+
+# Too common to narrow down candidates
+STOPWORDS = frozenset({
+    'a', 'an', 'the', 'of', 'in', 'on', 'at', 'for', 'to', 'from', 'by', 'with', 'and', 'or',
+    'is', 'are', 'was', 'were', 'be', 'been', 'do', 'does', 'did', 'has', 'have', 'had',
+    'what', 'which', 'who', 'whom', 'whose', 'how', 'many', 'much', 'there', 'their', 'its',
+    'me', 'my', 'i', 'we', 'our', 'you', 'your', 'it', 'this', 'that', 'these', 'those', 'any', 'some',
+    'show', 'list', 'find', 'get', 'give', 'display', 'return', 'select', 'please',
+})
+
+_EDGE_PUNCTUATION = ".,;:!?\"'`()[]{}"
+
+
+def keyword_tokens(question: str) -> List[str]:
+    """Words as keyword validation has always split them (lowercase, "?" removed)."""
+    return question.lower().replace('?', '').split()
+
+
+def impact_mask(tokens: Iterable[str]) -> int:
+    """Bitmask of the IMPACT_WORDS among tokens."""
+    mask = 0
+    for token in tokens:
+        mask |= _IMPACT_BITS.get(token, 0)
+    return mask
+
+
+def content_terms(tokens: Iterable[str]) -> Dict[str, int]:
+    """Term frequencies of the tokens that identify what a question is about."""
+    terms = Counter()
+    for token in tokens:
+        token = token.strip(_EDGE_PUNCTUATION)
+        if token and token not in STOPWORDS and token not in _IMPACT_BITS:
+            terms[token] += 1
+    return dict(terms)
@@ -0,0 +1,320 @@
+"""
+Lexical Index Module
+
+Fallback similarity for the semantic cache while the embedding model is
+unavailable (failed load, encode errors). Without it every lookup misses
+and an embedding outage sends all traffic to the LLM.
+
+Questions are first reduced to their terms: lowercased words without
+punctuation, stopwords ("the", "show", "list", see keyword_filter) and
+plural endings. The terms are vectorized with scikit-learn's
+HashingVectorizer over character n-grams (3-5 chars, spanning word
+boundaries so word order counts), which is stateless, so new entries are
+appended without refitting. Rows are weighted with sublinear tf only: no
+idf, so a pair's score does not depend on what else the index holds.
+
+A hit needs the same set of terms (lexically_compatible), the usual keyword
+validation and lexical_fallback_threshold. Measured on hand-written pairs,
+rewordings that only differ in articles, plurals, punctuation or
+"show"/"list" score 1.0; the same words in another order ("orders per
+customer" vs "customers per order", "employees and their managers" vs
+"managers and their employees") score 0.48-0.78.
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.core.cache_config import get_cache_config
+from app.core.keyword_filter import STOPWORDS
+from app.core.similarity_index import EntrySource
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 20
+
+_vectorizer = None
+
+
+def _singular(word: str) -> str:
+    """Crude plural stripping: "companies" -> "company", "orders" -> "order" ("class" stays)."""
+    if len(word) > 3 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def question_terms(question: str) -> List[str]:
+    """Lowercased words of a question without stopwords and plural endings, in order."""
+    return [_singular(w) for w in re.findall(r"\w+", (question or "").casefold()) if w not in STOPWORDS]
+
+
+def _counts(questions: Sequence[str]):
+    """Hashed character n-gram counts of the questions' terms, one row per question (scipy CSR matrix)."""
+    global _vectorizer
+    if _vectorizer is None:
+        # Imported here: scikit-learn takes over a second to import and is
+        # only needed during an embedding outage
+        from sklearn.feature_extraction.text import HashingVectorizer
+        # Stateless, so one instance serves every index and thread
+        _vectorizer = HashingVectorizer(
+            analyzer="char",
+            ngram_range=(3, 5),
+            n_features=N_FEATURES,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        )
+    return _vectorizer.transform([" ".join(question_terms(q)) for q in questions]).tocsr()
+
+
+def lexically_compatible(q1: str, q2: str) -> bool:
+    """
+    Extra check for lexical hits: the same terms, including numbers and
+    negation words. "top 5" vs "top 10", "placed" vs "never placed" or
+    "active" vs "inactive" score high on n-grams but need different SQL.
+    """
+    return set(question_terms(q1)) == set(question_terms(q2))
+
+
+class LexicalIndex:
+    """
+    Character n-gram index over the cached questions of one schema.
+
+    Rows are kept in insertion (id) order so ties resolve to the oldest
+    entry, as in SchemaIndex.
+    """
+
+    def __init__(self, source: Optional[EntrySource] = None):
+        self._lock = threading.RLock()
+        self.source = source  # Which DB rows the index holds (set by the registry)
+        self._counts = None  # CSR matrix of the stacked rows
+        self._pending: List = []  # Rows appended since the last stack
+        self._ids: List[int] = []
+        self._positions: Dict[int, int] = {}
+        self._questions: Dict[int, str] = {}
+        self._weighted = None  # _weights() result, until the next change
+
+    @property
+    def size(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, entry_id: int) -> bool:
+        return entry_id in self._positions
+
+    def question(self, entry_id: int) -> Optional[str]:
+        return self._questions.get(entry_id)
+
+    def append(self, entries: Iterable[Tuple[int, str]]) -> int:
+        """
+        Append cache entries to the index.
+
+        The rows are only stacked onto the matrix by the next lookup, so
+        storing one answer at a time does not copy the whole matrix.
+
+        Args:
+            entries: Iterable of (id, question) tuples
+
+        Returns:
+            Number of rows actually added
+        """
+        with self._lock:
+            rows = [(i, q or "") for i, q in entries if i not in self._positions]
+            if not rows:
+                return 0
+            self._pending.append(_counts([q for _, q in rows]))
+            for entry_id, question in rows:
+                self._positions[entry_id] = len(self._ids)
+                self._ids.append(entry_id)
+                self._questions[entry_id] = question
+            self._weighted = None
+            return len(rows)
+
+    def _stacked(self):
+        """Count matrix with pending rows stacked on (caller holds the lock)."""
+        if self._pending:
+            import scipy.sparse as sp
+            blocks = ([self._counts] if self._counts is not None else []) + self._pending
+            self._counts = sp.vstack(blocks, format="csr") if len(blocks) > 1 else blocks[0]
+            self._pending = []
+        return self._counts
+
+    def remove(self, entry_ids: Iterable[int]) -> int:
+        """
+        Remove entries from the index, preserving the order of remaining rows.
+
+        Returns:
+            Number of rows removed
+        """
+        with self._lock:
+            drop = {i for i in entry_ids if i in self._positions}
+            if not drop:
+                return 0
+            if self.source is not None:
+                self.source.forget(drop)
+            keep = [p for p, i in enumerate(self._ids) if i not in drop]
+            self._counts = self._stacked()[keep]
+            self._ids = [self._ids[p] for p in keep]
+            self._positions = {i: p for p, i in enumerate(self._ids)}
+            for i in drop:
+                self._questions.pop(i, None)
+            self._weighted = None
+            return len(drop)
+
+    def _weights(self):
+        """Row-normalized sublinear tf matrix (column-major) and the row ids."""
+        with self._lock:
+            if self._weighted is None:
+                from sklearn.preprocessing import normalize
+                weighted = self._stacked().copy()
+                weighted.data = np.log1p(weighted.data)
+                # Column-major: a lookup only reads the query's few columns
+                self._weighted = (normalize(weighted).tocsc(), list(self._ids))
+            return self._weighted
+
+    def scores(self, question: str) -> Tuple[np.ndarray, List[int]]:
+        """Cosine of the question against every entry, with the matching entry ids."""
+        if not self._ids:
+            return np.zeros(0, dtype=np.float32), []
+        matrix, ids = self._weights()
+        query = _counts([question])
+        if query.nnz == 0:
+            return np.zeros(len(ids), dtype=np.float32), ids
+        query_weights = np.log1p(query.data)
+        query_weights /= np.linalg.norm(query_weights)
+        return np.asarray(matrix[:, query.indices] @ query_weights).ravel(), ids
+
+    def search(
+        self,
+        question: str,
+        threshold: float,
+        accept: Optional[Callable[[int], bool]] = None
+    ) -> Tuple[Optional[int], float]:
+        """
+        Find the best entry above threshold that passes the accept check.
+
+        Same contract as SchemaIndex.search: candidates failing accept are
+        skipped, and on a miss the best remaining score is returned.
+
+        Returns:
+            Tuple of (entry id or None, similarity)
+        """
+        scores, ids = self.scores(question)
+        if not len(ids):
+            return (None, 0.0)
+        candidates = np.flatnonzero(scores >= threshold)
+        # Best first; ties keep insertion order
+        for position in candidates[np.argsort(-scores[candidates], kind="stable")]:
+            if accept is None or accept(ids[position]):
+                return (ids[position], float(scores[position]))
+        # Miss: best score below threshold (candidates that failed accept do not count)
+        below = scores[scores < threshold]
+        return (None, max(float(below.max()), 0.0) if below.size else 0.0)
+
+
+class LexicalIndexRegistry:
+    """
+    Process-wide LexicalIndex objects keyed by (schema_hash, database_type).
+
+    Indexes are built on first fallback lookup, so nothing is held while the
+    embedding model works. Bounded with LRU eviction like the similarity index.
+    """
+
+    def __init__(self, max_schemas: int = 256):
+        self.max_schemas = max_schemas
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[Tuple[str, str], LexicalIndex]" = OrderedDict()
+
+    def get(self, schema_hash: str, database_type: str) -> Optional[LexicalIndex]:
+        key = (schema_hash, database_type)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+            return index
+
+    def _put(self, schema_hash: str, database_type: str, index: LexicalIndex) -> None:
+        key = (schema_hash, database_type)
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_schemas:
+                self._indexes.popitem(last=False)
+
+    def add_entry(self, schema_hash: str, database_type: str, entry_id: int, question: str) -> None:
+        """Append a newly stored cache row to a resident index, if one is loaded."""
+        index = self.get(schema_hash, database_type)
+        if index is not None:
+            index.append([(entry_id, question)])
+            index.source.stored(entry_id)
+
+    def remove_entries(self, schema_hash: str, database_type: str, entry_ids: Iterable[int]) -> None:
+        """Remove deleted cache rows from a resident index, if one is loaded."""
+        index = self.get(schema_hash, database_type)
+        if index is not None:
+            index.remove(entry_ids)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            indexes = list(self._indexes.values())
+        return {"schemas": len(indexes), "entries": sum(i.size for i in indexes)}
+
+    def sync(
+        self,
+        db: Session,
+        schema_hash: str,
+        database_type: str,
+        table_fingerprints: Optional[Sequence[str]] = None
+    ) -> LexicalIndex:
+        """
+        Return an up-to-date index for the schema, loading or refreshing it from the DB.
+
+        Same change detection as SimilarityIndexRegistry.sync: new rows are
+        fetched incrementally; deletions elsewhere trigger a rebuild.
+        """
+        # Imported here so LexicalIndex stays usable without a configured database
+        from app.models.cache import SemanticQueryCache
+
+        columns = (SemanticQueryCache.id, SemanticQueryCache.question)
+        index = self.get(schema_hash, database_type)
+        if index is not None:
+            changes = index.source.changes(db, columns, index.size)
+            if changes is not None:
+                rows, removed = changes
+                if removed:
+                    index.remove(removed)
+                if rows:
+                    index.append(rows)
+                return index
+
+        source = EntrySource(schema_hash, database_type, table_fingerprints)
+        rows = source.load(db, columns)
+        index = LexicalIndex(source)
+        index.append(rows)
+        self._put(schema_hash, database_type, index)
+        logger.debug("Built lexical index", extra={"schema_hash": schema_hash, "dialect": database_type, "entries": index.size})
+        return index
+
+
+# Global registry instance (singleton)
+_lexical_index_registry = None
+
+
+def get_lexical_index() -> LexicalIndexRegistry:
+    """Get or create global lexical index registry."""
+    global _lexical_index_registry
+    if _lexical_index_registry is None:
+        _lexical_index_registry = LexicalIndexRegistry(
+            max_schemas=get_cache_config("index_max_schemas") or 256
+        )
+    return _lexical_index_registry
@@ -0,0 +1,216 @@
+"""
+Logging Configuration Module
+
+Structured, leveled, non-blocking logging for the API.
+
+- Modules log through logging.getLogger(__name__). Records go to a bounded
+  in-memory queue (QueueHandler); a background QueueListener thread formats
+  them and writes to stderr, so request threads and the event loop never
+  block on a slow stdout or pipe. When the queue is full, records are
+  dropped and counted instead of blocking.
+- Output is one JSON object per line (LOG_FORMAT=json, the default) or
+  readable text (LOG_FORMAT=text). Keyword fields passed with extra={...}
+  become JSON fields.
+- Levels: LOG_LEVEL sets the default for the app package, and LOG_LEVELS
+  overrides single modules, e.g.
+  LOG_LEVELS="app.core.auth=WARNING,app.services.model_service=DEBUG".
+- Large payloads (LLM prompts, schema JSON) are only built and logged
+  through log_payload(). That needs DEBUG on the logger and a
+  LOG_PAYLOAD_SAMPLE_RATE above 0. The default rate is 0, so production
+  never serializes prompts or schemas.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional
+
+# Logger all app modules inherit from (app.api..., app.core..., app.services...)
+APP_LOGGER = "app"
+
+# LogRecord attributes that are not user-supplied extra fields
+_RESERVED_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {k: v for k, v in record.__dict__.items() if k not in _RESERVED_ATTRS and not k.startswith("_")}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable single-line format with extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return line
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops records when the queue is full instead of blocking.
+
+    The message is interpolated on the calling thread (args may not be
+    thread-safe to format later); everything else happens on the listener.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingState:
+    """Handler, listener and payload sampling settings of the configured logging."""
+
+    def __init__(self):
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[QueueListener] = None
+        self.payload_sample_rate = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.handler.queue.qsize() if self.handler else 0,
+            "dropped_records": self.handler.dropped if self.handler else 0,
+            "payload_sample_rate": self.payload_sample_rate,
+        }
+
+
+_state = LoggingState()
+
+
+def _parse_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        level = logging.getLevelName(level.strip().upper())
+        if isinstance(level, int):
+            levels[name.strip()] = level
+    return levels
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    module_levels: Optional[str] = None,
+    log_format: Optional[str] = None,
+    payload_sample_rate: Optional[float] = None,
+    queue_size: Optional[int] = None,
+    stream=None
+) -> LoggingState:
+    """
+    Configure app logging (idempotent; a second call reconfigures).
+
+    Arguments default to the LOG_LEVEL, LOG_LEVELS, LOG_FORMAT,
+    LOG_PAYLOAD_SAMPLE_RATE and LOG_QUEUE_SIZE environment variables.
+
+    Returns:
+        The logging state (queue depth and dropped records for stats)
+    """
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    module_levels = module_levels if module_levels is not None else os.getenv("LOG_LEVELS", "")
+    log_format = (log_format or os.getenv("LOG_FORMAT", "json")).lower()
+    if payload_sample_rate is None:
+        payload_sample_rate = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0") or 0)
+    queue_size = queue_size or int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(TextFormatter() if log_format == "text" else JsonFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=max(1, queue_size)))
+    listener = QueueListener(handler.queue, output, respect_handler_level=False)
+    listener.start()
+
+    app_logger = logging.getLogger(APP_LOGGER)
+    for existing in list(app_logger.handlers):
+        app_logger.removeHandler(existing)
+    app_logger.addHandler(handler)
+    app_logger.setLevel(level.upper())
+    app_logger.propagate = False
+
+    for name, module_level in _parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _state.handler = handler
+    _state.listener = listener
+    _state.payload_sample_rate = max(0.0, min(1.0, payload_sample_rate))
+    return _state
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    if _state.listener is not None:
+        _state.listener.stop()
+        _state.listener = None
+
+
+def get_logging_state() -> LoggingState:
+    return _state
+
+
+def log_payload(logger: logging.Logger, message: str, payload: Callable[[], Dict[str, Any]]) -> None:
+    """
+    Log a large payload at DEBUG for a sampled fraction of calls.
+
+    The payload callable is only invoked (and its values only serialized)
+    when the record will actually be written.
+
+    Args:
+        logger: Module logger
+        message: Log message
+        payload: Returns the extra fields to log (e.g. {"prompt": prompt})
+    """
+    rate = _state.payload_sample_rate
+    if rate <= 0.0 or not logger.isEnabledFor(logging.DEBUG):
+        return
+    if rate < 1.0 and random.random() >= rate:
+        return
+    logger.debug(message, extra=payload())
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,306 @@
+"""
+Metrics Module
+
+Lightweight latency and cache metrics for the /generate hot path.
+
+- Counters and histograms are plain in-process objects (a lock, a few
+  floats per bucket) rendered in the Prometheus text format on /metrics.
+  There is no prometheus_client dependency; with several uvicorn workers each
+  worker reports its own series, as with the other /cache/stats counters.
+- stage() times one pipeline stage. The duration goes to the
+  nl2sql_stage_seconds histogram and, while a request is being served, to
+  that request's Server-Timing response header.
+- Gauges are collected from callbacks at scrape time (DB pool, cache
+  counters), so they cost nothing between scrapes.
+
+Everything is a no-op when track_statistics is disabled in cache_config.
+"""
+
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.cache_config import get_cache_config
+
+logger = logging.getLogger(__name__)
+
+# Stage latency buckets in seconds (sub-millisecond lookups up to slow LLM calls)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Best semantic similarity per lookup
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.95, 0.98, 1.0)
+
+# Stage timings of the request being served (None outside a request)
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def metrics_enabled() -> bool:
+    """Metrics follow the track_statistics cache setting."""
+    return bool(get_cache_config("track_statistics"))
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not metrics_enabled():
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with optional labels."""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        if not metrics_enabled():
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, ([*s[0]], s[1], s[2])) for key, s in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from a callback at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]],
+        labelnames: Sequence[str] = (),
+        metric_type: str = "gauge"
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.metric_type = metric_type
+
+    def collect(self) -> List[str]:
+        try:
+            samples = sorted(self.callback())
+        except Exception as e:
+            logger.debug("Metrics callback failed", extra={"metric": self.name, "error": str(e)})
+            return []
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for key, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Named metric families rendered together on /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering a name returns the existing family (safe on module reload)
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                  labelnames: Sequence[str] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets, labelnames))
+
+    def callback(self, name: str, documentation: str, callback, labelnames: Sequence[str] = (),
+                 metric_type: str = "gauge") -> CallbackMetric:
+        with self._lock:
+            # Callbacks are replaced so the latest registration wins
+            metric = self._metrics[name] = CallbackMetric(name, documentation, callback, labelnames, metric_type)
+            return metric
+
+    def render(self) -> str:
+        """All metric families in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry instance (singleton)
+_metrics_instance = None
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create global metrics registry."""
+    global _metrics_instance
+    if _metrics_instance is None:
+        _metrics_instance = MetricsRegistry()
+    return _metrics_instance
+
+
+# --- Metric families recorded on the hot path ---
+
+STAGE_SECONDS = get_metrics().histogram(
+    "nl2sql_stage_seconds", "Duration of /generate pipeline stages", labelnames=("stage",)
+)
+HTTP_REQUEST_SECONDS = get_metrics().histogram(
+    "nl2sql_http_request_seconds", "HTTP request duration", labelnames=("method", "path", "status")
+)
+CACHE_SIMILARITY = get_metrics().histogram(
+    "nl2sql_cache_best_similarity", "Best semantic cache similarity per lookup",
+    buckets=SIMILARITY_BUCKETS, labelnames=("result",)
+)
+LLM_ATTEMPTS = get_metrics().counter(
+    "nl2sql_llm_attempts_total", "LLM calls by outcome (success, error_response, exception)",
+    labelnames=("mode", "outcome")
+)
+LLM_ATTEMPT_SECONDS = get_metrics().histogram(
+    "nl2sql_llm_attempt_seconds", "Duration of single LLM calls", labelnames=("mode",)
+)
+LLM_PROVIDER_ERRORS = get_metrics().counter(
+    "nl2sql_llm_provider_errors_total", "Exceptions raised by the LLM provider", labelnames=("mode", "error")
+)
+LLM_ATTEMPTS_PER_GENERATION = get_metrics().histogram(
+    "nl2sql_llm_attempts_per_generation", "LLM attempts needed per generation",
+    buckets=(1, 2, 3, 4, 5), labelnames=("mode", "result")
+)
+
+
+# --- Per-request stage timing ---
+
+def record_stage(name: str, seconds: float) -> None:
+    """Record a stage duration in the histogram and the current request's timings."""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as one pipeline stage.
+
+    Usage:
+        with stage("embedding"):
+            embedding = sem_cache.generate_embedding(question)
+    """
+    if not metrics_enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def begin_request():
+    """
+    Start collecting stage timings for the current request.
+
+    Returns:
+        Tuple of (timings list, context token for end_request)
+    """
+    timings: List[Tuple[str, float]] = []
+    return timings, _request_timings.set(timings)
+
+
+def end_request(token) -> None:
+    _request_timings.reset(token)
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """
+    Format stage timings as a Server-Timing header value.
+
+    Repeated stages (e.g. LLM retries inside one stage, several DB commits)
+    are summed; durations are in milliseconds.
+    """
+    merged: Dict[str, float] = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in merged.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def timed(name: str):
+    """Decorator form of stage() for functions that are one stage."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+"""
+Model Bundle Module
+
+Offline, pinned embedding models for deployments without hub access.
+
+A bundle is a sentence-transformers model directory plus a bundle.json
+manifest written by build_model_bundle.py:
+
+    bundle.json            model_id, revision, per-file sha256 and size
+    model.safetensors      transformer weights (required: no pickle files)
+    config.json, tokenizer.json, modules.json, 1_Pooling/, ...
+    onnx/                  optional export for the "onnx" embedding backend
+
+Loading a bundle never touches the network. The manifest's model_id must
+match the configured model_name (and its revision model_bundle_revision, if
+set), and every file is checked against its checksum before use. Any
+mismatch raises ModelBundleError instead of loading something else.
+
+Weights are memory-mapped read-only from model.safetensors and assigned to
+the model's parameters without a copy. The pages belong to the page cache,
+so uvicorn workers on one host share a single copy of the weights.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import warnings
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "bundle.json"
+BUNDLE_FORMAT_VERSION = 1
+WEIGHTS_FILE = "model.safetensors"
+
+# safetensors dtype -> numpy dtype (BF16 is kept as raw uint16, see load_mmap_state_dict)
+SAFETENSORS_DTYPES = {
+    "F64": np.float64, "F32": np.float32, "F16": np.float16, "BF16": np.uint16,
+    "I64": np.int64, "I32": np.int32, "I16": np.int16, "I8": np.int8,
+    "U8": np.uint8, "BOOL": np.bool_,
+}
+
+
+class ModelBundleError(Exception):
+    """Raised when a bundle is missing, does not match the pinned model, or fails verification."""
+    pass
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(bundle_path: str) -> dict:
+    """Read bundle.json; raises ModelBundleError if it is missing or unreadable."""
+    manifest_path = os.path.join(bundle_path, MANIFEST_FILE)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ModelBundleError(f"No {MANIFEST_FILE} in {bundle_path} (build it with build_model_bundle.py)")
+    except (OSError, ValueError) as e:
+        raise ModelBundleError(f"Unreadable {manifest_path}: {e}")
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ModelBundleError(f"Unsupported bundle format version {manifest.get('format_version')}")
+    return manifest
+
+
+def verify_bundle(
+    bundle_path: str,
+    model_id: Optional[str] = None,
+    revision: Optional[str] = None,
+    verify_checksums: bool = True
+) -> dict:
+    """
+    Check a bundle against its manifest and the pinned model.
+
+    Args:
+        bundle_path: Bundle directory
+        model_id: Expected model_id (None: accept any)
+        revision: Expected revision (None: accept any)
+        verify_checksums: Hash every file (otherwise only sizes are compared)
+
+    Returns:
+        The manifest
+
+    Raises:
+        ModelBundleError: On any mismatch
+    """
+    manifest = read_manifest(bundle_path)
+    if model_id and manifest.get("model_id") != model_id:
+        raise ModelBundleError(f"Bundle holds {manifest.get('model_id')!r}, expected pinned model {model_id!r}")
+    if revision and manifest.get("revision") != revision:
+        raise ModelBundleError(f"Bundle revision {manifest.get('revision')!r}, expected pinned revision {revision!r}")
+
+    files = manifest.get("files") or {}
+    if WEIGHTS_FILE not in files:
+        raise ModelBundleError(f"Bundle has no {WEIGHTS_FILE}")
+    for name, expected in files.items():
+        path = os.path.join(bundle_path, name)
+        if not os.path.isfile(path):
+            raise ModelBundleError(f"Bundle file missing: {name}")
+        if os.path.getsize(path) != expected["bytes"]:
+            raise ModelBundleError(f"Bundle file size mismatch: {name}")
+        if verify_checksums and file_sha256(path) != expected["sha256"]:
+            raise ModelBundleError(f"Bundle checksum mismatch: {name}")
+    return manifest
+
+
+def load_mmap_state_dict(path: str) -> Dict[str, np.ndarray]:
+    """
+    Map a safetensors file read-only and return zero-copy array views.
+
+    BF16 tensors come back as uint16 arrays with the raw bits.
+    """
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=8 + header_size)
+    tensors = {}
+    for name, info in header.items():
+        dtype = SAFETENSORS_DTYPES.get(info["dtype"])
+        if dtype is None:
+            raise ModelBundleError(f"Unsupported safetensors dtype {info['dtype']} for {name}")
+        start, end = info["data_offsets"]
+        tensors[name] = data[start:end].view(dtype).reshape(info["shape"])
+    return tensors
+
+
+def _assign_mmap_weights(model, weights_path: str) -> Tuple[bool, int]:
+    """
+    Point the transformer's parameters at the mapped weights.
+
+    Returns:
+        (weights are mapped, mapped bytes)
+    """
+    import torch
+
+    transformer = model[0].auto_model
+    arrays = load_mmap_state_dict(weights_path)
+    # The hub's weight names may carry the architecture prefix ("bert.")
+    own_state = transformer.state_dict()
+    prefix = getattr(transformer, "base_model_prefix", "") + "."
+    state = {}
+    with warnings.catch_warnings():
+        # The mapping is read-only; inference never writes to parameters
+        warnings.simplefilter("ignore", UserWarning)
+        for name, array in arrays.items():
+            key = name if name in own_state or not name.startswith(prefix) else name[len(prefix):]
+            if key not in own_state:
+                continue
+            tensor = torch.from_numpy(array)
+            if array.dtype == np.uint16 and own_state[key].dtype == torch.bfloat16:
+                tensor = tensor.view(torch.bfloat16)
+            state[key] = tensor
+
+    try:
+        # assign=True (torch >= 2.1) keeps the mapped tensors instead of copying into the parameters
+        transformer.load_state_dict(state, strict=False, assign=True)
+    except TypeError:
+        logger.warning("torch < 2.1 cannot assign mapped weights; each worker keeps a private copy")
+        return False, 0
+    return True, sum(t.nbytes for t in state.values())
+
+
+def load_bundle_model(
+    bundle_path: str,
+    model_id: Optional[str] = None,
+    revision: Optional[str] = None,
+    verify_checksums: bool = True,
+    mmap_weights: bool = True
+):
+    """
+    Load a SentenceTransformer from a verified bundle, offline.
+
+    Returns:
+        (model, info dict for health reporting)
+
+    Raises:
+        ModelBundleError: Bundle missing, unpinned or corrupt
+    """
+    manifest = verify_bundle(bundle_path, model_id, revision, verify_checksums)
+    # Refuse hub lookups for anything the bundle does not hold
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    # Imported here: sentence_transformers (and torch) take seconds to import
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(bundle_path, device="cpu")
+
+    mapped, mapped_bytes = False, 0
+    if mmap_weights:
+        mapped, mapped_bytes = _assign_mmap_weights(model, os.path.join(bundle_path, WEIGHTS_FILE))
+    model.eval()
+
+    info = {
+        "source": "bundle",
+        "path": bundle_path,
+        "model_id": manifest.get("model_id"),
+        "revision": manifest.get("revision"),
+        "checksums_verified": verify_checksums,
+        "weights": "mmap" if mapped else "private",
+        "mapped_mb": round(mapped_bytes / (1024 * 1024), 1),
+    }
+    return model, info
@@ -0,0 +1,362 @@
+"""
+Schema Pruner Module
+
+Relevance-based schema linking before prompt building.
+
+format_schema_for_model() puts every table into the prompt, so prompt size
+and LLM latency grow with the schema regardless of the question. For
+schemas above a size threshold, the pruner scores each table against the
+question with:
+- embedding similarity to precomputed per-table and per-column embeddings
+  (cached per schema hash, computed once with the semantic cache model)
+- lexical overlap between question words and table/column names
+
+It keeps the top-k tables plus the tables needed to join them along
+declared foreign keys, within a prompt token budget.
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from app.schemas.payload import TableDef, RelationshipDef
+from app.core.cache_config import get_cache_config
+from app.core.schema_validator import format_schema_for_model
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[A-Za-z][a-z]*|[0-9]+")
+
+# Question words that never identify a table or column
+_STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "with", "and", "or", "from",
+    "all", "each", "every", "per", "is", "are", "was", "were", "be", "that", "which",
+    "who", "what", "how", "many", "much", "show", "list", "find", "get", "give", "me",
+    "display", "return", "their", "its", "than", "have", "has", "do", "does",
+}
+
+
+def _words(text: str) -> List[str]:
+    """Split identifiers/sentences into lowercase words (snake_case and camelCase aware)."""
+    return [w.lower() for w in _WORD_RE.findall(text.replace("_", " "))]
+
+
+def _stem(word: str) -> str:
+    """Very light plural stemming so 'orders' matches 'order' and 'categories' matches 'category'."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _terms(text: str) -> Set[str]:
+    return {_stem(w) for w in _words(text)}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about 4 characters per token for schema text)."""
+    return (len(text) + 3) // 4
+
+
+class SchemaProfile:
+    """
+    Precomputed per-table data for one schema: name terms, column terms and embeddings.
+    """
+
+    __slots__ = ("table_names", "table_terms", "column_terms", "table_vectors", "column_vectors", "column_owner")
+
+    def __init__(self, tables: List[TableDef], embed: Optional[Callable[[List[str]], Any]] = None):
+        self.table_names = [t.name for t in tables]
+        self.table_terms = [_terms(t.name) for t in tables]
+        self.column_terms = [set().union(*[_terms(c.name) for c in t.columns]) if t.columns else set() for t in tables]
+
+        self.table_vectors: Optional[np.ndarray] = None
+        self.column_vectors: Optional[np.ndarray] = None
+        self.column_owner: Optional[np.ndarray] = None
+        if embed is None:
+            return
+
+        table_texts = [
+            f"{' '.join(_words(t.name))}: {', '.join(' '.join(_words(c.name)) for c in t.columns)}"
+            for t in tables
+        ]
+        column_texts = []
+        owners = []
+        for i, t in enumerate(tables):
+            for c in t.columns:
+                column_texts.append(f"{' '.join(_words(t.name))} {' '.join(_words(c.name))}")
+                owners.append(i)
+
+        vectors = np.asarray(embed(table_texts + column_texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        self.table_vectors = vectors[:len(table_texts)]
+        self.column_vectors = vectors[len(table_texts):]
+        self.column_owner = np.asarray(owners, dtype=np.int64)
+
+
+class PruneResult:
+    """Pruned schema plus size accounting."""
+
+    __slots__ = ("tables", "relationships", "formatted_schema", "dropped", "original_tokens", "pruned_tokens")
+
+    def __init__(self, tables, relationships, formatted_schema, dropped, original_tokens, pruned_tokens):
+        self.tables: List[TableDef] = tables
+        self.relationships: List[RelationshipDef] = relationships
+        self.formatted_schema: str = formatted_schema
+        self.dropped: List[str] = dropped
+        self.original_tokens: int = original_tokens
+        self.pruned_tokens: int = pruned_tokens
+
+    @property
+    def reduction(self) -> float:
+        """Fraction of prompt schema tokens removed (0.0 = unchanged)."""
+        if not self.original_tokens:
+            return 0.0
+        return 1.0 - self.pruned_tokens / self.original_tokens
+
+
+class SchemaPruner:
+    """
+    Selects the tables relevant to a question and formats only those.
+    """
+
+    def __init__(
+        self,
+        top_k: int = 5,
+        token_budget: int = 1500,
+        min_tables: int = 8,
+        lexical_weight: float = 0.4,
+        max_profiles: int = 64,
+        embed: Optional[Callable[[List[str]], Any]] = None
+    ):
+        """
+        Initialize the pruner.
+
+        Args:
+            top_k: Number of highest-scoring tables to keep (join tables come on top)
+            token_budget: Maximum estimated tokens for the pruned schema text
+            min_tables: Schemas with fewer tables are never pruned
+            lexical_weight: Weight of lexical score vs embedding score (0-1)
+            max_profiles: Schema profiles (table/column embeddings) kept in memory (LRU)
+            embed: Callable encoding a list of texts; None for lexical-only scoring
+        """
+        self.top_k = max(1, top_k)
+        self.token_budget = token_budget
+        self.min_tables = min_tables
+        self.lexical_weight = min(max(lexical_weight, 0.0), 1.0)
+        self.max_profiles = max(1, max_profiles)
+        self.embed = embed
+
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[str, SchemaProfile]" = OrderedDict()
+
+    def profile(self, schema_hash: Optional[str], tables: List[TableDef]) -> SchemaProfile:
+        """Get or build the precomputed profile for a schema."""
+        if schema_hash is not None:
+            with self._lock:
+                cached = self._profiles.get(schema_hash)
+                if cached is not None:
+                    self._profiles.move_to_end(schema_hash)
+                    return cached
+
+        try:
+            built = SchemaProfile(tables, self.embed)
+        except Exception as e:
+            logger.warning("Schema pruning: embeddings unavailable, using lexical scores only", extra={"error": str(e)})
+            built = SchemaProfile(tables, None)
+
+        if schema_hash is not None:
+            with self._lock:
+                self._profiles[schema_hash] = built
+                while len(self._profiles) > self.max_profiles:
+                    self._profiles.popitem(last=False)
+        return built
+
+    def score_tables(
+        self,
+        question: str,
+        profile: SchemaProfile,
+        question_embedding: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Relevance of every table to the question (higher is more relevant).
+
+        Args:
+            question: User's natural language question
+            profile: Schema profile
+            question_embedding: Question vector (None for lexical-only scoring)
+
+        Returns:
+            Array with one score per table
+        """
+        q_terms = _terms(question) - _STOPWORDS
+        lexical = np.zeros(len(profile.table_names), dtype=np.float32)
+        if q_terms:
+            for i, (name_terms, col_terms) in enumerate(zip(profile.table_terms, profile.column_terms)):
+                name_hits = len(q_terms & name_terms)
+                col_hits = len(q_terms & col_terms)
+                # A table-name match counts double a column match
+                lexical[i] = min((2.0 * name_hits + col_hits) / len(q_terms), 1.0)
+
+        if question_embedding is None or profile.table_vectors is None:
+            return lexical
+
+        q = np.asarray(question_embedding, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0:
+            return lexical
+        q = q / q_norm
+
+        semantic = profile.table_vectors @ q
+        if profile.column_vectors is not None and len(profile.column_vectors):
+            column_scores = profile.column_vectors @ q
+            best_column = np.full(len(semantic), -1.0, dtype=np.float32)
+            np.maximum.at(best_column, profile.column_owner, column_scores)
+            semantic = np.maximum(semantic, best_column)
+
+        return self.lexical_weight * lexical + (1.0 - self.lexical_weight) * semantic
+
+    @staticmethod
+    def _join_graph(tables: List[TableDef], relationships: List[RelationshipDef]) -> Dict[str, Set[str]]:
+        """Undirected table graph from declared relationships and column FK references."""
+        graph: Dict[str, Set[str]] = {t.name: set() for t in tables}
+
+        def link(a: str, b: str) -> None:
+            if a in graph and b in graph and a != b:
+                graph[a].add(b)
+                graph[b].add(a)
+
+        for rel in relationships:
+            link(rel.from_table, rel.to_table)
+        for t in tables:
+            for c in t.columns:
+                if c.isForeignKey and c.fkTable:
+                    link(t.name, c.fkTable)
+        return graph
+
+    @staticmethod
+    def _join_path(graph: Dict[str, Set[str]], start: str, targets: Set[str]) -> List[str]:
+        """Shortest path (BFS) from start to any target table, excluding start; [] if unreachable."""
+        if not targets or start in targets:
+            return []
+        parent = {start: None}
+        frontier = deque([start])
+        while frontier:
+            node = frontier.popleft()
+            for nxt in graph.get(node, ()):
+                if nxt in parent:
+                    continue
+                parent[nxt] = node
+                if nxt in targets:
+                    path = []
+                    step = parent[nxt]
+                    while step is not None and step != start:
+                        path.append(step)
+                        step = parent[step]
+                    return path
+                frontier.append(nxt)
+        return []
+
+    def prune(
+        self,
+        question: str,
+        tables: List[TableDef],
+        relationships: List[RelationshipDef],
+        schema_hash: Optional[str] = None,
+        question_embedding: Optional[np.ndarray] = None,
+        formatted_schema: Optional[str] = None
+    ) -> PruneResult:
+        """
+        Keep the tables relevant to the question.
+
+        Args:
+            question: User's natural language question
+            tables: Full list of TableDef objects
+            relationships: Full list of RelationshipDef objects
+            schema_hash: Schema hash used to cache the schema profile
+            question_embedding: Question vector (None for lexical-only scoring)
+            formatted_schema: Already formatted full schema, if available
+
+        Returns:
+            PruneResult (the full schema when the schema is small)
+        """
+        full_text = formatted_schema or format_schema_for_model(tables, relationships)
+        original_tokens = estimate_tokens(full_text)
+        if len(tables) < self.min_tables:
+            return PruneResult(tables, relationships, full_text, [], original_tokens, original_tokens)
+
+        profile = self.profile(schema_hash, tables)
+        scores = self.score_tables(question, profile, question_embedding)
+        ranked = [int(i) for i in np.argsort(-scores, kind="stable")]
+
+        by_name = {t.name: t for t in tables}
+        graph = self._join_graph(tables, relationships)
+        table_tokens = {t.name: estimate_tokens(format_schema_for_model([t], [])) for t in tables}
+
+        kept: List[str] = []
+        kept_set: Set[str] = set()
+        used_tokens = 0
+        for idx in ranked[:self.top_k]:
+            name = profile.table_names[idx]
+            if name in kept_set:
+                continue
+            # Tables needed to join this one to what is already kept
+            additions = [name] + [t for t in self._join_path(graph, name, kept_set) if t not in kept_set]
+            cost = sum(table_tokens[t] for t in additions)
+            if kept and used_tokens + cost > self.token_budget:
+                continue
+            for t in additions:
+                kept.append(t)
+                kept_set.add(t)
+            used_tokens += cost
+
+        # Preserve the original table order in the prompt
+        pruned_tables = [t for t in tables if t.name in kept_set]
+        pruned_relationships = [
+            r for r in relationships if r.from_table in kept_set and r.to_table in kept_set
+        ]
+        pruned_text = format_schema_for_model(pruned_tables, pruned_relationships)
+        dropped = [t.name for t in tables if t.name not in kept_set]
+        return PruneResult(
+            pruned_tables, pruned_relationships, pruned_text, dropped,
+            original_tokens, estimate_tokens(pruned_text)
+        )
+
+
+# Global pruner instance (singleton)
+_schema_pruner_instance = None
+
+
+def get_schema_pruner() -> SchemaPruner:
+    """Get or create global schema pruner (embeddings from the semantic cache model)."""
+    global _schema_pruner_instance
+    if _schema_pruner_instance is None:
+        # Inline import keeps the pruner usable without sentence-transformers installed
+        from app.core.semantic_cache import get_semantic_cache
+        sem_cache = get_semantic_cache()
+
+        def embed(texts: List[str]):
+            if not sem_cache.model:
+                raise RuntimeError("Embedding model unavailable")
+            return sem_cache._encode_batch(texts)
+
+        lexical_weight = get_cache_config("schema_pruning_lexical_weight")
+        if lexical_weight is None:
+            lexical_weight = 0.4
+
+        _schema_pruner_instance = SchemaPruner(
+            top_k=get_cache_config("schema_pruning_top_k") or 5,
+            token_budget=get_cache_config("schema_pruning_token_budget") or 1500,
+            min_tables=get_cache_config("schema_pruning_min_tables") or 8,
+            lexical_weight=lexical_weight,
+            embed=embed
+        )
+    return _schema_pruner_instance
@@ -0,0 +1,212 @@
+"""
+Schema Registry Module
+
+Stores validated schemas under their schema hash.
+
+A client registers its schema once (POST /schemas) and then sends only the
+schema_hash with each question. Resolving a hash returns the parsed tables,
+relationships and the pre-formatted prompt text, so repeat questions skip
+pydantic parsing of the schema, validate_schema, format_schema_for_model and
+hashing. Resolved schemas are kept in a bounded per-worker LRU; misses fall
+back to the registered_schemas table.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+from app.schemas.payload import TableDef, RelationshipDef
+from app.core.cache_config import get_cache_config
+from app.core.semantic_cache import get_semantic_cache
+from app.core.schema_validator import validate_schema, format_schema_for_model, SchemaValidationError
+from app.models.schema_registry import RegisteredSchema
+
+
+class SchemaNotFoundError(Exception):
+    """Raised when a schema_hash has not been registered."""
+    pass
+
+
+class ParsedSchema:
+    """A validated schema ready for prompt building and cache lookups."""
+
+    __slots__ = ("schema_hash", "database_type", "tables", "relationships", "formatted_schema", "logical_schema_hash")
+
+    def __init__(
+        self,
+        schema_hash: str,
+        database_type: str,
+        tables: List[TableDef],
+        relationships: List[RelationshipDef],
+        formatted_schema: str
+    ):
+        self.schema_hash = schema_hash
+        self.database_type = database_type
+        self.tables = tables
+        self.relationships = relationships
+        self.formatted_schema = formatted_schema
+        # Same tables in any dialect (cross-dialect cache reuse)
+        self.logical_schema_hash = get_semantic_cache().generate_schema_hash(tables, relationships, None)
+
+
+class SchemaRegistry:
+    """
+    Registered schemas with a bounded in-process LRU in front of the database.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        """
+        Initialize the registry.
+
+        Args:
+            max_entries: Maximum parsed schemas kept in memory
+        """
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._schemas: "OrderedDict[str, ParsedSchema]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, parsed: ParsedSchema) -> None:
+        with self._lock:
+            self._schemas[parsed.schema_hash] = parsed
+            self._schemas.move_to_end(parsed.schema_hash)
+            while len(self._schemas) > self.max_entries:
+                self._schemas.popitem(last=False)
+
+    def register(
+        self,
+        db: Session,
+        tables: List[TableDef],
+        relationships: List[RelationshipDef],
+        database_type: str,
+        user_id: Optional[int] = None
+    ) -> ParsedSchema:
+        """
+        Validate a schema and store it under its hash.
+
+        The first registration of a hash wins: registering the same names and
+        types again (even with other constraints or defaults) returns the
+        stored schema unchanged.
+
+        Args:
+            db: Database session
+            tables: List of TableDef objects
+            relationships: List of RelationshipDef objects
+            database_type: Database dialect
+            user_id: Optional ID of the registering user
+
+        Returns:
+            The parsed schema as stored
+
+        Raises:
+            SchemaValidationError: If the schema is invalid
+        """
+        if not tables:
+            raise SchemaValidationError("Tables definition cannot be empty")
+
+        is_valid, error_msg = validate_schema(tables, relationships)
+        if not is_valid:
+            raise SchemaValidationError(f"Schema validation error: {error_msg}")
+
+        schema_hash = get_semantic_cache().generate_schema_hash(tables, relationships, database_type)
+        # Registrations are immutable: the hash covers names and types only, so
+        # letting a later caller overwrite the stored constraints would change
+        # the prompt for everyone using the hash (and workers' LRUs would disagree)
+        row = db.query(RegisteredSchema).filter(RegisteredSchema.schema_hash == schema_hash).first()
+        if row is not None:
+            return self._from_row(row)
+
+        parsed = ParsedSchema(
+            schema_hash=schema_hash,
+            database_type=database_type,
+            tables=list(tables),
+            relationships=list(relationships),
+            formatted_schema=format_schema_for_model(tables, relationships)
+        )
+        row = RegisteredSchema(
+            schema_hash=schema_hash,
+            user_id=user_id,
+            database_type=database_type,
+            tables=[t.model_dump() for t in tables],
+            relationships=[r.model_dump() for r in relationships],
+            formatted_schema=parsed.formatted_schema
+        )
+        try:
+            with db.begin_nested():
+                db.add(row)
+            db.commit()
+        except IntegrityError:
+            # Registered concurrently by another worker: its registration wins
+            db.rollback()
+            row = db.query(RegisteredSchema).filter(RegisteredSchema.schema_hash == schema_hash).one()
+            return self._from_row(row)
+
+        self._remember(parsed)
+        return parsed
+
+    def _from_row(self, row: RegisteredSchema) -> ParsedSchema:
+        """Parse a stored registration and keep it in the LRU."""
+        parsed = ParsedSchema(
+            schema_hash=row.schema_hash,
+            database_type=row.database_type,
+            tables=[TableDef(**t) for t in row.tables],
+            relationships=[RelationshipDef(**r) for r in row.relationships],
+            formatted_schema=row.formatted_schema
+        )
+        self._remember(parsed)
+        return parsed
+
+    def resolve(self, db: Session, schema_hash: str) -> ParsedSchema:
+        """
+        Look up a registered schema by hash.
+
+        Args:
+            db: Database session
+            schema_hash: Hash returned by register()
+
+        Returns:
+            The parsed schema
+
+        Raises:
+            SchemaNotFoundError: If no schema is registered under this hash
+        """
+        with self._lock:
+            parsed = self._schemas.get(schema_hash)
+            if parsed is not None:
+                self._schemas.move_to_end(schema_hash)
+                self.hits += 1
+                return parsed
+            self.misses += 1
+
+        row = db.query(RegisteredSchema).filter(RegisteredSchema.schema_hash == schema_hash).first()
+        if row is None:
+            raise SchemaNotFoundError(f"Schema '{schema_hash}' is not registered")
+        return self._from_row(row)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            size = len(self._schemas)
+        return {
+            "resident": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Global registry instance (singleton)
+_schema_registry_instance = None
+
+
+def get_schema_registry() -> SchemaRegistry:
+    """Get or create global schema registry instance."""
+    global _schema_registry_instance
+    if _schema_registry_instance is None:
+        _schema_registry_instance = SchemaRegistry(
+            max_entries=get_cache_config("schema_registry_max_entries") or 128
+        )
+    return _schema_registry_instance
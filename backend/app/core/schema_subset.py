@@ -0,0 +1,226 @@
+"""
+Schema Subset Module
+
+Table-level fingerprints for cache entries.
+
+The schema hash covers the whole schema, so any edit (one new column on an
+unrelated table) moves every cached query to a new, empty cache space. Each
+entry therefore also records the fingerprints of just the tables its SQL
+references. An entry stays usable for any schema in which all of those
+tables are unchanged, whatever happens to the rest of the schema.
+
+The semantic_cache_table_refs table is the inverted index: table fingerprint
+-> entries. An entry is compatible with a schema when every one of its
+references is among the schema's table fingerprints.
+
+Request paths never aggregate over the refs table: exact lookups check the
+few rows with the same question fingerprint (compatible_entries), and
+resident indexes keep a CompatibleEntries set that is updated incrementally.
+"""
+
+import hashlib
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.core.security import to_sqlglot_dialect
+from app.models.cache import SemanticQueryCache, CacheTableRef
+
+
+def table_fingerprint(table) -> str:
+    """
+    SHA-256 of one table's name and its columns' names and types.
+
+    Args:
+        table: TableDef
+
+    Returns:
+        Hex digest (stable across column order)
+    """
+    payload = json.dumps({
+        "name": table.name.lower(),
+        "columns": sorted([c.name.lower(), c.type] for c in table.columns),
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def schema_table_fingerprints(tables: Sequence) -> Dict[str, str]:
+    """Fingerprint of every table, keyed by lowercase table name."""
+    return {t.name.lower(): table_fingerprint(t) for t in tables}
+
+
+def referenced_table_fingerprints(sql: str, tables: Sequence, database_type: str = "MySQL") -> Optional[List[str]]:
+    """
+    Fingerprints of the schema tables a query references.
+
+    Args:
+        sql: Valid SQL
+        tables: Schema the SQL was generated for
+        database_type: Database dialect
+
+    Returns:
+        Sorted fingerprints, or None if the SQL could not be analyzed, references
+        no table, or references a table that is not in the schema
+    """
+    try:
+        tree = sqlglot.parse_one(sql, read=to_sqlglot_dialect(database_type))
+    except Exception:
+        return None
+    if tree is None:
+        return None
+
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    fingerprints = schema_table_fingerprints(tables)
+    referenced = set()
+    for table in tree.find_all(exp.Table):
+        name = table.name.lower()
+        if not name or name in ctes:
+            continue
+        if name not in fingerprints:
+            return None
+        referenced.add(fingerprints[name])
+    return sorted(referenced) or None
+
+
+def compatible_entry_ids(
+    table_fingerprints: Sequence[str],
+    database_type: Optional[str] = None,
+    exclude_schema_hash: Optional[str] = None,
+    after_id: Optional[int] = None,
+    upto_id: Optional[int] = None
+):
+    """
+    Subquery of cache entry ids whose referenced tables are all in table_fingerprints.
+
+    This aggregates over table refs, so it is for occasional loads
+    (CompatibleEntries), not for every request.
+
+    Args:
+        table_fingerprints: Fingerprints of the current schema's tables
+        database_type: Only entries of this dialect
+        exclude_schema_hash: Leave out the entries of this schema (they match by hash)
+        after_id: Only entries with a higher id
+        upto_id: Only entries with this id or lower
+
+    Returns:
+        SQLAlchemy select usable with SemanticQueryCache.id.in_()
+    """
+    query = select(CacheTableRef.entry_id).join(
+        SemanticQueryCache, SemanticQueryCache.id == CacheTableRef.entry_id
+    ).where(
+        CacheTableRef.table_fingerprint.in_(list(table_fingerprints))
+    )
+    if database_type is not None:
+        query = query.where(SemanticQueryCache.database_type == database_type)
+    if exclude_schema_hash is not None:
+        query = query.where(SemanticQueryCache.schema_hash != exclude_schema_hash)
+    if after_id is not None:
+        query = query.where(CacheTableRef.entry_id > after_id)
+    if upto_id is not None:
+        query = query.where(CacheTableRef.entry_id <= upto_id)
+    return query.group_by(
+        CacheTableRef.entry_id, SemanticQueryCache.table_ref_count
+    ).having(
+        func.count(CacheTableRef.table_fingerprint) == SemanticQueryCache.table_ref_count
+    )
+
+
+def compatible_entries(db: Session, entry_ids: Iterable[int], table_fingerprints: Sequence[str]) -> Set[int]:
+    """
+    Which of a few given entries have all their referenced tables in table_fingerprints.
+
+    One keyed query on the entries' own table refs, for checking a handful of
+    candidates (e.g. exact-match rows of other schema versions).
+
+    Args:
+        db: Database session
+        entry_ids: Candidate entry ids
+        table_fingerprints: Fingerprints of the current schema's tables
+
+    Returns:
+        The compatible ids
+    """
+    entry_ids = list(entry_ids)
+    if not entry_ids:
+        return set()
+    allowed = set(table_fingerprints)
+    matched: Dict[int, int] = {}
+    expected: Dict[int, Optional[int]] = {}
+    rejected = set()
+    rows = db.query(
+        CacheTableRef.entry_id, CacheTableRef.table_fingerprint, SemanticQueryCache.table_ref_count
+    ).join(
+        SemanticQueryCache, SemanticQueryCache.id == CacheTableRef.entry_id
+    ).filter(CacheTableRef.entry_id.in_(entry_ids)).all()
+    for entry_id, fingerprint, ref_count in rows:
+        expected[entry_id] = ref_count
+        if fingerprint in allowed:
+            matched[entry_id] = matched.get(entry_id, 0) + 1
+        else:
+            rejected.add(entry_id)
+    return {i for i, n in matched.items() if i not in rejected and n == expected[i]}
+
+
+class CompatibleEntries:
+    """
+    Materialized set of entries from other versions of one schema whose
+    referenced tables are all unchanged in it.
+
+    refresh() only aggregates the table refs added since the previous call
+    (entries and their refs are committed together), so keeping the set
+    current costs an indexed MAX(entry_id) per call. Deletions and refs
+    committed out of id order are picked up by a full reload every
+    reload_seconds.
+    """
+
+    def __init__(
+        self,
+        schema_hash: str,
+        database_type: str,
+        table_fingerprints: Sequence[str],
+        reload_seconds: float = 300.0
+    ):
+        self.schema_hash = schema_hash
+        self.database_type = database_type
+        self.table_fingerprints = list(table_fingerprints)
+        self.reload_seconds = reload_seconds
+        self.ids: Set[int] = set()
+        self._watermark = 0  # Highest table-ref entry id aggregated so far
+        self._loaded_at: Optional[float] = None
+
+    def _load(self, db: Session, upto_id: int, after_id: Optional[int] = None) -> Set[int]:
+        return set(db.scalars(compatible_entry_ids(
+            self.table_fingerprints,
+            database_type=self.database_type,
+            exclude_schema_hash=self.schema_hash,
+            after_id=after_id,
+            upto_id=upto_id
+        )))
+
+    def refresh(self, db: Session) -> Tuple[Set[int], Set[int]]:
+        """
+        Bring the set up to date.
+
+        Returns:
+            (ids added, ids removed) since the previous call
+        """
+        top = db.query(func.max(CacheTableRef.entry_id)).scalar() or 0
+        now = time.monotonic()
+        if self._loaded_at is None or now - self._loaded_at >= self.reload_seconds:
+            ids = self._load(db, top)
+            added, removed = ids - self.ids, self.ids - ids
+            self.ids = ids
+            self._loaded_at = now
+        elif top > self._watermark:
+            added = self._load(db, top, after_id=self._watermark) - self.ids
+            removed = set()
+            self.ids |= added
+        else:
+            added, removed = set(), set()
+        self._watermark = top
+        return added, removed
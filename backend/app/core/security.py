@@ -1,27 +1,124 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
 import sqlglot
 from sqlglot import exp
 
-def validate_sql(sql: str, dialect: str = "mysql") -> (bool, str):
+from app.core.cache_config import get_cache_config
+
+logger = logging.getLogger(__name__)
+
+# Map common display names to sqlglot dialects
+SQLGLOT_DIALECTS = {
+    "MySQL": "mysql",
+    "PostgreSQL": "postgres",
+    "SQLite": "sqlite",
+    "SQL Server": "tsql",
+    "Oracle": "oracle"
+}
+
+def to_sqlglot_dialect(dialect: str) -> str:
+    """Resolve a display dialect name to its sqlglot dialect (defaults to mysql)."""
+    return SQLGLOT_DIALECTS.get(dialect, "mysql")
+
+def terminate_sql(sql: str) -> str:
+    """End SQL with a single ';', as generated (and so cached) SQL does."""
+    return sql.rstrip().rstrip(";").rstrip() + ";"
+
+class ValidationCache:
+    """
+    Bounded LRU of validation results keyed by a hash of (dialect, sql).
+    
+    Generated SQL repeats a lot (cache hits, retries, history replays), and
+    sqlglot parsing of long CTE queries is not free.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[bool, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(sql: str, dialect: str) -> str:
+        return hashlib.sha256(f"{dialect}\0{sql}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[bool, str]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: Tuple[bool, str]) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+validation_cache = ValidationCache(get_cache_config("sql_validation_cache_size") or 2048)
+
+
+def validate_sql(sql: str, dialect: str = "mysql") -> Tuple[bool, str]:
     """
     Validates the generated SQL using sqlglot.
     Checks for syntax errors based on the specified dialect.
+    Results are memoized per worker (ValidationCache).
     """
-    # Map common display names to sqlglot dialects
-    dialect_map = {
-        "MySQL": "mysql",
-        "PostgreSQL": "postgres",
-        "SQLite": "sqlite",
-        "SQL Server": "tsql",
-        "Oracle": "oracle"
-    }
-    
-    selected_dialect = dialect_map.get(dialect, "mysql")
-    
-    if selected_dialect is None:
-        return True, "Validation skipped for this dialect"
+    selected_dialect = to_sqlglot_dialect(dialect)
+    key = ValidationCache.key(sql, selected_dialect)
+    cached = validation_cache.get(key)
+    if cached is not None:
+        return cached
+
+    try:
+        sqlglot.parse_one(sql, read=selected_dialect)
+        result = (True, "Valid")
+    except Exception as e:
+        result = (False, f"Syntax Error: {str(e)}")
 
+    validation_cache.put(key, result)
+    return result
+
+
+def transpile_sql(sql: str, from_dialect: str, to_dialect: str) -> Optional[str]:
+    """
+    Translate SQL between display dialects with sqlglot.
+
+    Constructs the target dialect cannot express raise instead of being
+    emitted as-is, so a translation is either faithful or None.
+
+    Args:
+        sql: SQL in from_dialect
+        from_dialect: Display dialect of the input
+        to_dialect: Display dialect of the output
+
+    Returns:
+        Translated SQL, or None if it could not be translated
+    """
     try:
-        parsed = sqlglot.parse_one(sql, read=selected_dialect)
-        return True, "Valid"
+        statements = sqlglot.transpile(
+            sql,
+            read=to_sqlglot_dialect(from_dialect),
+            write=to_sqlglot_dialect(to_dialect),
+            unsupported_level=sqlglot.ErrorLevel.RAISE
+        )
     except Exception as e:
-        return False, f"Syntax Error: {str(e)}"
+        logger.debug("Could not transpile SQL", extra={"from_dialect": from_dialect, "to_dialect": to_dialect, "error": str(e)})
+        return None
+    statements = [s for s in statements if s.strip()]
+    return terminate_sql(";\n".join(statements)) if statements else None
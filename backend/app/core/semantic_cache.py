@@ -5,13 +5,59 @@ Provides semantic similarity-based caching for NL2SQL queries using sentence tra
 Matches questions based on meaning rather than exact text, reducing redundant AI model calls.
 """
 
+import asyncio
 import hashlib
 import json
+import logging
+import threading
+import time
 import numpy as np
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Callable
 from datetime import datetime, timedelta
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from app.core.similarity_index import SchemaIndex
+from app.core.cache_config import get_cache_config
+from app.core.embedding_batcher import EmbeddingBatcher
+from app.core.embedding_backend import load_embedding_model
+from app.core.logging_config import log_payload
+from app.core.lexical_index import LexicalIndex, lexically_compatible
+from app.core.keyword_filter import impact_mask, keyword_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# Punctuation stripped from the edges of question tokens when fingerprinting.
+# Operators (<, >, =, %) and in-token punctuation ("3.5", "o'brien") are kept
+# because they change the generated SQL.
+_EDGE_PUNCTUATION = ".,;:!?\"'`()[]{}"
+
+
+class CacheStatistics:
+    """
+    Thread-safe in-process hit/miss counters for the cache layers.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+    
+    def record(self, event: str, count: int = 1) -> None:
+        """Increment a counter (no-op when track_statistics is disabled)."""
+        if not get_cache_config("track_statistics"):
+            return
+        with self._lock:
+            self._counts[event] = self._counts.get(event, 0) + count
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Return current counters plus derived hit rates."""
+        with self._lock:
+            counts = dict(self._counts)
+        
+        stats: Dict[str, Any] = {"counters": counts}
+        for layer in ("exact", "semantic", "lexical", "template", "cross_dialect"):
+            hits = counts.get(f"{layer}_hit", 0)
+            total = hits + counts.get(f"{layer}_miss", 0)
+            stats[f"{layer}_hit_rate"] = round(hits / total, 4) if total else 0.0
+        return stats
 
 
 class SemanticCache:
@@ -23,7 +69,14 @@ class SemanticCache:
         self,
         model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
         similarity_threshold: float = 0.92,
-        max_cache_size: int = 1000
+        max_cache_size: int = 1000,
+        index_top_k: int = 8,
+        hybrid_prefilter: bool = False,
+        hybrid_bm25_weight: float = 0.3,
+        hybrid_min_shared_terms: int = 0,
+        batch_embeddings: bool = False,
+        max_batch_size: int = 32,
+        batch_wait_ms: float = 2.0
     ):
         """
         Initialize semantic cache with embedding model.
@@ -32,26 +85,114 @@ class SemanticCache:
             model_name: HuggingFace model for embeddings
             similarity_threshold: Minimum similarity score (0-1) for cache hit
             max_cache_size: Maximum cached queries per schema
+            index_top_k: Candidates ranked before keyword validation falls back to a full sort
+            hybrid_prefilter: Prune index candidates by keyword keys and rank with BM25 + cosine
+            hybrid_bm25_weight: Share of BM25 in the hybrid ranking score
+            hybrid_min_shared_terms: Content terms a hybrid candidate must share with the question
+            batch_embeddings: Micro-batch concurrent generate_embedding calls
+            max_batch_size: Maximum texts per batched encode
+            batch_wait_ms: Window for concurrent requests to join a batch
         """
         self.model_name = model_name
         self.similarity_threshold = similarity_threshold
         self.max_cache_size = max_cache_size
+        self.index_top_k = index_top_k
+        self.hybrid_prefilter = hybrid_prefilter
+        self.hybrid_bm25_weight = hybrid_bm25_weight
+        self.hybrid_min_shared_terms = hybrid_min_shared_terms
+        self.statistics = CacheStatistics()
+        self.batch_embeddings = batch_embeddings
+        self.max_batch_size = max_batch_size
+        self.batch_wait_ms = batch_wait_ms
         self._model = None  # Lazy loading
+        self._model_lock = threading.Lock()
+        self._model_failed_at: Optional[float] = None
+        self.model_info: Dict = {}
+        self.model_error: Optional[str] = None
+        self.zero_vector_fallbacks = 0
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
         
     @property
     def model(self):
-        """Lazy load the sentence transformer model."""
+        """
+        Lazy load the sentence transformer model.
+        
+        Loaded once: callers that arrive while the startup warmup (or another
+        request) is loading it wait for that load instead of starting their own.
+        A failed load is retried after model_retry_seconds (0 disables), so
+        the cache recovers from a transient outage without a restart.
+        """
         if self._model is None:
-            print(f"Loading semantic cache model: {self.model_name}...")
-            try:
-                self._model = SentenceTransformer(self.model_name)
-                print("Model loaded successfully!")
-            except Exception as e:
-                print(f"WARNING: Failed to load semantic cache model: {e}")
-                print("Semantic cache will be DISABLED for this session.")
-                self._model = False # Mark as failed to avoid retrying
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        elif self._model is False and self._retry_due():
+            # One caller retries; the rest keep the fallback instead of waiting
+            if self._model_lock.acquire(blocking=False):
+                try:
+                    if self._model is False and self._retry_due():
+                        self._model = self._load_model()
+                finally:
+                    self._model_lock.release()
         return self._model
     
+    def _retry_due(self) -> bool:
+        retry_seconds = get_cache_config("model_retry_seconds") or 0
+        return bool(retry_seconds) and time.monotonic() - (self._model_failed_at or 0) >= retry_seconds
+    
+    def _load_model(self):
+        logger.info("Loading semantic cache model", extra={"model": self.model_name})
+        try:
+            model, self.model_info = load_embedding_model(self.model_name)
+            self.model_error = None
+            logger.info("Semantic cache model loaded", extra={"model": self.model_name, **self.model_info})
+            return model
+        except Exception as e:
+            self.model_error = f"{type(e).__name__}: {e}"
+            self._model_failed_at = time.monotonic()
+            logger.error(
+                "Failed to load semantic cache model; semantic lookups disabled until it loads",
+                extra={"model": self.model_name, "error": self.model_error}
+            )
+            return False # Mark as failed (retried after model_retry_seconds)
+    
+    @property
+    def model_state(self) -> str:
+        """Model load state: cold (not loaded yet), warm or failed."""
+        if self._model is None:
+            return "cold"
+        return "warm" if self._model else "failed"
+    
+    def model_status(self) -> Dict:
+        """Load state, source and failure reason of the embedding model (for health checks)."""
+        return {
+            "state": self.model_state,
+            "model": self.model_name,
+            **self.model_info,
+            "error": self.model_error,
+            "zero_vector_fallbacks": self.zero_vector_fallbacks,
+        }
+    
+    @property
+    def batcher(self) -> Optional[EmbeddingBatcher]:
+        """Lazily created micro-batching scheduler (None when batching is disabled)."""
+        if not self.batch_embeddings:
+            return None
+        if self._batcher is None:
+            with self._batcher_lock:
+                if self._batcher is None:
+                    self._batcher = EmbeddingBatcher(
+                        self._encode_batch,
+                        max_batch_size=self.max_batch_size,
+                        max_wait_ms=self.batch_wait_ms
+                    )
+        return self._batcher
+    
+    def _encode_batch(self, texts: List[str]):
+        """Encode several texts in one model call."""
+        return self.model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+    
     def generate_embedding(self, text: str) -> List[float]:
         """
         Generate semantic embedding for text.
@@ -63,15 +204,47 @@ class SemanticCache:
             Embedding vector as list of floats
         """
         if not self.model: # Check if model loaded successfully
-             # Return dummy zero vector if model failed
+             # Return dummy zero vector if model failed (counted in model_status)
              # Size 384 is typical for all-MiniLM-L6-v2
+             self.zero_vector_fallbacks += 1
              return [0.0] * 384
              
         try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
+            if self.batcher is not None:
+                embedding = self.batcher.encode(text)
+            else:
+                embedding = self.model.encode(text, convert_to_numpy=True)
             return embedding.tolist()
         except Exception as e:
-            print(f"Error generating embedding: {e}")
+            logger.exception("Error generating embedding")
+            self.zero_vector_fallbacks += 1
+            return [0.0] * 384
+    
+    async def agenerate_embedding(self, text: str) -> List[float]:
+        """
+        Generate semantic embedding without blocking the event loop.
+        
+        Uses the micro-batcher's future when batching is enabled, otherwise
+        runs the encode in the default executor.
+        
+        Args:
+            text: Input text (question)
+            
+        Returns:
+            Embedding vector as list of floats
+        """
+        # First use (model not loaded yet) and the disabled-model case also go
+        # through the executor so model loading never blocks the loop
+        if self.batcher is None or not self._model:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.generate_embedding, text)
+        
+        try:
+            embedding = await self.batcher.encode_async(text)
+            return embedding.tolist()
+        except Exception as e:
+            logger.exception("Error generating embedding")
+            self.zero_vector_fallbacks += 1
             return [0.0] * 384
     
     def compute_similarity(
@@ -89,16 +262,19 @@ class SemanticCache:
         Returns:
             Similarity score (0-1, where 1 is identical)
         """
-        emb1 = np.array(embedding1).reshape(1, -1)
-        emb2 = np.array(embedding2).reshape(1, -1)
-        similarity = cosine_similarity(emb1, emb2)[0][0]
-        return float(similarity)
+        emb1 = np.asarray(embedding1, dtype=np.float64).ravel()
+        emb2 = np.asarray(embedding2, dtype=np.float64).ravel()
+        # Zero vectors score 0, as with sklearn's cosine_similarity
+        norms = np.linalg.norm(emb1) * np.linalg.norm(emb2)
+        if norms == 0:
+            return 0.0
+        return float(np.dot(emb1, emb2) / norms)
     
     def generate_schema_hash(
         self,
         tables: List[Any],
         relationships: List[Any],
-        dialect: str
+        dialect: Optional[str]
     ) -> str:
         """
         Generate unique hash for schema context.
@@ -108,7 +284,8 @@ class SemanticCache:
         Args:
             tables: List of TableDef objects
             relationships: List of RelationshipDef objects
-            dialect: Database dialect (MySQL, PostgreSQL, etc.)
+            dialect: Database dialect (MySQL, PostgreSQL, etc.), or None for the
+                dialect-agnostic hash shared by the same tables in every dialect
             
         Returns:
             SHA-256 hash of schema structure
@@ -125,15 +302,48 @@ class SemanticCache:
             "relationships": sorted([{
                 "from": f"{r.from_table}.{r.from_column}",
                 "to": f"{r.to_table}.{r.to_column}"
-            } for r in relationships], key=lambda x: (x["from"], x["to"])),
-            "dialect": dialect
+            } for r in relationships], key=lambda x: (x["from"], x["to"]))
         }
+        if dialect is not None:
+            schema_dict["dialect"] = dialect
         
         # Generate hash
         schema_json = json.dumps(schema_dict, sort_keys=True, separators=(',', ':'))
-        print(f"DEBUG: Hashing schema JSON: {schema_json}")
+        log_payload(logger, "Hashing schema", lambda: {"schema_json": schema_json})
         return hashlib.sha256(schema_json.encode()).hexdigest()
     
+    def normalize_question(self, question: str) -> str:
+        """
+        Normalize a question for exact-match lookups.
+        
+        Lowercases, collapses whitespace and strips edge punctuation such as
+        trailing "?", so "Show all users?" and "show  all users" match.
+        
+        Args:
+            question: Question text
+            
+        Returns:
+            Normalized question text
+        """
+        tokens = []
+        for token in question.casefold().split():
+            token = token.strip(_EDGE_PUNCTUATION)
+            if token:
+                tokens.append(token)
+        return " ".join(tokens)
+    
+    def generate_question_fingerprint(self, question: str) -> str:
+        """
+        Generate fingerprint of the normalized question.
+        
+        Args:
+            question: Question text
+            
+        Returns:
+            SHA-256 hash of the normalized question
+        """
+        return hashlib.sha256(self.normalize_question(question).encode()).hexdigest()
+    
     def find_similar_query(
         self,
         question: str,
@@ -158,86 +368,125 @@ class SemanticCache:
             
         # Check for zero vector (model failed)
         if not any(question_embedding):
-            print("DEBUG: Zero vector detected (Semantic Cache Disabled)")
+            logger.debug("Zero vector detected (semantic cache disabled)")
             return (None, 0.0)
         
-        best_match = None
-        best_similarity = 0.0
-        
-        for i, cached in enumerate(cached_queries):
-            is_first = (i == 0)
-            if is_first:
-                print(f"DEBUG: Checking first candidate ID={cached.get('id')}")
-            
-            # Skip if different schema
+        # Build a transient index over candidates for this schema and rank
+        # them with one matrix-vector product instead of a per-row loop
+        by_id = {}
+        rows = []
+        questions = {}
+        for position, cached in enumerate(cached_queries):
             if cached.get('schema_hash') != schema_hash:
-                if is_first: print(f"DEBUG: Schema mismatch! {cached.get('schema_hash')} != {schema_hash}")
                 continue
-            
-            # Calculate similarity
-            cached_embedding = cached.get('question_embedding')
-            
-            # AUTO-FIX: If embedding is a string (common in SQLite), parse it
-            if isinstance(cached_embedding, str):
-                try:
-                    cached_embedding = json.loads(cached_embedding)
-                    cached['question_embedding'] = cached_embedding 
-                except json.JSONDecodeError:
-                    if is_first: print("DEBUG: JSON decode error")
-                    continue
+            by_id[position] = cached
+            questions[position] = cached.get('question', '')
+            rows.append((position, cached.get('question_embedding')))
+        
+        index = SchemaIndex()
+        index.append(rows, questions=questions)
+        match, similarity = self.find_similar_in_index(question, question_embedding, index)
+        if match is None:
+            return (None, similarity)
+        return (by_id[match["id"]], similarity)
 
-            if not cached_embedding:
-                if is_first: print("DEBUG: No embedding found")
-                continue
-                
-            similarity = self.compute_similarity(
+    def find_similar_in_index(
+        self,
+        question: str,
+        question_embedding: List[float],
+        index: SchemaIndex,
+        load_questions: Optional[Callable[[List[int]], Dict[int, str]]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Find most similar cached query above threshold in a resident index.
+        
+        Args:
+            question: New question text
+            question_embedding: Embedding of new question
+            index: SchemaIndex for the current schema and dialect
+            load_questions: Optional callable returning {id: question} for entries
+                whose text is not resident yet (one batched DB query)
+            
+        Returns:
+            Tuple of ({"id": ..., "question": ...}, similarity_score);
+            the match is None on a miss
+        """
+        if not any(question_embedding):
+            logger.debug("Zero vector detected (semantic cache disabled)")
+            return (None, 0.0)
+        
+        def prefetch(entry_ids: List[int]) -> None:
+            missing = [i for i in entry_ids if index.question(i) is None]
+            if missing and load_questions is not None:
+                index.set_questions(load_questions(missing))
+        
+        if self.hybrid_prefilter:
+            # Keyword validation happens inside, on the precomputed keys
+            entry_id, similarity = index.search_hybrid(
                 question_embedding,
-                cached_embedding
+                question,
+                self.similarity_threshold,
+                bm25_weight=self.hybrid_bm25_weight,
+                min_shared_terms=self.hybrid_min_shared_terms,
+                prefetch=prefetch
             )
-            
-            if is_first:
-                print(f"DEBUG: Calculated Similarity: {similarity}")
-
-            # NEW: Keyword Validation for High-Impact words
+            if entry_id is None:
+                return (None, similarity)
+            return ({"id": entry_id, "question": index.question(entry_id)}, similarity)
+        
+        def accept(entry_id: int) -> bool:
+            # Keyword Validation for High-Impact words
             # Help distinguish between "each class" and "class tenth"
-            if similarity >= self.similarity_threshold:
-                if not self._validate_keywords(question, cached.get('question', '')):
-                    print(f"DEBUG: Similarity {similarity:.2f} high, but keyword validation FAILED.")
-                    continue
+            if self._validate_keywords(question, index.question(entry_id) or ''):
+                return True
+            logger.debug("Similarity high, but keyword validation failed", extra={"entry_id": entry_id})
+            return False
+        
+        entry_id, similarity = index.search(
+            question_embedding,
+            self.similarity_threshold,
+            accept=accept,
+            top_k=self.index_top_k,
+            prefetch=prefetch
+        )
+        if entry_id is None:
+            return (None, similarity)
+        return ({"id": entry_id, "question": index.question(entry_id)}, similarity)
 
-            # Track best match
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_match = cached
+    def find_similar_lexical(
+        self,
+        question: str,
+        index: LexicalIndex,
+        threshold: float
+    ) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Find a cached query by character n-gram similarity (embedding model unavailable).
         
-        # Return tuple with best match (or None) and score
-        if best_similarity >= self.similarity_threshold:
-            return (best_match, best_similarity)
+        Args:
+            question: New question text
+            index: LexicalIndex for the current schema and dialect
+            threshold: Minimum lexical similarity for a hit
+            
+        Returns:
+            Tuple of ({"id": ..., "question": ...}, similarity_score);
+            the match is None on a miss
+        """
+        def accept(entry_id: int) -> bool:
+            cached_question = index.question(entry_id) or ''
+            return self._validate_keywords(question, cached_question) and lexically_compatible(question, cached_question)
         
-        return (None, best_similarity)
+        entry_id, similarity = index.search(question, threshold, accept=accept)
+        if entry_id is None:
+            return (None, similarity)
+        return ({"id": entry_id, "question": index.question(entry_id)}, similarity)
 
     def _validate_keywords(self, q1: str, q2: str) -> bool:
         """
         Secondary validation to ensure high-impact words aren't mismatched.
         Focuses on aggregate terms and potential entity values.
         """
-        # List of words that strongly change the SQL structure/logic
-        impact_words = {
-            'each', 'every', 'all', 'total', 'average', 'avg', 'sum', 
-            'count', 'min', 'max', 'top', 'bottom', 'tenth', 'twelfth'
-        }
-        
-        q1_words = set(q1.lower().replace('?', '').split())
-        q2_words = set(q2.lower().replace('?', '').split())
-        
-        # Check if any impact word is in one but not the other
-        for word in impact_words:
-            if (word in q1_words and word not in q2_words) or \
-               (word in q2_words and word not in q1_words):
-                # If a structural word differs, it's likely a different intent
-                return False
-        
-        return True
+        # If a structural word is in one but not the other, it's likely a different intent
+        return impact_mask(keyword_tokens(q1)) == impact_mask(keyword_tokens(q2))
     
     def should_cache(self, question: str) -> bool:
         """
@@ -268,5 +517,14 @@ def get_semantic_cache() -> SemanticCache:
     """Get or create global semantic cache instance."""
     global _semantic_cache_instance
     if _semantic_cache_instance is None:
-        _semantic_cache_instance = SemanticCache()
+        _semantic_cache_instance = SemanticCache(
+            model_name=get_cache_config("model_name") or "sentence-transformers/all-MiniLM-L6-v2",
+            index_top_k=get_cache_config("index_top_k") or 8,
+            hybrid_prefilter=bool(get_cache_config("hybrid_prefilter_enabled")),
+            hybrid_bm25_weight=get_cache_config("hybrid_bm25_weight") or 0.0,
+            hybrid_min_shared_terms=get_cache_config("hybrid_min_shared_terms") or 0,
+            batch_embeddings=bool(get_cache_config("embedding_batching")),
+            max_batch_size=get_cache_config("embedding_max_batch_size") or 32,
+            batch_wait_ms=get_cache_config("embedding_batch_wait_ms") or 0.0
+        )
     return _semantic_cache_instance
@@ -0,0 +1,723 @@
+"""
+Similarity Index Module
+
+Resident, vectorized similarity index for the semantic cache.
+
+Keeps one pre-normalized float32 matrix per (schema_hash, database_type) so a
+lookup is a single matrix-vector product instead of one cosine_similarity call
+per cached row. Indexes are appended to when new entries are stored and
+re-synced against the database when another worker has changed the table.
+
+With table-subset keys, an index also holds entries stored for other
+versions of the schema whose referenced tables are unchanged.
+
+Each index also keeps keyword keys per entry (impact-word bitmask, content
+terms; see keyword_filter), computed once when the entry is added, and an
+inverted index over the terms. search_hybrid uses them to score only the
+entries that can pass keyword validation (and, opt-in, share terms with the
+question).
+"""
+
+import logging
+import math
+import threading
+from collections import Counter, OrderedDict
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.cache_config import get_cache_config
+from app.core.embedding_codec import load_embedding
+from app.core.keyword_filter import content_terms, impact_mask, keyword_tokens
+
+logger = logging.getLogger(__name__)
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Candidate rows gathered per matrix-vector product in search_hybrid
+GATHER_BLOCK = 256
+
+
+def _to_vector(embedding) -> Optional[np.ndarray]:
+    """Convert an embedding (list, legacy JSON string or array) to a float32 vector."""
+    if embedding is None:
+        return None
+    if isinstance(embedding, np.ndarray):
+        vector = embedding.astype(np.float32, copy=False).ravel()
+    else:
+        vector = load_embedding(None, legacy=embedding)
+    if vector is None or vector.size == 0:
+        return None
+    return vector
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, leaving zero rows untouched (cosine 0, like sklearn)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class SchemaIndex:
+    """
+    Normalized embedding matrix for a single (schema_hash, database_type) pair.
+
+    Rows are kept in insertion (id) order so ties resolve exactly like the
+    original candidate loop, which kept the first best match it saw. Question
+    text is optional; entries without it have no keyword keys until
+    set_questions supplies it, and search_hybrid treats them as candidates.
+    """
+
+    def __init__(self, source: Optional["EntrySource"] = None):
+        self._lock = threading.RLock()
+        self.source = source  # Which DB rows the index holds (set by the registry)
+        self._matrix: Optional[np.ndarray] = None  # Capacity-doubling buffer
+        self._ids: List[int] = []
+        self._positions: Dict[int, int] = {}
+        self._questions: Dict[int, str] = {}
+        self._skipped: Set[int] = set()  # Rows without a usable embedding
+        self._awaiting: Set[int] = set()  # Skipped rows stored without one (backfilled later)
+        self._keys: Dict[int, Tuple[int, Dict[str, int], int]] = {}  # id -> (impact mask, terms, length)
+        self._by_mask: Dict[int, Set[int]] = {}
+        self._postings: Dict[str, Set[int]] = {}  # Content term -> ids
+        self._unkeyed: Set[int] = set()  # Rows whose question text is not known yet
+        self._term_total = 0  # Sum of entry lengths, for BM25's average
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        """Number of searchable entries."""
+        return self._size
+
+    @property
+    def row_count(self) -> int:
+        """Number of database rows accounted for, including unusable ones."""
+        return self._size + len(self._skipped)
+
+    @property
+    def awaiting_embedding(self) -> Set[int]:
+        """IDs of rows that were stored without an embedding."""
+        with self._lock:
+            return set(self._awaiting)
+
+    def __contains__(self, entry_id: int) -> bool:
+        return entry_id in self._positions
+
+    def question(self, entry_id: int) -> Optional[str]:
+        return self._questions.get(entry_id)
+
+    def set_questions(self, questions: Dict[int, str]) -> None:
+        """Attach question text for entries (e.g. after a lazy load)."""
+        with self._lock:
+            for entry_id, question in questions.items():
+                if entry_id in self._positions:
+                    self._questions[entry_id] = question or ""
+                    if entry_id in self._unkeyed:
+                        self._add_keys(entry_id, question or "")
+
+    def _add_keys(self, entry_id: int, question: str) -> None:
+        """Compute an entry's keyword keys and index them (caller holds the lock)."""
+        tokens = keyword_tokens(question)
+        mask = impact_mask(tokens)
+        terms = content_terms(tokens)
+        length = sum(terms.values())
+        self._keys[entry_id] = (mask, terms, length)
+        self._by_mask.setdefault(mask, set()).add(entry_id)
+        for term in terms:
+            self._postings.setdefault(term, set()).add(entry_id)
+        self._term_total += length
+        self._unkeyed.discard(entry_id)
+
+    def _drop_keys(self, entry_id: int) -> None:
+        """Undo _add_keys for a removed entry (caller holds the lock)."""
+        self._unkeyed.discard(entry_id)
+        keys = self._keys.pop(entry_id, None)
+        if keys is None:
+            return
+        mask, terms, length = keys
+        bucket = self._by_mask[mask]
+        bucket.discard(entry_id)
+        if not bucket:
+            del self._by_mask[mask]
+        for term in terms:
+            postings = self._postings[term]
+            postings.discard(entry_id)
+            if not postings:
+                del self._postings[term]
+        self._term_total -= length
+
+    def append(
+        self,
+        entries: Iterable[Tuple[int, object]],
+        questions: Optional[Dict[int, str]] = None
+    ) -> int:
+        """
+        Append cache entries to the index.
+
+        Args:
+            entries: Iterable of (id, embedding) tuples
+            questions: Optional mapping of id to question text
+
+        Returns:
+            Number of rows actually added
+        """
+        with self._lock:
+            rows = []
+            for entry_id, embedding in entries:
+                if entry_id in self._positions or entry_id in self._skipped:
+                    continue
+                vector = _to_vector(embedding)
+                if vector is None:
+                    self._skipped.add(entry_id)
+                    if embedding is None:
+                        self._awaiting.add(entry_id)
+                    continue
+                rows.append((entry_id, vector))
+
+            if not rows:
+                return 0
+
+            block = _normalize(np.vstack([r[1] for r in rows]).astype(np.float32))
+            if self._matrix is None:
+                self._matrix = np.empty((max(len(rows), 64), block.shape[1]), dtype=np.float32)
+            elif block.shape[1] != self._matrix.shape[1]:
+                raise ValueError(
+                    f"Embedding dimension mismatch: {block.shape[1]} != {self._matrix.shape[1]}"
+                )
+
+            needed = self._size + len(rows)
+            if needed > self._matrix.shape[0]:
+                capacity = max(needed, self._matrix.shape[0] * 2)
+                grown = np.empty((capacity, self._matrix.shape[1]), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+
+            self._matrix[self._size:needed] = block
+            for entry_id, _ in rows:
+                self._positions[entry_id] = len(self._ids)
+                self._ids.append(entry_id)
+                if questions and entry_id in questions:
+                    self._questions[entry_id] = questions[entry_id] or ""
+                    self._add_keys(entry_id, self._questions[entry_id])
+                else:
+                    self._unkeyed.add(entry_id)
+            self._size = needed
+            return len(rows)
+
+    def remove(self, entry_ids: Iterable[int]) -> int:
+        """
+        Remove entries from the index, preserving the order of remaining rows.
+
+        Args:
+            entry_ids: IDs of deleted cache entries
+
+        Returns:
+            Number of rows removed
+        """
+        with self._lock:
+            entry_ids = set(entry_ids)
+            if self.source is not None:
+                self.source.forget(i for i in entry_ids if i in self._positions or i in self._skipped)
+            self._skipped -= entry_ids
+            self._awaiting -= entry_ids
+            drop = {i for i in entry_ids if i in self._positions}
+            if not drop:
+                return 0
+
+            keep = [p for p, i in enumerate(self._ids) if i not in drop]
+            # Copy into a fresh buffer so in-flight searches keep a consistent view
+            compacted = np.empty_like(self._matrix)
+            compacted[:len(keep)] = self._matrix[keep]
+            self._matrix = compacted
+            self._ids = [self._ids[p] for p in keep]
+            self._positions = {i: p for p, i in enumerate(self._ids)}
+            for i in drop:
+                self._questions.pop(i, None)
+                self._drop_keys(i)
+            self._size = len(keep)
+            return len(drop)
+
+    def search(
+        self,
+        query_embedding,
+        threshold: float,
+        accept: Optional[Callable[[int], bool]] = None,
+        top_k: int = 8,
+        prefetch: Optional[Callable[[List[int]], None]] = None
+    ) -> Tuple[Optional[int], float]:
+        """
+        Find the best entry above threshold that passes the accept check.
+
+        Mirrors the original loop: candidates at or above threshold that fail
+        `accept` are skipped, and on a miss the best remaining score is returned.
+
+        Args:
+            query_embedding: Embedding of the new question
+            threshold: Minimum similarity for a hit
+            accept: Optional callback taking a candidate entry id
+            top_k: Number of top candidates to rank before falling back to a full sort
+            prefetch: Optional callback receiving the ids above threshold before
+                they are checked, so their question text can be loaded in one query
+
+        Returns:
+            Tuple of (entry id or None, similarity)
+        """
+        query = _to_vector(query_embedding)
+        if query is None or not query.any():
+            return (None, 0.0)
+
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return (None, 0.0)
+            matrix = self._matrix[:n]
+            ids = self._ids
+
+        norm = np.linalg.norm(query)
+        scores = matrix @ (query / norm)
+
+        # Rank a small top-k first; only sort everything when keyword
+        # validation rejects the whole head of the list.
+        k = min(max(top_k, 1), n)
+        if k < n:
+            head = np.argpartition(-scores, k - 1)[:k]
+            head = head[np.lexsort((head, -scores[head]))]
+        else:
+            head = np.argsort(-scores, kind="stable")
+
+        checked = 0
+        for order in (head, None):
+            if order is None:
+                if checked < n:
+                    order = np.argsort(-scores, kind="stable")[checked:]
+                else:
+                    break
+            if prefetch is not None:
+                above = [ids[p] for p in order if scores[p] >= threshold]
+                if above:
+                    prefetch(above)
+            for pos in order:
+                score = float(scores[pos])
+                checked += 1
+                if score < threshold:
+                    return (None, max(score, 0.0))
+                if accept is None or accept(ids[pos]):
+                    return (ids[pos], score)
+        return (None, 0.0)
+
+    def _candidates(self, mask: int, terms: Dict[str, int], required: int) -> Set[int]:
+        """
+        Entries that can pass keyword validation for a question (caller holds the lock).
+
+        Keyed entries need the same impact mask and `required` shared content
+        terms; entries without keys yet are always included.
+        """
+        same_mask = self._by_mask.get(mask, set())
+        if required <= 0:
+            keyed = same_mask
+        else:
+            postings = [self._postings[t] for t in terms if t in self._postings]
+            if required == 1:
+                keyed = set().union(*(same_mask & p for p in postings))
+            else:
+                shared = Counter(chain.from_iterable(postings))
+                keyed = {i for i, count in shared.items() if count >= required and i in same_mask}
+        return keyed | self._unkeyed if self._unkeyed else keyed
+
+    def search_hybrid(
+        self,
+        query_embedding,
+        question: str,
+        threshold: float,
+        bm25_weight: float = 0.3,
+        min_shared_terms: int = 0,
+        prefetch: Optional[Callable[[List[int]], None]] = None
+    ) -> Tuple[Optional[int], float]:
+        """
+        Find the best entry above threshold, scoring only plausible candidates.
+
+        Keyword validation (equal impact masks) is applied through the
+        precomputed keys before any vector math, and candidates must share
+        min_shared_terms content terms with the question (fewer if the
+        question has fewer), found through the inverted index. The cost
+        follows the number of such candidates, not the index size.
+
+        Candidates at or above threshold are ranked by
+        (1 - bm25_weight) * cosine + bm25_weight * BM25 / best BM25, so among
+        near-equal embeddings the one sharing the rarer words wins. Ties keep
+        insertion order.
+
+        Args:
+            query_embedding: Embedding of the new question
+            question: The new question's text
+            threshold: Minimum cosine similarity for a hit
+            bm25_weight: Share of BM25 in the ranking score (0: cosine only)
+            min_shared_terms: Content terms a candidate must share (0: impact mask only)
+            prefetch: Optional callback receiving the ids above threshold that
+                have no question text yet, so it can be loaded in one query
+
+        Returns:
+            Tuple of (entry id or None, cosine similarity); on a miss, the best
+            candidate similarity below threshold
+        """
+        query = _to_vector(query_embedding)
+        if query is None or not query.any():
+            return (None, 0.0)
+
+        tokens = keyword_tokens(question)
+        mask = impact_mask(tokens)
+        terms = content_terms(tokens)
+        required = min(max(min_shared_terms, 0), len(terms))
+
+        with self._lock:
+            if self._size == 0:
+                return (None, 0.0)
+            candidates = self._candidates(mask, terms, required)
+            if not candidates:
+                return (None, 0.0)
+            positions = np.fromiter(map(self._positions.__getitem__, candidates), dtype=np.intp, count=len(candidates))
+            positions.sort()
+            matrix = self._matrix
+            ids = self._ids
+            documents = len(self._keys)
+            idf = {
+                t: math.log(1 + (documents - len(self._postings[t]) + 0.5) / (len(self._postings[t]) + 0.5))
+                for t in terms if t in self._postings
+            }
+            average_length = self._term_total / documents if documents else 0.0
+
+        query = query / np.linalg.norm(query)
+        # Gathering in blocks keeps the copied rows cache-sized
+        scores = np.concatenate([
+            matrix[positions[start:start + GATHER_BLOCK]] @ query
+            for start in range(0, len(positions), GATHER_BLOCK)
+        ])
+        above = np.flatnonzero(scores >= threshold)
+        above_ids = {p: ids[positions[p]] for p in above}
+
+        with self._lock:
+            keys = {p: self._keys.get(i) for p, i in above_ids.items()}
+        unkeyed = [above_ids[p] for p, key in keys.items() if key is None]
+        if unkeyed:
+            if prefetch is not None:
+                prefetch(unkeyed)
+            with self._lock:
+                for p in above:
+                    if keys[p] is None:
+                        # Still unknown: validated like an empty question
+                        keys[p] = self._keys.get(above_ids[p]) or (0, {}, 0)
+
+        hits = []
+        for p in above:
+            key_mask, key_terms, length = keys[p]
+            if key_mask != mask or sum(1 for t in terms if t in key_terms) < required:
+                continue
+            bm25 = 0.0
+            for term, weight in idf.items():
+                tf = key_terms.get(term)
+                if tf:
+                    norm = 1 - BM25_B + BM25_B * length / average_length if average_length else 1.0
+                    bm25 += weight * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+            hits.append((p, bm25))
+
+        if not hits:
+            below = scores[scores < threshold]
+            return (None, max(float(below.max()), 0.0) if below.size else 0.0)
+
+        best_bm25 = max(bm25 for _, bm25 in hits)
+        best, best_rank = None, -math.inf
+        for p, bm25 in hits:
+            rank = (1 - bm25_weight) * float(scores[p]) + bm25_weight * (bm25 / best_bm25 if best_bm25 else 0.0)
+            if rank > best_rank:
+                best, best_rank = p, rank
+        return (above_ids[best], float(scores[best]))
+
+    def nearest(self, query_embedding, min_score: float, top_k: int = 8) -> List[Tuple[int, float]]:
+        """
+        Top-k entries scoring at least min_score, best first.
+
+        Args:
+            query_embedding: Embedding of the new question
+            min_score: Minimum similarity
+            top_k: Maximum entries returned
+
+        Returns:
+            List of (entry id, similarity)
+        """
+        query = _to_vector(query_embedding)
+        if query is None or not query.any():
+            return []
+
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return []
+            matrix = self._matrix[:n]
+            ids = self._ids
+
+        scores = matrix @ (query / np.linalg.norm(query))
+        k = min(max(top_k, 1), n)
+        head = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        head = head[np.lexsort((head, -scores[head]))]
+        return [(ids[p], float(scores[p])) for p in head if scores[p] >= min_score]
+
+
+def _fetch_ids(db: Session, columns: tuple, entry_ids: Iterable[int], chunk: int = 500) -> list:
+    """Rows for the given ids, in chunks to keep IN lists short."""
+    from app.models.cache import SemanticQueryCache
+
+    entry_ids = sorted(entry_ids)
+    rows = []
+    for i in range(0, len(entry_ids), chunk):
+        rows.extend(db.query(*columns).filter(SemanticQueryCache.id.in_(entry_ids[i:i + chunk])).all())
+    return rows
+
+
+class EntrySource:
+    """
+    Which cache rows a resident index holds, and how to find changes cheaply.
+
+    The schema's own rows are tracked with COUNT/MAX(id) on (schema_hash,
+    database_type), a prefix of the unique key. With table-subset keys, rows
+    stored for other versions of the schema come from a CompatibleEntries
+    set that is updated incrementally, so a sync never aggregates table refs.
+    """
+
+    def __init__(self, schema_hash: str, database_type: str, table_fingerprints: Optional[Sequence[str]] = None):
+        self.schema_hash = schema_hash
+        self.database_type = database_type
+        self.compatible = None
+        if table_fingerprints:
+            from app.core.schema_subset import CompatibleEntries
+            self.compatible = CompatibleEntries(
+                schema_hash, database_type, table_fingerprints,
+                reload_seconds=get_cache_config("subset_reload_seconds") or 300
+            )
+        self.foreign: Set[int] = set()  # Held rows of other schema versions
+        self.own_max_id = 0
+
+    def _own_filters(self) -> tuple:
+        from app.models.cache import SemanticQueryCache
+
+        return (
+            SemanticQueryCache.schema_hash == self.schema_hash,
+            SemanticQueryCache.database_type == self.database_type,
+        )
+
+    def _fetch_compatible(self, db: Session, columns: tuple, entry_ids: Set[int]) -> list:
+        rows = _fetch_ids(db, columns, entry_ids)
+        self.foreign.update(row[0] for row in rows)
+        return rows
+
+    def load(self, db: Session, columns: tuple) -> list:
+        """All rows for a new index, in id order."""
+        from app.models.cache import SemanticQueryCache
+
+        rows = db.query(*columns).filter(*self._own_filters()).order_by(SemanticQueryCache.id).all()
+        self.own_max_id = rows[-1][0] if rows else 0
+        if self.compatible is not None:
+            added, _ = self.compatible.refresh(db)
+            rows = sorted(rows + self._fetch_compatible(db, columns, added), key=lambda row: row[0])
+        return rows
+
+    def changes(self, db: Session, columns: tuple, held: int) -> Optional[Tuple[list, Set[int]]]:
+        """
+        Rows added and ids removed since the index was last synced.
+
+        Args:
+            db: Database session
+            columns: Columns to fetch for new rows (id first)
+            held: Number of rows the index accounts for
+
+        Returns:
+            (new rows, removed ids), or None if the index must be rebuilt
+            (own rows deleted elsewhere or committed out of order)
+        """
+        from app.models.cache import SemanticQueryCache
+
+        own_held = held - len(self.foreign)
+        count, max_id = db.query(
+            func.count(SemanticQueryCache.id),
+            func.max(SemanticQueryCache.id)
+        ).filter(*self._own_filters()).one()
+        count = count or 0
+        max_id = max_id or 0
+
+        rows: list = []
+        if count != own_held or max_id > self.own_max_id:
+            if count < own_held or max_id <= self.own_max_id:
+                return None
+            rows = db.query(*columns).filter(
+                *self._own_filters(), SemanticQueryCache.id > self.own_max_id
+            ).order_by(SemanticQueryCache.id).all()
+            if own_held + len(rows) != count:
+                return None
+            self.own_max_id = max_id
+
+        removed: Set[int] = set()
+        if self.compatible is not None:
+            added, removed = self.compatible.refresh(db)
+            rows.extend(self._fetch_compatible(db, columns, added - self.foreign))
+        return rows, removed
+
+    def stored(self, entry_id: int) -> None:
+        """Account for a row this worker stored for the schema and appended itself."""
+        self.own_max_id = max(self.own_max_id, entry_id)
+
+    def forget(self, entry_ids: Iterable[int]) -> None:
+        """Account for rows the index dropped."""
+        self.foreign.difference_update(entry_ids)
+
+
+class SimilarityIndexRegistry:
+    """
+    Process-wide registry of SchemaIndex objects keyed by (schema_hash, database_type).
+
+    Bounded with LRU eviction so rarely used schemas do not stay resident forever.
+    """
+
+    def __init__(self, max_schemas: int = 256):
+        self.max_schemas = max_schemas
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[Tuple[str, str], SchemaIndex]" = OrderedDict()
+
+    def get(self, schema_hash: str, database_type: str) -> Optional[SchemaIndex]:
+        key = (schema_hash, database_type)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+            return index
+
+    def _put(self, schema_hash: str, database_type: str, index: SchemaIndex) -> None:
+        key = (schema_hash, database_type)
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_schemas:
+                self._indexes.popitem(last=False)
+
+    def invalidate(self, schema_hash: str, database_type: Optional[str] = None) -> None:
+        """Drop resident indexes for a schema (all dialects if database_type is None)."""
+        with self._lock:
+            for key in list(self._indexes):
+                if key[0] == schema_hash and (database_type is None or key[1] == database_type):
+                    del self._indexes[key]
+
+    def remove_entries(self, schema_hash: str, database_type: str, entry_ids: Iterable[int]) -> None:
+        """Remove deleted cache rows from a resident index, if one is loaded."""
+        index = self.get(schema_hash, database_type)
+        if index is not None:
+            index.remove(entry_ids)
+
+    def add_entry(self, schema_hash: str, database_type: str, entry_id: int, question: str, embedding) -> None:
+        """Append a newly stored cache row to a resident index, if one is loaded."""
+        index = self.get(schema_hash, database_type)
+        if index is not None:
+            index.append([(entry_id, embedding)], questions={entry_id: question})
+            index.source.stored(entry_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+    def sync(
+        self,
+        db: Session,
+        schema_hash: str,
+        database_type: str,
+        table_fingerprints: Optional[Sequence[str]] = None
+    ) -> SchemaIndex:
+        """
+        Return an up-to-date index for the schema, loading or refreshing it from the DB.
+
+        A cheap COUNT/MAX(id) query on the schema's own rows detects rows
+        added or deleted by other workers, and compatible rows of other schema
+        versions are tracked incrementally (see EntrySource). New rows are
+        fetched incrementally; deletions of own rows trigger a rebuild, as does
+        the backfill of rows that were stored without an embedding.
+
+        Args:
+            db: Database session
+            schema_hash: Hash of current schema
+            database_type: Database dialect
+            table_fingerprints: Fingerprints of the schema's tables; entries stored
+                for other schemas whose referenced tables are all among them are
+                included as well
+
+        Returns:
+            The resident SchemaIndex
+        """
+        # Imported here so SchemaIndex stays usable without a configured database
+        from app.models.cache import SemanticQueryCache
+
+        # Question text comes along so every entry gets its keyword keys on insert
+        columns = (
+            SemanticQueryCache.id,
+            SemanticQueryCache.embedding_vector,
+            SemanticQueryCache.embedding_dtype,
+            SemanticQueryCache.question_embedding,
+            SemanticQueryCache.question,
+        )
+
+        index = self.get(schema_hash, database_type)
+        if index is not None:
+            changes = index.source.changes(db, columns, index.row_count)
+            if changes is not None:
+                rows, removed = changes
+                if removed:
+                    index.remove(removed)
+                if rows:
+                    index.append(self._decode_rows(rows), questions={row[0]: row[4] for row in rows})
+                awaiting = index.awaiting_embedding
+                if not awaiting or not self._embedded_since(db, awaiting):
+                    return index
+                # Rows stored during an embedding outage were backfilled: rebuild
+
+        # First load, deletions elsewhere, out-of-order commits or backfill: rebuild
+        source = EntrySource(schema_hash, database_type, table_fingerprints)
+        rows = source.load(db, columns)
+        index = SchemaIndex(source)
+        index.append(self._decode_rows(rows), questions={row[0]: row[4] for row in rows})
+        self._put(schema_hash, database_type, index)
+        logger.debug("Built similarity index", extra={"schema_hash": schema_hash, "dialect": database_type, "entries": index.size})
+        return index
+
+    @staticmethod
+    def _embedded_since(db: Session, entry_ids: Set[int]) -> bool:
+        """Whether any of the rows stored without an embedding has one now."""
+        from app.models.cache import SemanticQueryCache
+
+        return db.query(SemanticQueryCache.id).filter(
+            SemanticQueryCache.id.in_(entry_ids),
+            or_(
+                SemanticQueryCache.embedding_vector.isnot(None),
+                SemanticQueryCache.question_embedding.isnot(None)
+            )
+        ).first() is not None
+
+    @staticmethod
+    def _decode_rows(rows) -> List[Tuple[int, Optional[np.ndarray]]]:
+        return [
+            (entry_id, load_embedding(blob, dtype, legacy))
+            for entry_id, blob, dtype, legacy, _ in rows
+        ]
+
+
+# Global registry instance (singleton)
+_similarity_index_registry = None
+
+
+def get_similarity_index() -> SimilarityIndexRegistry:
+    """Get or create global similarity index registry."""
+    global _similarity_index_registry
+    if _similarity_index_registry is None:
+        _similarity_index_registry = SimilarityIndexRegistry(
+            max_schemas=get_cache_config("index_max_schemas") or 256
+        )
+    return _similarity_index_registry
@@ -0,0 +1,175 @@
+"""
+Single-Flight Module
+
+Coalesces identical in-flight calls so that only one of them does the work.
+
+When several requests ask the same question against the same schema at the
+same time, the first caller (the leader) runs the LLM generation and every
+concurrent caller with the same key (followers) waits for and shares the
+leader's result, including its exception.
+"""
+
+import asyncio
+import functools
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """A single in-flight call and its eventual outcome."""
+
+    __slots__ = ("event", "result", "error", "followers")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Per-key call deduplication for threads in one process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Hashable identity of the call
+            fn: Zero-argument callable doing the actual work
+
+        Returns:
+            Tuple of (result, shared) where shared is True for followers
+
+        Raises:
+            Exception: Whatever fn raised (re-raised in every waiting caller)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.followers += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Remove the key before waking followers so later callers start fresh
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight(),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+
+class AsyncSingleFlight:
+    """
+    Per-key call deduplication for coroutines.
+
+    The work runs in its own task rather than in the leader's coroutine, so a
+    cancelled leader (e.g. its client disconnected) does not fail the
+    followers: every caller only awaits the shared task. Calls are only
+    shared between coroutines on the same event loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], "asyncio.Task"] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Hashable identity of the call
+            fn: Zero-argument coroutine function doing the actual work
+
+        Returns:
+            Tuple of (result, shared) where shared is True for followers
+
+        Raises:
+            Exception: Whatever fn raised (re-raised in every waiting caller)
+        """
+        loop = asyncio.get_running_loop()
+        # Tasks cannot be awaited from another loop, so each loop has its own calls
+        call_key = (loop, key)
+        task = self._calls.get(call_key)
+        if task is not None:
+            self.followers += 1
+            shared = True
+        else:
+            task = loop.create_task(fn())
+            self._calls[call_key] = task
+            task.add_done_callback(functools.partial(self._finished, call_key))
+            self.leaders += 1
+            shared = False
+        # shield: a cancelled caller stops waiting, the shared work goes on
+        return await asyncio.shield(task), shared
+
+    def _finished(self, call_key: Tuple[asyncio.AbstractEventLoop, Hashable], task: "asyncio.Task") -> None:
+        if self._calls.get(call_key) is task:
+            del self._calls[call_key]
+        if not task.cancelled():
+            # Mark retrieved so an exception nobody waited on is not logged
+            task.exception()
+
+    def snapshot(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
+
+
+# Global instances for LLM generations (singletons)
+_generation_flight = None
+_async_generation_flight = None
+
+
+def get_generation_flight() -> SingleFlight:
+    """Get or create the single-flight group for SQL generations."""
+    global _generation_flight
+    if _generation_flight is None:
+        _generation_flight = SingleFlight()
+    return _generation_flight
+
+
+def get_async_generation_flight() -> AsyncSingleFlight:
+    """Get or create the async single-flight group for SQL generations."""
+    global _async_generation_flight
+    if _async_generation_flight is None:
+        _async_generation_flight = AsyncSingleFlight()
+    return _async_generation_flight
@@ -0,0 +1,307 @@
+"""
+SQL Template Module
+
+Parameterized SQL templates for the semantic cache.
+
+When a generated SQL is stored, its literals (found by sqlglot) are aligned
+with values in the question ("students in class tenth" -> 'tenth',
+"top 5 products" -> LIMIT 5). Aligned literals become slots, and the
+question becomes a pattern with the same slots:
+
+    question pattern: show all students in class {0}
+    sql template:     SELECT * FROM students WHERE class = '__slot0__'
+
+A new question that matches the pattern with different values
+("... in class twelfth") gets the template filled with its own values,
+with no LLM call. Slots keep their kind (number/string) and casing, and
+string values are escaped by sqlglot.
+"""
+
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from app.core.security import terminate_sql, to_sqlglot_dialect
+
+# Words, numbers and quoted strings; punctuation is ignored
+_TOKEN_RE = re.compile(r"'([^']*)'|\"([^\"]*)\"|(\d+(?:\.\d+)?)|([A-Za-z_][\w\-]*)")
+
+# Longest phrase a string slot can capture (e.g. "New York City")
+MAX_SLOT_WORDS = 4
+
+# Number words accepted in a number slot ("top ten", "fifth")
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6,
+    "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12,
+}
+
+# Words that change a question's meaning and never fill a string slot
+_NON_VALUES = {"all", "any", "every", "each", "no", "not", "none", "without", "and", "or"}
+
+
+class Token:
+    """A question token: original text and lowercase form (quoted text is one token)."""
+
+    __slots__ = ("text", "norm")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.norm = text.lower()
+
+
+def tokenize(question: str) -> List[Token]:
+    return [Token(next(g for g in groups if g)) for groups in _TOKEN_RE.findall(question) if any(groups)]
+
+
+def _as_number(token: Token) -> Optional[float]:
+    if token.norm in _NUMBER_WORDS:
+        return float(_NUMBER_WORDS[token.norm])
+    try:
+        return float(token.norm)
+    except ValueError:
+        return None
+
+
+def _casing(literal: str, span_text: str) -> Optional[str]:
+    """How the SQL literal relates to the question text, or None if it does not match."""
+    if literal == span_text:
+        return "as_is"
+    if literal == span_text.lower():
+        return "lower"
+    if literal == span_text.upper():
+        return "upper"
+    if literal.lower() == span_text.lower():
+        return "title" if literal == span_text.title() else "as_is"
+    return None
+
+
+def _apply_casing(text: str, casing: str) -> str:
+    if casing == "lower":
+        return text.lower()
+    if casing == "upper":
+        return text.upper()
+    if casing == "title":
+        return text.title()
+    return text
+
+
+class SqlTemplate:
+    """Template SQL, question pattern and slot descriptions for one cache entry."""
+
+    __slots__ = ("sql", "pattern", "slots")
+
+    def __init__(self, sql: str, pattern: List[Any], slots: List[Dict[str, Any]]):
+        self.sql = sql  # SQL with '__slotN__' sentinels
+        self.pattern = pattern  # Question tokens (str) and slot numbers (int)
+        self.slots = slots  # [{"kind": "number"|"string", ...}]
+
+
+def _align_string(value: str, tokens: List[Token], used: set) -> Optional[Tuple[int, int, str]]:
+    """Find the question span (start, end) matching a string literal."""
+    needle = value.strip()
+    if not needle:
+        return None
+    words = len(tokenize(needle)) or 1
+    for size in sorted({words, 1}, reverse=True):
+        for start in range(len(tokens) - size + 1):
+            span = range(start, start + size)
+            if any(i in used for i in span):
+                continue
+            text = " ".join(tokens[i].text for i in span)
+            casing = _casing(needle, text)
+            if casing is not None:
+                return start, start + size, casing
+    return None
+
+
+def _literal_value(literal: exp.Literal) -> Optional[Any]:
+    """Comparable value of a literal that could become a slot (None if it cannot)."""
+    if literal.is_string:
+        core = literal.this.strip("%")
+        if not core or core.strip() != core:
+            return None
+        return ("string", core.lower())
+    try:
+        return float(literal.this)
+    except ValueError:
+        return None
+
+
+def build_template(sql: str, question: str, database_type: str = "MySQL") -> Optional[SqlTemplate]:
+    """
+    Build a template by aligning SQL literals with question values.
+
+    Args:
+        sql: Valid SQL generated for the question
+        question: The question it answers
+        database_type: Database dialect
+
+    Returns:
+        SqlTemplate, or None if no literal could be aligned
+    """
+    dialect = to_sqlglot_dialect(database_type)
+    try:
+        tree = sqlglot.parse_one(sql, read=dialect)
+    except Exception:
+        return None
+    if tree is None:
+        return None
+
+    tokens = tokenize(question)
+    used: Dict[int, int] = {}  # token index -> slot number
+    spans: List[Tuple[int, int]] = []
+    slots: List[Dict[str, Any]] = []
+
+    # A value that occurs twice (in the SQL or in the question) cannot be aligned
+    # by position: "older than 30, first 30" must not let "first 5" fill the age.
+    # Such literals stay fixed, and so do their question words, so other values miss.
+    literals = list(tree.find_all(exp.Literal))
+    sql_values = Counter(_literal_value(literal) for literal in literals)
+
+    for literal in literals:
+        value = _literal_value(literal)
+        if value is None or sql_values[value] > 1:
+            continue
+        if literal.is_string:
+            raw = literal.this
+            core = raw.strip("%")
+            found = _align_string(core, tokens, set(used))
+            if found is None:
+                continue
+            start, end, casing = found
+            if _align_string(core, tokens, set(range(start, end))) is not None:
+                continue
+            slot = {
+                "kind": "string",
+                "words": end - start,
+                "casing": casing,
+                "prefix": raw[:len(raw) - len(raw.lstrip("%"))],
+                "suffix": raw[len(raw.rstrip("%")):],
+            }
+        else:
+            positions = [i for i, t in enumerate(tokens) if _as_number(t) == value]
+            if len(positions) != 1 or positions[0] in used:
+                continue
+            start = positions[0]
+            end = start + 1
+            slot = {
+                "kind": "number",
+                "integer": "." not in literal.this,
+            }
+
+        slot_no = len(slots)
+        slots.append(slot)
+        spans.append((start, end))
+        for i in range(start, end):
+            used[i] = slot_no
+        literal.replace(exp.Literal.string(f"__slot{slot_no}__"))
+
+    if not slots:
+        return None
+
+    pattern: List[Any] = []
+    i = 0
+    while i < len(tokens):
+        if i in used:
+            slot_no = used[i]
+            pattern.append(slot_no)
+            i = spans[slot_no][1]
+        else:
+            pattern.append(tokens[i].norm)
+            i += 1
+
+    return SqlTemplate(tree.sql(dialect=dialect), pattern, slots)
+
+
+def _capture_ok(slot: Dict[str, Any], captured: List[Token]) -> bool:
+    if slot["kind"] == "number":
+        return len(captured) == 1 and _as_number(captured[0]) is not None
+    return not any(t.norm in _NON_VALUES for t in captured)
+
+
+def match_pattern(pattern: List[Any], slots: List[Dict[str, Any]], question: str) -> Optional[List[List[Token]]]:
+    """
+    Match a question against a template pattern.
+
+    Returns:
+        Captured tokens per slot, or None if the question does not fit the pattern
+    """
+    tokens = tokenize(question)
+    captures: List[Optional[List[Token]]] = [None] * len(slots)
+
+    def walk(p: int, t: int) -> bool:
+        if p == len(pattern):
+            return t == len(tokens)
+        item = pattern[p]
+        if isinstance(item, str):
+            return t < len(tokens) and tokens[t].norm == item and walk(p + 1, t + 1)
+        slot = slots[item]
+        if slot["kind"] == "number":
+            max_words = 1
+        elif p + 1 < len(pattern):
+            max_words = MAX_SLOT_WORDS  # Bounded by the pattern tokens that follow
+        else:
+            # A trailing slot could swallow extra words ("tenth grade"): keep its original width
+            max_words = slot.get("words", 1)
+        for size in range(1, max_words + 1):
+            if t + size > len(tokens):
+                break
+            captured = tokens[t:t + size]
+            if _capture_ok(slot, captured):
+                captures[item] = captured
+                if walk(p + 1, t + size):
+                    return True
+        captures[item] = None
+        return False
+
+    if not walk(0, 0):
+        return None
+    return captures
+
+
+def fill_template(
+    template_sql: str,
+    pattern: List[Any],
+    slots: List[Dict[str, Any]],
+    question: str,
+    database_type: str = "MySQL"
+) -> Optional[str]:
+    """
+    Fill a template with the values of a new question.
+
+    Args:
+        template_sql: SQL with '__slotN__' sentinels
+        pattern: Question pattern of the template
+        slots: Slot descriptions
+        question: New question
+        database_type: Database dialect
+
+    Returns:
+        Filled SQL, or None if the question does not match the pattern
+    """
+    captures = match_pattern(pattern, slots, question)
+    if captures is None:
+        return None
+
+    dialect = to_sqlglot_dialect(database_type)
+    sql = template_sql
+    for slot_no, (slot, captured) in enumerate(zip(slots, captures)):
+        if slot["kind"] == "number":
+            number = _as_number(captured[0])
+            if slot.get("integer"):
+                if number != int(number):
+                    return None
+                value = exp.Literal.number(int(number))
+            else:
+                value = exp.Literal.number(number)
+        else:
+            text = " ".join(t.text for t in captured)
+            text = f"{slot.get('prefix', '')}{_apply_casing(text, slot.get('casing', 'as_is'))}{slot.get('suffix', '')}"
+            value = exp.Literal.string(text)
+        sql = sql.replace(f"'__slot{slot_no}__'", value.sql(dialect=dialect))
+    return terminate_sql(sql)
@@ -0,0 +1,160 @@
+"""
+Startup Warmup Module
+
+Loads slow components in a background thread at boot so the first user
+request does not pay for them:
+
+- embedding_model: loads the SentenceTransformer model (seconds) and runs
+  one encode. Requests that arrive mid-load wait for that single load
+  instead of starting their own.
+- sql_parser: sqlglot loads dialect modules on first use.
+- llm_provider: creates the provider (imports g4f).
+
+Each component reports cold -> warming -> warm (or failed) with its load
+time. /ready answers 503 until every component is warm or failed. A failed
+embedding model only disables the semantic cache, so the service is
+still ready, marked degraded, unless embedding_model_required is set: then
+it stays unready (deployments that must not serve without the cache). With
+startup_warmup_enabled off, components are reported as "lazy" (loaded by
+the first request that needs them).
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.cache_config import get_cache_config
+
+logger = logging.getLogger(__name__)
+
+# Component states that no longer hold up readiness
+_DONE_STATES = ("warm", "failed", "lazy")
+
+
+def _warm_embedding_model() -> None:
+    from app.core.semantic_cache import get_semantic_cache
+    sem_cache = get_semantic_cache()
+    if not sem_cache.model:
+        raise RuntimeError(sem_cache.model_error or "Embedding model failed to load")
+    # First inference allocates buffers; do it here rather than on a request
+    sem_cache.model.encode("warmup query", convert_to_numpy=True)
+
+
+def _warm_sql_parser() -> None:
+    from app.core.security import SQLGLOT_DIALECTS, validate_sql
+    for dialect in SQLGLOT_DIALECTS:
+        validate_sql("SELECT 1", dialect)
+
+
+def _warm_llm_provider() -> None:
+    from app.services.llm_provider import get_llm_provider
+    get_llm_provider()
+
+
+class StartupWarmup:
+    """
+    Per-component warm/cold state plus the background thread that warms them.
+    """
+
+    def __init__(
+        self,
+        components: Optional[List[Tuple[str, Callable[[], None]]]] = None,
+        required: Iterable[str] = ()
+    ):
+        """
+        Args:
+            components: (name, warm function) pairs run in order by start()
+            required: Components whose failure makes the service unready
+        """
+        self._components = list(components if components is not None else [
+            ("embedding_model", _warm_embedding_model),
+            ("sql_parser", _warm_sql_parser),
+            ("llm_provider", _warm_llm_provider),
+        ])
+        self.required = set(required)
+        self._lock = threading.Lock()
+        self._state: Dict[str, dict] = {name: {"state": "cold"} for name, _ in self._components}
+        self._thread: Optional[threading.Thread] = None
+
+    def run(self, name: str, fn: Callable[[], None]) -> bool:
+        """
+        Warm one component on the calling thread and record the outcome.
+
+        Returns:
+            True if it is warm, False if it failed
+        """
+        with self._lock:
+            self._state[name] = {"state": "warming"}
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            seconds = round(time.perf_counter() - start, 3)
+            with self._lock:
+                self._state[name] = {"state": "failed", "seconds": seconds, "error": str(e)}
+            logger.warning("Warmup failed", extra={"component": name, "seconds": seconds, "error": str(e)})
+            return False
+        seconds = round(time.perf_counter() - start, 3)
+        with self._lock:
+            self._state[name] = {"state": "warm", "seconds": seconds}
+        logger.info("Component warm", extra={"component": name, "seconds": seconds})
+        return True
+
+    def _loop(self) -> None:
+        for name, fn in self._components:
+            self.run(name, fn)
+
+    def start(self) -> None:
+        """Warm all components in a background thread (no-op if already running)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name="startup-warmup", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the warmup thread finishes; returns True if it did."""
+        if self._thread is None:
+            return self.ready()
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def skip(self) -> None:
+        """Leave background components to load on first use."""
+        with self._lock:
+            for name, _ in self._components:
+                if self._state[name]["state"] == "cold":
+                    self._state[name] = {"state": "lazy"}
+
+    def _ready(self, components: Dict[str, dict]) -> bool:
+        return all(
+            c["state"] in _DONE_STATES and not (c["state"] == "failed" and name in self.required)
+            for name, c in components.items()
+        )
+
+    def ready(self) -> bool:
+        with self._lock:
+            return self._ready(self._state)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            components = {name: dict(state) for name, state in self._state.items()}
+        return {
+            "ready": self._ready(components),
+            "degraded": any(c["state"] == "failed" for c in components.values()),
+            "components": components,
+        }
+
+
+# Global warmup instance (singleton)
+_startup_warmup_instance = None
+
+
+def get_startup_warmup() -> StartupWarmup:
+    """Get or create global startup warmup."""
+    global _startup_warmup_instance
+    if _startup_warmup_instance is None:
+        _startup_warmup_instance = StartupWarmup(
+            required=["embedding_model"] if get_cache_config("embedding_model_required") else []
+        )
+    return _startup_warmup_instance
@@ -1,13 +1,103 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.endpoints import router as api_router
 from app.api.auth import router as auth_router
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.database import engine, Base
+from app.core.cache_config import get_cache_config
+from app.core.cache_eviction import get_cache_evictor
+from app.core.hit_stats import get_hit_stats
+from app.core.logging_config import setup_logging, shutdown_logging
+from app.core.semantic_cache import get_semantic_cache
+from app.core.warmup import get_startup_warmup
+from app.core.metrics import (
+    get_metrics, metrics_enabled, begin_request, end_request, server_timing_header, HTTP_REQUEST_SECONDS
+)
+
+# Structured, non-blocking logging (LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_PAYLOAD_SAMPLE_RATE)
+setup_logging()
+
+
+def create_tables():
+    Base.metadata.create_all(bind=engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables at startup rather than on import, so importing the app
+    # (tests, scripts, workers before fork) does not touch the database
+    warmup = get_startup_warmup()
+    if not warmup.run("database", create_tables):
+        raise RuntimeError("Could not create database tables")
+    # Load the embedding model etc. in the background; /ready reports progress
+    if get_cache_config("startup_warmup_enabled"):
+        warmup.start()
+    else:
+        warmup.skip()
+    # Background cache maintenance
+    get_hit_stats().start()
+    if get_cache_config("eviction_enabled"):
+        get_cache_evictor().start()
+    yield
+    get_cache_evictor().stop()
+    # Write any buffered hit counts before the worker exits
+    get_hit_stats().stop()
+    # Drain queued log records last so shutdown messages are written
+    shutdown_logging()
+
+app = FastAPI(title="NLP to SQL API", lifespan=lifespan)
+
+
+def _db_pool_samples():
+    """Connection pool state (pools without a counter report what they have)."""
+    pool = engine.pool
+    for state, method in (("size", "size"), ("checked_in", "checkedin"),
+                          ("checked_out", "checkedout"), ("overflow", "overflow")):
+        if hasattr(pool, method):
+            yield (state,), getattr(pool, method)()
+
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+def _cache_event_samples():
+    counters = get_semantic_cache().statistics.snapshot()["counters"]
+    return [((event,), count) for event, count in counters.items()]
+
+
+get_metrics().callback(
+    "nl2sql_db_pool_connections", "Database connection pool state", _db_pool_samples, labelnames=("state",)
+)
+get_metrics().callback(
+    "nl2sql_cache_events_total", "Semantic cache lookups by layer and result, coalesced LLM calls, pruned schemas",
+    _cache_event_samples, labelnames=("event",), metric_type="counter"
+)
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Time each request and report its pipeline stages in a Server-Timing header."""
+    if not metrics_enabled():
+        return await call_next(request)
+    timings, token = begin_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request(token)
+    total = time.perf_counter() - start
+    # Path parameters are put back as placeholders to keep label cardinality bounded
+    path = request.url.path if request.scope.get("route") is not None else "unmatched"
+    for name, value in request.path_params.items():
+        path = path.replace(f"/{value}", f"/{{{name}}}", 1)
+    HTTP_REQUEST_SECONDS.observe(
+        total,
+        method=request.method,
+        path=path,
+        status=response.status_code
+    )
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    return response
 
-app = FastAPI(title="NLP to SQL API")
 
 # Configure CORS
 app.add_middleware(
@@ -16,6 +106,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 app.include_router(api_router, prefix="/api")
@@ -24,3 +115,18 @@ app.include_router(auth_router, prefix="/api/auth", tags=["authentication"])
 @app.get("/")
 def read_root():
     return {"message": "Welcome to NL2SQL API"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once startup warmup finished, 503 before, with per-component state."""
+    snapshot = get_startup_warmup().snapshot()
+    # Where the embedding model came from, or why it failed to load
+    snapshot["embedding_model"] = get_semantic_cache().model_status()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint (per worker)."""
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4")
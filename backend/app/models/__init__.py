@@ -1,3 +1,4 @@
 from .project import Project
 from .user import User
-from .cache import SemanticQueryCache
+from .cache import SemanticQueryCache, CacheTableRef
+from .schema_registry import RegisteredSchema
@@ -4,7 +4,7 @@ Semantic Query Cache Model
 Database model for storing cached queries with semantic embeddings.
 """
 
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, Index, func
+from sqlalchemy import Column, Integer, String, Text, JSON, LargeBinary, Boolean, DateTime, ForeignKey, Index, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
@@ -17,9 +17,19 @@ class SemanticQueryCache(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     question = Column(String(500), nullable=False, index=True)
-    question_embedding = Column(JSON, nullable=False)  # Stored as JSON array
+    question_fingerprint = Column(String(64), nullable=True)  # SHA-256 of normalized question
+    question_embedding = Column(JSON, nullable=True)  # Legacy JSON array (pre-migration rows only)
+    embedding_vector = Column(LargeBinary, nullable=True)  # Packed float32/float16 bytes
+    embedding_dtype = Column(String(10), nullable=True)  # "float32" or "float16"
     schema_hash = Column(String(64), nullable=False, index=True)
+    logical_schema_hash = Column(String(64), nullable=True)  # Schema hash without the dialect (cross-dialect reuse)
+    table_ref_count = Column(Integer, nullable=True)  # Rows in semantic_cache_table_refs (NULL = not recorded)
     sql_generated = Column(Text, nullable=False)
+    sql_valid = Column(Boolean, nullable=True)  # validate_sql verdict at insert (NULL = not recorded)
+    sql_validation_message = Column(String(500), nullable=True)
+    sql_template = Column(Text, nullable=True)  # SQL with '__slotN__' literal placeholders (NULL = no template)
+    question_pattern = Column(JSON, nullable=True)  # Question tokens with slot numbers
+    template_slots = Column(JSON, nullable=True)  # Slot kind, casing and LIKE affixes
     database_type = Column(String(50), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     hit_count = Column(Integer, default=0)  # Track how many times this cache was used
@@ -33,7 +43,29 @@ class SemanticQueryCache(Base):
     __table_args__ = (
         Index('idx_schema_created', 'schema_hash', 'created_at'),
         Index('idx_user_schema', 'user_id', 'schema_hash'),
+        Index('idx_logical_fingerprint', 'logical_schema_hash', 'question_fingerprint'),
+        # Exact lookups across schema versions with unchanged tables (table-subset keys)
+        Index('idx_question_fingerprint', 'question_fingerprint'),
+        # One entry per normalized question per schema; also backs the exact-match lookup
+        UniqueConstraint('schema_hash', 'database_type', 'question_fingerprint', name='uq_schema_fingerprint'),
     )
     
     def __repr__(self):
         return f"<SemanticQueryCache(id={self.id}, question='{self.question[:50]}...', hits={self.hit_count})>"
+
+
+class CacheTableRef(Base):
+    """
+    Inverted index from table fingerprint to the cache entries whose SQL references that table.
+    """
+    __tablename__ = "semantic_cache_table_refs"
+
+    entry_id = Column(Integer, ForeignKey("semantic_query_cache.id", ondelete="CASCADE"), primary_key=True)
+    table_fingerprint = Column(String(64), primary_key=True)
+
+    __table_args__ = (
+        Index('idx_table_ref_fingerprint', 'table_fingerprint', 'entry_id'),
+    )
+
+    def __repr__(self):
+        return f"<CacheTableRef(entry_id={self.entry_id}, table='{self.table_fingerprint[:12]}')>"
@@ -0,0 +1,29 @@
+"""
+Registered Schema Model
+
+Validated schemas stored under their schema hash so clients can reference
+them instead of sending the full definition with every question.
+"""
+
+from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey, func
+from app.core.database import Base
+
+
+class RegisteredSchema(Base):
+    """
+    A validated schema and its pre-formatted prompt text, keyed by schema hash.
+    """
+    __tablename__ = "registered_schemas"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    schema_hash = Column(String(64), nullable=False, unique=True, index=True)
+    database_type = Column(String(50), nullable=False)
+    tables = Column(JSON, nullable=False)  # List of TableDef dicts
+    relationships = Column(JSON, nullable=False)  # List of RelationshipDef dicts
+    formatted_schema = Column(Text, nullable=False)  # format_schema_for_model() output
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<RegisteredSchema(hash='{self.schema_hash[:12]}...', dialect='{self.database_type}')>"
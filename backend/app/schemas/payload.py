@@ -26,12 +26,31 @@ class RelationshipDef(BaseModel):
     to_column: str
 
 class StructuredSchemaRequest(BaseModel):
-    """Request model for structured schema input with explicit types and relationships."""
+    """
+    Request model for structured schema input with explicit types and relationships.
+    
+    Either send the full schema (tables/relationships) or the schema_hash
+    returned by POST /schemas.
+    """
     question: str
-    tables: List[TableDef]
-    relationships: List[RelationshipDef]
+    tables: List[TableDef] = []
+    relationships: List[RelationshipDef] = []
     database_type: str = "MySQL"  # Default to MySQL
     project_id: Optional[int] = None
+    schema_hash: Optional[str] = None  # Reference to a registered schema
+
+class SchemaRegisterRequest(BaseModel):
+    """Request model for registering a schema once and referencing it by hash."""
+    tables: List[TableDef]
+    relationships: List[RelationshipDef] = []
+    database_type: str = "MySQL"
+
+class SchemaRegisterResponse(BaseModel):
+    schema_hash: str
+    database_type: str
+    table_count: int
+    relationship_count: int
+    message: str
     
 class SQLResponse(BaseModel):
     sql: str
@@ -45,6 +64,7 @@ class IndexSuggestionRequest(BaseModel):
     sql: str
     tables: List[TableDef]
     database_type: str = "MySQL"
+    use_llm: bool = False  # Add LLM suggestions on top of the rule-based ones
 
 class IndexSuggestion(BaseModel):
     table: str
@@ -57,6 +77,24 @@ class IndexSuggestionResponse(BaseModel):
     suggestions: List[IndexSuggestion]
     summary: str
 
+class WorkloadIndexRecommendation(BaseModel):
+    table: str
+    columns: List[str]
+    index_type: str
+    sql: str
+    rationale: str
+    query_count: int  # History queries this index serves
+    coverage: float  # Share of parsed workload queries served
+    history_ids: List[int]  # Covered QueryHistory ids (first 50)
+
+class WorkloadIndexResponse(BaseModel):
+    recommendations: List[WorkloadIndexRecommendation]
+    analyzed_queries: int
+    new_queries_parsed: int
+    unparsed_queries: int
+    covered_queries: int
+    summary: str
+
 # SML Import/Export Schemas
 
 class SMLImportRequest(BaseModel):
@@ -1,13 +1,21 @@
 """
-Index Advisor Service using LLM for schema optimization.
+Index Advisor Service for schema optimization.
 Analyzes SQL queries and schema to suggest appropriate indexes.
+
+Suggestions come from a deterministic sqlglot AST analysis (index_rules);
+the LLM is an optional enrichment that can add suggestions the rules miss.
 """
 
 import json
+import logging
 import re
+import time
 from typing import List, Dict
-from g4f.client import Client
 from app.schemas.payload import TableDef, IndexSuggestion, IndexSuggestionResponse
+from app.services.index_rules import extract_usage, build_candidates, index_ddl
+from app.services.llm_provider import LLMProvider, get_llm_provider
+
+logger = logging.getLogger(__name__)
 
 INDEX_ADVISOR_PROMPT = """You are a Database Optimization Expert.
 Your task is to analyze a given SQL query and a database schema, then suggest optimal indexes to improve performance.
@@ -48,9 +56,13 @@ Return ONLY the JSON object. No other text.
 """
 
 class IndexAdvisor:
-    def __init__(self):
-        self.client = Client()
-        self.model = "gpt-4"
+    def __init__(self, provider: LLMProvider = None):
+        # The global provider (LLM_PROVIDER) is resolved on first use
+        self._provider = provider
+
+    @property
+    def provider(self) -> LLMProvider:
+        return self._provider or get_llm_provider()
 
     def _format_schema(self, tables: List[TableDef]) -> str:
         """Format the schema into a concise string for the LLM."""
@@ -70,8 +82,79 @@ class IndexAdvisor:
             schema_parts.append(f"Table {table.name}: {', '.join(cols)}")
         return "\n".join(schema_parts)
 
-    def suggest_indexes(self, sql: str, tables: List[TableDef], database_type: str = "MySQL") -> IndexSuggestionResponse:
-        """Generate index suggestions for a given query and schema."""
+    def suggest_indexes(
+        self,
+        sql: str,
+        tables: List[TableDef],
+        database_type: str = "MySQL",
+        use_llm: bool = False
+    ) -> IndexSuggestionResponse:
+        """
+        Generate index suggestions for a given query and schema.
+        
+        Args:
+            sql: SQL query to analyze
+            tables: Schema tables
+            database_type: Database dialect
+            use_llm: Also ask the LLM and add any suggestions the rules did not produce
+            
+        Returns:
+            IndexSuggestionResponse
+        """
+        response = self.suggest_indexes_rules(sql, tables, database_type)
+        if not use_llm:
+            return response
+
+        llm_response = self.suggest_indexes_llm(sql, tables, database_type)
+        if llm_response is None:
+            return response
+
+        seen = {(s.table.lower(), tuple(c.lower() for c in s.columns)) for s in response.suggestions}
+        for suggestion in llm_response.suggestions:
+            key = (suggestion.table.lower(), tuple(c.lower() for c in suggestion.columns))
+            if key not in seen:
+                seen.add(key)
+                response.suggestions.append(suggestion)
+        response.summary = f"{response.summary} {llm_response.summary}".strip()
+        return response
+
+    def suggest_indexes_rules(self, sql: str, tables: List[TableDef], database_type: str = "MySQL") -> IndexSuggestionResponse:
+        """Rule-based suggestions from the query AST (no LLM call)."""
+        start = time.perf_counter()
+        try:
+            usages = extract_usage(sql, tables, database_type)
+        except Exception as e:
+            logger.warning("Index advisor failed", extra={"error": str(e)})
+            return IndexSuggestionResponse(
+                suggestions=[],
+                summary="Failed to generate suggestions. Please check if the SQL is valid."
+            )
+
+        suggestions = []
+        for cand in build_candidates(usages, tables, database_type):
+            reasons = "; ".join(cand.reasons)
+            suggestions.append(IndexSuggestion(
+                table=cand.table,
+                columns=list(cand.columns),
+                index_type="COMPOSITE" if len(cand.columns) > 1 else "B-TREE",
+                rationale=f"{reasons[0].upper()}{reasons[1:]} ({database_type} B-tree index).",
+                sql=index_ddl(cand.table, cand.columns, database_type)
+            ))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if suggestions:
+            summary = f"{len(suggestions)} index suggestion(s) from query analysis ({elapsed_ms:.1f} ms)."
+        else:
+            summary = "No additional indexes needed: filters, joins and sorts are served by existing keys or are not indexable."
+        return IndexSuggestionResponse(suggestions=suggestions, summary=summary)
+
+    def suggest_indexes_llm(self, sql: str, tables: List[TableDef], database_type: str = "MySQL"):
+        """
+        LLM suggestions.
+        
+        Returns:
+            IndexSuggestionResponse, or None if the model call or its JSON failed
+        """
         schema_str = self._format_schema(tables)
         prompt = INDEX_ADVISOR_PROMPT.format(
             schema_str=schema_str,
@@ -80,13 +163,7 @@ class IndexAdvisor:
         )
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                timeout=30
-            )
-
-            raw_content = response.choices[0].message.content
+            raw_content = self.provider.complete(prompt, timeout=30)
             
             # Extract JSON from potential markdown/text
             json_match = re.search(r'(\{.*\}).*', raw_content, re.DOTALL)
@@ -99,9 +176,7 @@ class IndexAdvisor:
             for item in json_data.get("suggestions", []):
                 # Fallback if LLM forgets the 'sql' field
                 if "sql" not in item or not item["sql"]:
-                    idx_name = f"idx_{item['table']}_{'_'.join(item['columns'])}"
-                    cols_str = ", ".join(item['columns'])
-                    item["sql"] = f"CREATE INDEX {idx_name} ON {item['table']}({cols_str});"
+                    item["sql"] = index_ddl(item['table'], tuple(item['columns']), database_type)
                 
                 suggestions.append(IndexSuggestion(**item))
 
@@ -111,12 +186,8 @@ class IndexAdvisor:
             )
 
         except Exception as e:
-            print(f"Index Advisor Error: {str(e)}")
-            # Return empty response on failure rather than crashing
-            return IndexSuggestionResponse(
-                suggestions=[],
-                summary="Failed to generate suggestions. Please check if the SQL is valid."
-            )
+            logger.warning("Index advisor LLM call failed", extra={"error": str(e)})
+            return None
 
 # Global instance
 index_advisor = IndexAdvisor()
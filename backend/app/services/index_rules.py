@@ -0,0 +1,352 @@
+"""
+Rule-based index analysis using the sqlglot AST.
+
+Extracts, per table and per SELECT scope (and for UPDATE/DELETE), the
+columns a query uses:
+- equality predicates (=, IN, IS NULL) against constants
+- JOIN keys (column = column across two tables)
+- range predicates (<, >, BETWEEN, LIKE 'prefix%')
+- GROUP BY / ORDER BY columns
+
+and turns them into composite index candidates ordered equality, then
+sort, then range. Candidates already served by a PRIMARY KEY or UNIQUE
+column (and, on MySQL, by the implicit foreign key index) are skipped.
+No LLM call is involved; analysis of a typical query takes milliseconds.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.optimizer.scope import traverse_scope
+
+from app.schemas.payload import TableDef
+from app.core.security import to_sqlglot_dialect
+
+# Leading columns beyond this rarely help and make indexes expensive to maintain
+MAX_INDEX_COLUMNS = 4
+
+# Maximum identifier length per sqlglot dialect
+_MAX_NAME_LENGTH = {"postgres": 63, "mysql": 64, "oracle": 30, "tsql": 128, "sqlite": 128}
+
+_PLAIN_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Identifiers that must be quoted in every supported dialect
+_RESERVED = {
+    "ALL", "AND", "AS", "ASC", "BETWEEN", "BY", "CASE", "CHECK", "COLUMN", "CONSTRAINT",
+    "CREATE", "DEFAULT", "DELETE", "DESC", "DISTINCT", "DROP", "ELSE", "FOREIGN", "FROM",
+    "GRANT", "GROUP", "HAVING", "IN", "INDEX", "INSERT", "INTO", "IS", "JOIN", "KEY", "LIKE",
+    "LIMIT", "NOT", "NULL", "ON", "OR", "ORDER", "PRIMARY", "REFERENCES", "SELECT", "SET",
+    "TABLE", "THEN", "TO", "UNION", "UNIQUE", "UPDATE", "USER", "VALUES", "WHEN", "WHERE",
+}
+
+
+class TableUsage:
+    """Columns of one table used by one SELECT scope, in order of appearance."""
+
+    __slots__ = ("table", "equality", "join", "range", "group", "order")
+
+    def __init__(self, table: str):
+        self.table = table
+        self.equality: List[str] = []
+        self.join: List[str] = []
+        self.range: List[str] = []
+        self.group: List[str] = []
+        self.order: List[str] = []
+
+    @staticmethod
+    def _add(target: List[str], column: str) -> None:
+        if column not in target:
+            target.append(column)
+
+
+class IndexCandidate:
+    """A suggested index: table, ordered columns and why each column is there."""
+
+    __slots__ = ("table", "columns", "reasons")
+
+    def __init__(self, table: str, columns: Tuple[str, ...], reasons: List[str]):
+        self.table = table
+        self.columns = columns
+        self.reasons = reasons
+
+    @property
+    def key(self) -> Tuple[str, Tuple[str, ...]]:
+        return self.table.lower(), tuple(c.lower() for c in self.columns)
+
+
+class _SchemaLookup:
+    """Case-insensitive table/column resolution against the request schema."""
+
+    def __init__(self, tables: List[TableDef]):
+        self.tables: Dict[str, TableDef] = {t.name.lower(): t for t in tables}
+        self.columns: Dict[str, Dict[str, str]] = {
+            t.name.lower(): {c.name.lower(): c.name for c in t.columns} for t in tables
+        }
+
+    def table(self, name: str) -> Optional[TableDef]:
+        return self.tables.get(name.lower())
+
+    def column(self, table: str, column: str) -> Optional[str]:
+        return self.columns.get(table.lower(), {}).get(column.lower())
+
+
+def _is_constant(node: exp.Expression) -> bool:
+    """True for literals, bind parameters and expressions without column references."""
+    if isinstance(node, (exp.Literal, exp.Placeholder, exp.Parameter, exp.Null, exp.Boolean)):
+        return True
+    if isinstance(node, (exp.Select, exp.Subquery)):
+        return False
+    return node.find(exp.Column) is None
+
+
+def _conjuncts(condition: Optional[exp.Expression]) -> List[exp.Expression]:
+    """Top-level AND terms of a WHERE/ON condition (OR branches are not indexable together)."""
+    if condition is None:
+        return []
+    if isinstance(condition, exp.Where):
+        condition = condition.this
+    while isinstance(condition, exp.Paren):
+        condition = condition.this
+    if isinstance(condition, exp.And):
+        return list(condition.flatten())
+    return [condition]
+
+
+def _resolve(column: exp.Column, sources: Dict[str, object], schema: _SchemaLookup) -> Optional[Tuple[str, str]]:
+    """Resolve a column reference to (table name, schema column name) within a scope's sources."""
+    tables = {
+        alias: source for alias, source in sources.items() if isinstance(source, exp.Table)
+    }
+    if column.table:
+        source = tables.get(column.table)
+        if source is None:
+            return None  # CTE/subquery column or unknown alias
+        table = source.name
+        name = schema.column(table, column.name)
+        return (schema.table(table).name, name) if name else None
+
+    # Unqualified: the only table in scope that has this column
+    matches = [
+        (schema.table(t.name).name, schema.column(t.name, column.name))
+        for t in tables.values()
+        if schema.table(t.name) is not None and schema.column(t.name, column.name)
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+def extract_usage(sql: str, tables: List[TableDef], database_type: str = "MySQL") -> List[TableUsage]:
+    """
+    Collect per-table column usage for every SELECT scope in the SQL.
+
+    Args:
+        sql: One or more SQL statements
+        tables: Schema tables (used to resolve unqualified columns)
+        database_type: Database dialect
+
+    Returns:
+        List of TableUsage, one per (scope, table) with indexable usage
+
+    Raises:
+        sqlglot.errors.ParseError: If the SQL cannot be parsed
+    """
+    schema = _SchemaLookup(tables)
+    usages: List[TableUsage] = []
+
+    for statement in sqlglot.parse(sql, read=to_sqlglot_dialect(database_type)):
+        if statement is None:
+            continue
+        if isinstance(statement, (exp.Update, exp.Delete)) and isinstance(statement.this, exp.Table):
+            # WHERE of UPDATE/DELETE benefits from the same indexes as a SELECT
+            target = statement.this
+            usages.extend(_scope_usage(statement, {target.alias_or_name: target}, schema))
+        for scope in traverse_scope(statement):
+            if isinstance(scope.expression, exp.Select):
+                usages.extend(_scope_usage(scope.expression, scope.sources, schema))
+
+    return usages
+
+
+def _scope_usage(node: exp.Expression, sources: Dict[str, object], schema: _SchemaLookup) -> List[TableUsage]:
+    """Column usage per table for one SELECT (or UPDATE/DELETE) and its sources."""
+    by_table: Dict[str, TableUsage] = {}
+
+    def usage_for(table: str) -> TableUsage:
+        if table not in by_table:
+            by_table[table] = TableUsage(table)
+        return by_table[table]
+
+    def resolve(expr) -> Optional[Tuple[str, str]]:
+        return _resolve(expr, sources, schema) if isinstance(expr, exp.Column) else None
+
+    conditions = _conjuncts(node.args.get("where"))
+    for join in node.args.get("joins") or []:
+        conditions.extend(_conjuncts(join.args.get("on")))
+
+    for cond in conditions:
+        if isinstance(cond, (exp.EQ, exp.NullSafeEQ)):
+            left, right = resolve(cond.this), resolve(cond.expression)
+            if left and right:
+                if left[0] != right[0]:
+                    TableUsage._add(usage_for(left[0]).join, left[1])
+                    TableUsage._add(usage_for(right[0]).join, right[1])
+            elif left and _is_constant(cond.expression):
+                TableUsage._add(usage_for(left[0]).equality, left[1])
+            elif right and _is_constant(cond.this):
+                TableUsage._add(usage_for(right[0]).equality, right[1])
+        elif isinstance(cond, (exp.In, exp.Is)):
+            target = resolve(cond.this)
+            if target:
+                TableUsage._add(usage_for(target[0]).equality, target[1])
+        elif isinstance(cond, (exp.GT, exp.GTE, exp.LT, exp.LTE)):
+            left, right = resolve(cond.this), resolve(cond.expression)
+            if left and not right and _is_constant(cond.expression):
+                TableUsage._add(usage_for(left[0]).range, left[1])
+            elif right and not left and _is_constant(cond.this):
+                TableUsage._add(usage_for(right[0]).range, right[1])
+        elif isinstance(cond, exp.Between):
+            target = resolve(cond.this)
+            if target:
+                TableUsage._add(usage_for(target[0]).range, target[1])
+        elif isinstance(cond, exp.Like):
+            target = resolve(cond.this)
+            pattern = cond.expression
+            # Only a fixed prefix can use a B-tree
+            if target and isinstance(pattern, exp.Literal) and pattern.is_string \
+                    and pattern.this and pattern.this[0] not in "%_":
+                TableUsage._add(usage_for(target[0]).range, target[1])
+
+    group = node.args.get("group")
+    for expr in (group.expressions if group else []):
+        target = resolve(expr)
+        if target:
+            TableUsage._add(usage_for(target[0]).group, target[1])
+
+    order = node.args.get("order")
+    order_targets = [resolve(o.this) for o in (order.expressions if order else [])]
+    # An index can only provide an order made entirely of one table's columns
+    if order_targets and all(order_targets) and len({t for t, _ in order_targets}) == 1:
+        for table, column in order_targets:
+            TableUsage._add(usage_for(table).order, column)
+
+    return list(by_table.values())
+
+
+def _is_covered(columns: Tuple[str, ...], table: TableDef, dialect: str) -> bool:
+    """True if an existing PK/UNIQUE (or implicit FK) index already serves this candidate."""
+    by_name = {c.name: c for c in table.columns}
+    pk = [c.name for c in table.columns if c.primaryKey]
+    if pk and set(columns[:len(pk)]) == set(pk):
+        return True
+    leading = by_name.get(columns[0])
+    if leading is not None and leading.unique:
+        return True
+    # InnoDB creates an index for every foreign key column
+    if dialect == "mysql" and len(columns) == 1 and leading is not None and leading.isForeignKey:
+        return True
+    return False
+
+
+def build_candidates(
+    usages: List[TableUsage],
+    tables: List[TableDef],
+    database_type: str = "MySQL"
+) -> List[IndexCandidate]:
+    """
+    Turn column usage into deduplicated index candidates.
+
+    Column order follows equality -> sort -> range, so the index serves the
+    filters, then returns rows already sorted, then narrows by range.
+
+    Args:
+        usages: Output of extract_usage()
+        tables: Schema tables
+        database_type: Database dialect
+
+    Returns:
+        Index candidates, longest first per table, with prefix duplicates removed
+    """
+    schema = _SchemaLookup(tables)
+    dialect = to_sqlglot_dialect(database_type)
+    candidates: List[IndexCandidate] = []
+
+    for usage in usages:
+        table = schema.table(usage.table)
+        if table is None:
+            continue
+
+        columns: List[str] = []
+        reasons: List[str] = []
+
+        def take(cols: List[str], reason: str, limit: Optional[int] = None) -> None:
+            added = []
+            for c in cols:
+                if c not in columns and len(columns) < MAX_INDEX_COLUMNS:
+                    columns.append(c)
+                    added.append(c)
+                    if limit is not None and len(added) >= limit:
+                        break
+            if added:
+                reasons.append(f"{reason} on {', '.join(added)}")
+
+        take(usage.equality, "equality filter")
+        take(usage.join, "join key")
+        if usage.group:
+            take(usage.group, "GROUP BY")
+        elif usage.order:
+            take(usage.order, "ORDER BY")
+        # Only the first range column can use the index for seeking
+        take(usage.range, "range filter", limit=1)
+
+        if not columns or _is_covered(tuple(columns), table, dialect):
+            continue
+        candidates.append(IndexCandidate(table.name, tuple(columns), reasons))
+
+    return dedupe_candidates(candidates)
+
+
+def dedupe_candidates(candidates: List[IndexCandidate]) -> List[IndexCandidate]:
+    """Drop exact duplicates and candidates that are a leading prefix of another one."""
+    ordered = sorted(candidates, key=lambda c: -len(c.columns))
+    kept: List[IndexCandidate] = []
+    for cand in ordered:
+        table, cols = cand.key
+        duplicate = next(
+            (k for k in kept if k.key[0] == table and k.key[1][:len(cols)] == cols),
+            None
+        )
+        if duplicate is not None:
+            for reason in cand.reasons:
+                if reason not in duplicate.reasons:
+                    duplicate.reasons.append(reason)
+            continue
+        kept.append(cand)
+    return kept
+
+
+def quote_identifier(name: str, database_type: str = "MySQL") -> str:
+    """Quote an identifier for the dialect only when needed."""
+    if _PLAIN_IDENTIFIER.match(name) and name.upper() not in _RESERVED:
+        return name
+    return exp.to_identifier(name, quoted=True).sql(dialect=to_sqlglot_dialect(database_type))
+
+
+def index_name(table: str, columns: Tuple[str, ...], database_type: str = "MySQL") -> str:
+    """Deterministic index name within the dialect's identifier length limit."""
+    raw = "_".join(["idx", table, *columns])
+    name = re.sub(r"[^A-Za-z0-9_]+", "_", raw).lower()
+    limit = _MAX_NAME_LENGTH.get(to_sqlglot_dialect(database_type), 63)
+    if len(name) > limit:
+        digest = hashlib.sha1(raw.encode()).hexdigest()[:8]
+        name = f"{name[:limit - 9].rstrip('_')}_{digest}"
+    return name
+
+
+def index_ddl(table: str, columns: Tuple[str, ...], database_type: str = "MySQL") -> str:
+    """CREATE INDEX statement for the dialect."""
+    create = "CREATE NONCLUSTERED INDEX" if to_sqlglot_dialect(database_type) == "tsql" else "CREATE INDEX"
+    cols = ", ".join(quote_identifier(c, database_type) for c in columns)
+    name = quote_identifier(index_name(table, columns, database_type), database_type)
+    return f"{create} {name} ON {quote_identifier(table, database_type)} ({cols});"
@@ -0,0 +1,367 @@
+"""
+LLM Provider Module
+
+Pluggable backends for the chat-completion calls made by ModelService and
+IndexAdvisor, so the service can be recorded, replayed and load-tested
+without network access.
+
+Providers (LLM_PROVIDER environment variable):
+- "g4f" (default): the live g4f client.
+- "record": the live client. Every prompt -> response pair is also
+  appended to LLM_RECORDING_PATH (JSON lines).
+- "replay": answers from a recording, with simulated latency
+  (LLM_REPLAY_LATENCY) and simulated provider errors
+  (LLM_REPLAY_ERROR_RATE). Prompts missing from the recording get a stub
+  answer (LLM_REPLAY_ON_MISS=stub, the default) or an error
+  (LLM_REPLAY_ON_MISS=error). Without a recording every prompt is a
+  miss, which makes a fully offline stub.
+
+Latency specs: "0", "fixed:MS", "uniform:LO_MS,HI_MS",
+"lognormal:MEDIAN_MS,SIGMA", or "recorded" (the latency of the recorded
+call; falls back to 0 for misses).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stub answer for prompts that ask for the index advisor's JSON
+STUB_INDEX_RESPONSE = json.dumps({"suggestions": [], "summary": "Stub provider: no LLM suggestions."})
+STUB_SQL_RESPONSE = "SELECT 1;"
+
+
+class ProviderError(Exception):
+    """Raised by providers for failed calls (simulated or replayed)."""
+    pass
+
+
+def prompt_key(prompt: str) -> str:
+    """Key of a prompt in recordings (SHA-256 of its text)."""
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+def stub_response(prompt: str) -> str:
+    """Deterministic answer of the right shape for prompts missing from a recording."""
+    if "Return ONLY the JSON object" in prompt:
+        return STUB_INDEX_RESPONSE
+    return STUB_SQL_RESPONSE
+
+
+class LLMProvider:
+    """
+    Chat-completion backend: one user prompt in, the response text out.
+
+    Subclasses implement complete(); acomplete() runs it in a thread unless
+    overridden with a native async call.
+    """
+
+    name = "base"
+
+    def complete(self, prompt: str, timeout: float = 30) -> str:
+        raise NotImplementedError
+
+    async def acomplete(self, prompt: str, timeout: float = 30) -> str:
+        return await asyncio.to_thread(self.complete, prompt, timeout)
+
+    def snapshot(self) -> Dict:
+        return {"provider": self.name}
+
+
+class G4FProvider(LLMProvider):
+    """Live g4f clients (sync client eagerly, async client on first use)."""
+
+    name = "g4f"
+
+    def __init__(self, model: str = "gpt-4"):
+        # Imported here so replay mode runs without g4f installed
+        from g4f.client import Client
+        self.model = model  # g4f uses this as a generic identifier
+        self.client = Client()
+        self._async_client = None
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            from g4f.client import AsyncClient
+            self._async_client = AsyncClient()
+        return self._async_client
+
+    def complete(self, prompt: str, timeout: float = 30) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            timeout=timeout
+        )
+        return response.choices[0].message.content
+
+    async def acomplete(self, prompt: str, timeout: float = 30) -> str:
+        # wait_for enforces the timeout even if the provider ignores it
+        response = await asyncio.wait_for(
+            self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                timeout=timeout
+            ),
+            timeout=timeout
+        )
+        return response.choices[0].message.content
+
+
+class RecordingProvider(LLMProvider):
+    """
+    Wraps another provider and appends every call to a JSON-lines file.
+
+    Each line holds the prompt key, prompt, response (or error) and the call
+    latency, which ReplayProvider can reproduce.
+    """
+
+    name = "record"
+
+    def __init__(self, inner: LLMProvider, path: str):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def _write(self, prompt: str, started: float, response: Optional[str], error: Optional[Exception]) -> None:
+        entry = {
+            "key": prompt_key(prompt),
+            "prompt": prompt,
+            "response": response,
+            "error": f"{type(error).__name__}: {error}" if error is not None else None,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.recorded += 1
+
+    def complete(self, prompt: str, timeout: float = 30) -> str:
+        started = time.perf_counter()
+        try:
+            response = self.inner.complete(prompt, timeout)
+        except Exception as e:
+            self._write(prompt, started, None, e)
+            raise
+        self._write(prompt, started, response, None)
+        return response
+
+    async def acomplete(self, prompt: str, timeout: float = 30) -> str:
+        started = time.perf_counter()
+        try:
+            response = await self.inner.acomplete(prompt, timeout)
+        except Exception as e:
+            self._write(prompt, started, None, e)
+            raise
+        self._write(prompt, started, response, None)
+        return response
+
+    def snapshot(self) -> Dict:
+        return {"provider": self.name, "inner": self.inner.name, "path": self.path, "recorded": self.recorded}
+
+
+class LatencyModel:
+    """Simulated call latency parsed from a spec string (see module docstring)."""
+
+    def __init__(self, spec: str = "0"):
+        self.spec = (spec or "0").strip().lower()
+        kind, _, params = self.spec.partition(":")
+        values = [float(v) for v in params.split(",") if v.strip()]
+        if kind in ("0", "none"):
+            self._sample = lambda rng, recorded: 0.0
+        elif kind == "fixed" and len(values) == 1:
+            self._sample = lambda rng, recorded: values[0]
+        elif kind == "uniform" and len(values) == 2:
+            self._sample = lambda rng, recorded: rng.uniform(values[0], values[1])
+        elif kind == "lognormal" and len(values) == 2:
+            mu = math.log(max(values[0], 1e-6))
+            self._sample = lambda rng, recorded: rng.lognormvariate(mu, values[1])
+        elif kind == "recorded":
+            self._sample = lambda rng, recorded: recorded or 0.0
+        else:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+
+    def sample_ms(self, rng: random.Random, recorded_ms: Optional[float] = None) -> float:
+        return max(0.0, self._sample(rng, recorded_ms))
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Answers from a recording with simulated latency and error rate.
+
+    Several recorded responses for the same prompt are replayed in turn.
+    Recorded errors are replayed as ProviderError.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        latency: str = "recorded",
+        error_rate: float = 0.0,
+        on_miss: str = "stub",
+        seed: Optional[int] = None,
+        miss_response: Callable[[str], str] = stub_response
+    ):
+        """
+        Args:
+            path: JSON-lines recording from RecordingProvider (None: every prompt misses)
+            latency: Latency spec applied to every call
+            error_rate: Probability (0-1) of a simulated ProviderError per call
+            on_miss: "stub" answers unrecorded prompts with miss_response, "error" raises
+            seed: Seed for latency and error sampling (reproducible runs)
+            miss_response: Answer for unrecorded prompts
+        """
+        if on_miss not in ("stub", "error"):
+            raise ValueError("on_miss must be 'stub' or 'error'")
+        self.path = path
+        self.latency = LatencyModel(latency)
+        self.error_rate = max(0.0, min(1.0, error_rate))
+        self.on_miss = on_miss
+        self.miss_response = miss_response
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recordings: Dict[str, List[dict]] = {}
+        self._positions: Dict[str, int] = {}
+        self.calls = 0
+        self.replayed = 0
+        self.misses = 0
+        self.simulated_errors = 0
+        if path:
+            self._load(path)
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                key = entry.get("key") or prompt_key(entry["prompt"])
+                self._recordings.setdefault(key, []).append(entry)
+        logger.info("Loaded LLM recording", extra={"path": path, "prompts": len(self._recordings)})
+
+    def _next(self, prompt: str):
+        """Pick the answer for one call: (delay seconds, response or None, error or None)."""
+        key = prompt_key(prompt)
+        with self._lock:
+            self.calls += 1
+            entries = self._recordings.get(key)
+            entry = None
+            if entries:
+                position = self._positions.get(key, 0)
+                entry = entries[position % len(entries)]
+                self._positions[key] = position + 1
+                self.replayed += 1
+            else:
+                self.misses += 1
+            delay = self.latency.sample_ms(self._rng, entry.get("latency_ms") if entry else None) / 1000
+            simulated_error = self._rng.random() < self.error_rate
+            if simulated_error:
+                self.simulated_errors += 1
+
+        if simulated_error:
+            return delay, None, ProviderError("Simulated provider error")
+        if entry is not None:
+            if entry.get("error"):
+                return delay, None, ProviderError(entry["error"])
+            return delay, entry.get("response") or "", None
+        if self.on_miss == "error":
+            return delay, None, ProviderError("Prompt not in recording")
+        return delay, self.miss_response(prompt), None
+
+    def complete(self, prompt: str, timeout: float = 30) -> str:
+        delay, response, error = self._next(prompt)
+        if delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Replay latency exceeded the call timeout")
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return response
+
+    async def acomplete(self, prompt: str, timeout: float = 30) -> str:
+        delay, response, error = self._next(prompt)
+        if delay > timeout:
+            await asyncio.sleep(timeout)
+            raise asyncio.TimeoutError("Replay latency exceeded the call timeout")
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return response
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "provider": self.name,
+                "path": self.path,
+                "recorded_prompts": len(self._recordings),
+                "latency": self.latency.spec,
+                "error_rate": self.error_rate,
+                "calls": self.calls,
+                "replayed": self.replayed,
+                "misses": self.misses,
+                "simulated_errors": self.simulated_errors,
+            }
+
+
+def create_llm_provider(kind: Optional[str] = None) -> LLMProvider:
+    """
+    Build the provider selected by LLM_PROVIDER (or kind) and its settings.
+
+    Returns:
+        LLMProvider instance
+    """
+    kind = (kind or os.getenv("LLM_PROVIDER", "g4f")).lower()
+    path = os.getenv("LLM_RECORDING_PATH", "llm_recording.jsonl")
+    if kind == "g4f":
+        return G4FProvider()
+    if kind == "record":
+        return RecordingProvider(G4FProvider(), path or "llm_recording.jsonl")
+    if kind == "replay":
+        seed = os.getenv("LLM_REPLAY_SEED")
+        return ReplayProvider(
+            # An empty or missing recording stubs every prompt
+            path=path if path and os.path.exists(path) else None,
+            latency=os.getenv("LLM_REPLAY_LATENCY", "recorded"),
+            error_rate=float(os.getenv("LLM_REPLAY_ERROR_RATE", "0") or 0),
+            on_miss=os.getenv("LLM_REPLAY_ON_MISS", "stub").lower(),
+            seed=int(seed) if seed else None
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER '{kind}' (expected g4f, record or replay)")
+
+
+# Global provider instance (singleton)
+_llm_provider_instance = None
+_llm_provider_lock = threading.Lock()
+
+
+def get_llm_provider() -> LLMProvider:
+    """Get or create the global LLM provider."""
+    global _llm_provider_instance
+    if _llm_provider_instance is None:
+        with _llm_provider_lock:
+            if _llm_provider_instance is None:
+                _llm_provider_instance = create_llm_provider()
+                logger.info("LLM provider ready", extra={"provider": _llm_provider_instance.name})
+    return _llm_provider_instance
+
+
+def set_llm_provider(provider: LLMProvider) -> None:
+    """Replace the global provider (load tests, offline runs)."""
+    global _llm_provider_instance
+    with _llm_provider_lock:
+        _llm_provider_instance = provider
@@ -1,19 +1,31 @@
 """
-Model Service using g4f library for NL2SQL generation.
-Uses Qwen/Qwen2.5-Coder-7B-Instruct for SQL generation.
+Model Service for NL2SQL generation.
+Calls the configured LLM provider (g4f by default, see llm_provider).
 """
 
-from g4f.client import Client
+import logging
 import re
+import time
+from typing import Optional
 from app.services.prompt_builder import build_prompt
+from app.services.llm_provider import LLMProvider, get_llm_provider
+from app.core.metrics import LLM_ATTEMPTS, LLM_ATTEMPT_SECONDS, LLM_PROVIDER_ERRORS, LLM_ATTEMPTS_PER_GENERATION
+from app.core.logging_config import log_payload
+
+logger = logging.getLogger(__name__)
+
+# Attempts per generation (free providers fail intermittently)
+MAX_ATTEMPTS = 5
+LLM_TIMEOUT_SECONDS = 30
 
 class ModelService:
-    def __init__(self):
-        print("Initializing g4f Model Service...")
-        self.client = Client()
-        # Primary model: Qwen for code generation
-        self.model = "gpt-4"  # g4f uses this as a generic identifier
-        print("g4f Model Service initialized")
+    def __init__(self, provider: LLMProvider = None):
+        # The global provider (LLM_PROVIDER) is resolved on first use
+        self._provider = provider
+
+    @property
+    def provider(self) -> LLMProvider:
+        return self._provider or get_llm_provider()
 
     def fix_sql_syntax(self, sql: str) -> str:
         """
@@ -88,6 +100,45 @@ class ModelService:
             
         return output
 
+    def _retry_or_raise(self, attempt: int, error: str, mode: str, message: str) -> None:
+        """Log a failed attempt and return if another one is allowed; raise after the last."""
+        if attempt < MAX_ATTEMPTS:
+            logger.warning(message, extra={"attempt": attempt, "error": error})
+            return
+        logger.error("All LLM attempts failed", extra={"attempts": MAX_ATTEMPTS, "error": error})
+        LLM_ATTEMPTS_PER_GENERATION.observe(attempt, mode=mode, result="failure")
+        raise Exception(f"Failed to generate SQL after {MAX_ATTEMPTS} attempts: {error}")
+
+    def _provider_failed(self, error: Exception, attempt: int, mode: str) -> None:
+        """Record a provider exception; raises when no attempts are left."""
+        LLM_ATTEMPTS.inc(mode=mode, outcome="exception")
+        LLM_PROVIDER_ERRORS.inc(mode=mode, error=type(error).__name__)
+        self._retry_or_raise(attempt, str(error) or type(error).__name__, mode, "LLM call failed, retrying")
+
+    def _finish_attempt(self, raw_sql: str, attempt: int, mode: str) -> Optional[str]:
+        """
+        Clean a provider response and record the attempt's outcome.
+
+        Returns:
+            The cleaned SQL, or None if the attempt should be retried
+
+        Raises:
+            Exception: If the last attempt returned an error response
+        """
+        clean_sql = self.clean_sql_output(raw_sql)
+
+        # Check for error responses
+        if "ERROR:" in clean_sql.upper():
+            LLM_ATTEMPTS.inc(mode=mode, outcome="error_response")
+            self._retry_or_raise(attempt, clean_sql, mode, "LLM returned an error response, retrying")
+            return None
+
+        LLM_ATTEMPTS.inc(mode=mode, outcome="success")
+        LLM_ATTEMPTS_PER_GENERATION.observe(attempt, mode=mode, result="success")
+        if attempt > 1:
+            logger.info("LLM call succeeded after retries", extra={"attempt": attempt})
+        return clean_sql
+
     def generate_sql(self, schema_str: str, question: str, database_type: str = "MySQL") -> str:
         """
         Generate SQL from natural language question and schema.
@@ -104,57 +155,64 @@ class ModelService:
         Raises:
             Exception: If model call fails after all retries
         """
-        max_retries = 5
-        last_error = None
+        prompt = build_prompt(schema_str, question, database_type=database_type)
+        
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            log_payload(logger, "LLM prompt", lambda: {"attempt": attempt, "mode": "sync", "prompt": prompt})
+            attempt_start = time.perf_counter()
+            try:
+                raw_sql = self.provider.complete(prompt, timeout=LLM_TIMEOUT_SECONDS)
+            except Exception as e:
+                self._provider_failed(e, attempt, "sync")
+                continue
+            finally:
+                LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_start, mode="sync")
+            
+            sql = self._finish_attempt(raw_sql, attempt, "sync")
+            if sql is not None:
+                return sql
+        
+        # This shouldn't be reached, but just in case
+        raise Exception("Failed to generate SQL")
+
+    async def agenerate_sql(self, schema_str: str, question: str, database_type: str = "MySQL") -> str:
+        """
+        Async version of generate_sql.
+        
+        Awaits the LLM call instead of holding a worker thread, so one worker
+        can keep many slow generations pending at once. Retries, response
+        cleaning and metrics are shared with generate_sql.
+        
+        Args:
+            schema_str: Database schema
+            question: User's natural language question
+            database_type: Type of database (MySQL, PostgreSQL, etc.)
+            
+        Returns:
+            Generated SQL query
+            
+        Raises:
+            Exception: If model call fails after all retries
+        """
+        prompt = build_prompt(schema_str, question, database_type=database_type)
         
-        for attempt in range(1, max_retries + 1):
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            log_payload(logger, "LLM prompt", lambda: {"attempt": attempt, "mode": "async", "prompt": prompt})
+            attempt_start = time.perf_counter()
             try:
-                # Build the prompt
-                prompt = build_prompt(schema_str, question, database_type=database_type)
-                
-                print(f"\n--- PROMPT SENT TO AI (Attempt {attempt}) ---")
-                print(prompt)
-                print(f"{'-'*40}\n")
-                
-                # Call g4f model
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    timeout=30  # 30 second timeout
-                )
-                
-                # Extract response
-                raw_sql = response.choices[0].message.content
-                
-                # Clean the output
-                clean_sql = self.clean_sql_output(raw_sql)
-                
-                # Check for error responses
-                if "ERROR:" in clean_sql.upper():
-                    last_error = clean_sql
-                    if attempt < max_retries:
-                        print(f"Attempt {attempt} failed with error response, retrying...")
-                        continue
-                    raise ValueError(clean_sql)
-                
-                # Success!
-                if attempt > 1:
-                    print(f"✓ Succeeded on attempt {attempt}")
-                return clean_sql
-                
+                raw_sql = await self.provider.acomplete(prompt, timeout=LLM_TIMEOUT_SECONDS)
             except Exception as e:
-                last_error = str(e)
-                if attempt < max_retries:
-                    print(f"Attempt {attempt}/{max_retries} failed: {str(e)}, retrying...")
-                    continue
-                else:
-                    print(f"All {max_retries} attempts failed")
-                    raise Exception(f"Failed to generate SQL after {max_retries} attempts: {last_error}")
+                self._provider_failed(e, attempt, "async")
+                continue
+            finally:
+                LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_start, mode="async")
+            
+            sql = self._finish_attempt(raw_sql, attempt, "async")
+            if sql is not None:
+                return sql
         
         # This shouldn't be reached, but just in case
-        raise Exception(f"Failed to generate SQL: {last_error}")
+        raise Exception("Failed to generate SQL")
 
 # Global instance
 model_service = ModelService()
@@ -0,0 +1,735 @@
+"""
+Query Pipeline for /generate.
+
+Splits SQL generation into stages shared by the synchronous path and the
+async path:
+- prepare: validate and format the schema and compute its hash, or resolve
+  a registered schema_hash
+- exact lookup: normalized-question fingerprint (one unique-key query)
+
+Lookups match entries stored for this schema hash and, with table-subset
+keys, entries from other versions of the schema whose referenced tables
+are unchanged.
+- semantic lookup: embedding + resident similarity index (character n-gram
+  lexical index instead while the embedding model is unavailable)
+- cross-dialect lookup: an exact or semantic hit cached for the same tables
+  in another dialect, transpiled with sqlglot
+- template lookup: a similar cached query whose question differs only in
+  literal values, with the new values filled into its SQL
+- generation: schema pruning, LLM call (single-flight), validation and cache insert
+- history: QueryHistory row for logged-in users
+
+The sync path runs every stage in the calling thread. The async path runs
+DB and CPU stages in the threadpool and awaits the LLM and the embedding,
+so a slow generation never holds a worker thread.
+
+Each stage is timed (app.core.metrics) for the nl2sql_stage_seconds
+histogram and the Server-Timing response header.
+"""
+
+import logging
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from app.schemas.payload import StructuredSchemaRequest, SQLResponse, TableDef, RelationshipDef
+from app.models.user import User
+from app.models.history import QueryHistory
+from app.models.cache import SemanticQueryCache, CacheTableRef
+from app.core.database import SessionLocal
+from app.core.semantic_cache import get_semantic_cache
+from app.core.similarity_index import get_similarity_index
+from app.core.lexical_index import get_lexical_index
+from app.core.hit_stats import get_hit_stats
+from app.core.single_flight import get_generation_flight, get_async_generation_flight
+from app.core.cache_config import is_cache_enabled, get_similarity_threshold, get_cache_config
+from app.core.embedding_codec import encode_embedding, decode_embedding, DEFAULT_EMBEDDING_DTYPE
+from app.core.security import validate_sql, transpile_sql
+from app.core.schema_validator import validate_schema, format_schema_for_model, SchemaValidationError
+from app.core.schema_registry import get_schema_registry
+from app.core.schema_pruner import get_schema_pruner
+from app.core.sql_template import build_template, fill_template
+from app.core.schema_subset import schema_table_fingerprints, referenced_table_fingerprints, compatible_entries
+from app.core.metrics import stage, timed, CACHE_SIMILARITY
+from app.services.model_service import model_service
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationState:
+    """
+    Per-request state passed between pipeline stages.
+    """
+
+    def __init__(self, request: StructuredSchemaRequest, current_user: Optional[User]):
+        self.request = request
+        self.current_user = current_user
+        self.sem_cache = get_semantic_cache()
+        self.tables: List[TableDef] = []
+        self.relationships: List[RelationshipDef] = []
+        self.formatted_schema: Optional[str] = None
+        self.schema_hash: Optional[str] = None
+        self.logical_schema_hash: Optional[str] = None
+        self.table_fingerprints: Optional[List[str]] = None
+        self.question_embedding = None
+        self.schema_index = None
+
+        self.sql: Optional[str] = None
+        self.is_valid = False
+        self.message: Optional[str] = None
+        self.from_cache = False
+        self.cache_similarity = 0.0
+        self.original_question: Optional[str] = None
+
+    def response(self) -> SQLResponse:
+        return SQLResponse(
+            sql=self.sql,
+            is_valid=self.is_valid,
+            message=self.message,
+            from_cache=self.from_cache,
+            cache_similarity=self.cache_similarity,
+            original_question=self.original_question
+        )
+
+
+@timed("schema")
+def prepare(db: Session, state: GenerationState) -> None:
+    """
+    Validate the request and schema, format the prompt schema and hash it.
+    
+    Requests referencing a registered schema_hash reuse the stored parsed
+    schema and prompt text instead.
+
+    Raises:
+        SchemaValidationError: If the question or schema is invalid
+        SchemaNotFoundError: If schema_hash is not registered
+    """
+    request = state.request
+    logger.debug("Received generate request", extra={"question": request.question, "dialect": request.database_type})
+
+    # Validate inputs
+    if not request.question.strip():
+        raise SchemaValidationError("Question cannot be empty")
+
+    if request.schema_hash and not request.tables:
+        parsed = get_schema_registry().resolve(db, request.schema_hash)
+        if "database_type" in request.model_fields_set and request.database_type != parsed.database_type:
+            raise SchemaValidationError(
+                f"Schema '{parsed.schema_hash}' is registered for {parsed.database_type}, not {request.database_type}"
+            )
+        # The registered dialect is part of the hash
+        request.database_type = parsed.database_type
+        state.tables = parsed.tables
+        state.relationships = parsed.relationships
+        state.formatted_schema = parsed.formatted_schema
+        state.schema_hash = parsed.schema_hash
+        state.logical_schema_hash = parsed.logical_schema_hash
+        logger.debug("Using registered schema", extra={"schema_hash": parsed.schema_hash, "tables": len(parsed.tables)})
+        return
+
+    logger.debug("Inline schema", extra={"tables": len(request.tables), "relationships": len(request.relationships)})
+
+    if not request.tables:
+        raise SchemaValidationError("Tables definition cannot be empty")
+
+    # Pydantic models are already parsed, just validate semantics
+    is_valid, error_msg = validate_schema(request.tables, request.relationships)
+    if not is_valid:
+        raise SchemaValidationError(f"Schema validation error: {error_msg}")
+
+    state.tables = request.tables
+    state.relationships = request.relationships
+
+    # Format schema for model
+    state.formatted_schema = format_schema_for_model(request.tables, request.relationships)
+
+    # --- Schema Fingerprinting ---
+    state.schema_hash = state.sem_cache.generate_schema_hash(
+        request.tables, request.relationships, request.database_type
+    )
+    logger.debug("Schema hashed", extra={"schema_hash": state.schema_hash})
+
+
+def table_fingerprints(state: GenerationState) -> Optional[List[str]]:
+    """Fingerprints of the schema's tables for subset lookups (None when disabled)."""
+    if not get_cache_config("subset_cache_keys_enabled"):
+        return None
+    if state.table_fingerprints is None:
+        state.table_fingerprints = sorted(set(schema_table_fingerprints(state.tables).values()))
+    return state.table_fingerprints
+
+
+def _use_cache_hit(state: GenerationState, cache_hit: SemanticQueryCache, similarity: float) -> None:
+    # Update hit stats (write-behind, flushed in batches off the request path)
+    get_hit_stats().record(cache_hit.id)
+
+    logger.info("Cache hit", extra={"entry_id": cache_hit.id, "similarity": round(similarity, 4)})
+
+    state.sql = cache_hit.sql_generated
+    state.from_cache = True
+    state.cache_similarity = similarity
+    state.original_question = cache_hit.question
+
+    if cache_hit.sql_valid is not None:
+        # Verdict recorded when the entry was stored: no re-parse
+        state.is_valid = cache_hit.sql_valid
+        state.message = cache_hit.sql_validation_message or ("Valid" if cache_hit.sql_valid else None)
+    else:
+        # Entries stored before verdicts were recorded (memoized per worker)
+        state.is_valid, state.message = validate_sql(state.sql, dialect=state.request.database_type)
+
+
+def _compatible_exact(db: Session, state: GenerationState, question_fingerprint: str) -> Optional[SemanticQueryCache]:
+    """Same question stored for another version of the schema with all its tables unchanged."""
+    candidates = db.query(SemanticQueryCache).filter(
+        SemanticQueryCache.question_fingerprint == question_fingerprint,
+        SemanticQueryCache.database_type == state.request.database_type,
+        SemanticQueryCache.schema_hash != state.schema_hash,
+        SemanticQueryCache.table_ref_count.isnot(None)
+    ).order_by(SemanticQueryCache.id).all()
+    if not candidates:
+        return None
+    compatible = compatible_entries(db, [c.id for c in candidates], table_fingerprints(state))
+    return next((c for c in candidates if c.id in compatible), None)
+
+
+@timed("exact_lookup")
+def lookup_exact(db: Session, state: GenerationState) -> bool:
+    """
+    Exact-match fast path: same normalized question on the same schema.
+
+    One lookup on the unique key, no embedding model inference. On a miss
+    with table-subset keys, the rows with the same question fingerprint in
+    other schema versions are checked for unchanged tables.
+
+    Returns:
+        True on a cache hit (state is filled in)
+    """
+    if not is_cache_enabled():
+        return False
+
+    sem_cache = state.sem_cache
+    question_fingerprint = sem_cache.generate_question_fingerprint(state.request.question)
+    # The unique (schema_hash, database_type, question_fingerprint) key
+    exact_hit = db.query(SemanticQueryCache).filter(
+        SemanticQueryCache.schema_hash == state.schema_hash,
+        SemanticQueryCache.database_type == state.request.database_type,
+        SemanticQueryCache.question_fingerprint == question_fingerprint
+    ).first()
+    if exact_hit is None and table_fingerprints(state):
+        exact_hit = _compatible_exact(db, state, question_fingerprint)
+
+    if not exact_hit:
+        sem_cache.statistics.record("exact_miss")
+        return False
+
+    sem_cache.statistics.record("exact_hit")
+    logger.debug("Exact fingerprint match, skipping embedding")
+    _use_cache_hit(state, exact_hit, 1.0)
+    return True
+
+
+def _question_loader(db: Session):
+    def load_questions(entry_ids):
+        return dict(db.query(
+            SemanticQueryCache.id,
+            SemanticQueryCache.question
+        ).filter(SemanticQueryCache.id.in_(entry_ids)).all())
+    return load_questions
+
+
+def lookup_semantic(db: Session, state: GenerationState) -> bool:
+    """
+    Semantic lookup using state.question_embedding and the resident similarity index.
+
+    Returns:
+        True on a cache hit (state is filled in)
+    """
+    if not is_cache_enabled() or state.question_embedding is None:
+        return False
+
+    if not any(state.question_embedding) and get_cache_config("lexical_fallback_enabled"):
+        # Zero vector: the embedding model is unavailable
+        return lookup_lexical(db, state)
+
+    sem_cache = state.sem_cache
+    request = state.request
+
+    # Sync the resident similarity index for this schema (loads on
+    # first use, then only fetches rows added by other workers)
+    with stage("index_sync"):
+        schema_index = get_similarity_index().sync(
+            db, state.schema_hash, request.database_type, table_fingerprints(state)
+        )
+    state.schema_index = schema_index
+
+    logger.debug("Similarity index synced", extra={"candidates": schema_index.size})
+
+    with stage("similarity_scan"):
+        match_result, best_similarity = sem_cache.find_similar_in_index(
+            request.question,
+            state.question_embedding,
+            schema_index,
+            load_questions=_question_loader(db)
+        )
+
+    cache_hit = None
+    if match_result:
+        with stage("cache_fetch"):
+            cache_hit = db.query(SemanticQueryCache).filter(
+                SemanticQueryCache.id == match_result["id"]
+            ).first()
+        if cache_hit is None:
+            # Row was deleted since the index was synced
+            schema_index.remove([match_result["id"]])
+
+    sem_cache.statistics.record("semantic_hit" if cache_hit else "semantic_miss")
+    CACHE_SIMILARITY.observe(best_similarity, result="hit" if cache_hit else "miss")
+
+    if cache_hit is None:
+        logger.info("Cache miss", extra={
+            "best_similarity": round(best_similarity, 4), "threshold": get_similarity_threshold()
+        })
+        return False
+
+    _use_cache_hit(state, cache_hit, best_similarity)
+    return True
+
+
+def lookup_lexical(db: Session, state: GenerationState) -> bool:
+    """
+    Character n-gram lookup used while the embedding model is unavailable.
+
+    Matches at the stricter lexical_fallback_threshold, with the same keyword
+    validation as semantic hits, so an embedding outage does not send every
+    request to the LLM.
+
+    Returns:
+        True on a cache hit (state is filled in)
+    """
+    sem_cache = state.sem_cache
+    request = state.request
+    threshold = get_cache_config("lexical_fallback_threshold") or 0.9
+
+    with stage("lexical_sync"):
+        lexical_index = get_lexical_index().sync(
+            db, state.schema_hash, request.database_type, table_fingerprints(state)
+        )
+    with stage("lexical_scan"):
+        match_result, best_similarity = sem_cache.find_similar_lexical(request.question, lexical_index, threshold)
+
+    cache_hit = None
+    if match_result:
+        with stage("cache_fetch"):
+            cache_hit = db.query(SemanticQueryCache).filter(
+                SemanticQueryCache.id == match_result["id"]
+            ).first()
+        if cache_hit is None:
+            # Row was deleted since the index was synced
+            lexical_index.remove([match_result["id"]])
+
+    sem_cache.statistics.record("lexical_hit" if cache_hit else "lexical_miss")
+    if cache_hit is None:
+        logger.info("Lexical fallback miss", extra={
+            "best_similarity": round(best_similarity, 4), "threshold": threshold
+        })
+        return False
+
+    _use_cache_hit(state, cache_hit, best_similarity)
+    return True
+
+
+def logical_schema_hash(state: GenerationState) -> str:
+    """Schema hash without the dialect: the same tables share it in every dialect."""
+    if state.logical_schema_hash is None:
+        state.logical_schema_hash = state.sem_cache.generate_schema_hash(
+            state.tables, state.relationships, None
+        )
+    return state.logical_schema_hash
+
+
+def _cross_dialect_enabled() -> bool:
+    return is_cache_enabled() and bool(get_cache_config("cross_dialect_reuse_enabled"))
+
+
+def _use_transpiled(db: Session, state: GenerationState, source: SemanticQueryCache, similarity: float) -> bool:
+    """
+    Transpile another dialect's cache entry, validate it and store it as a native entry.
+
+    Returns:
+        True if the transpiled SQL is valid (state is filled in)
+    """
+    request = state.request
+    sql = transpile_sql(source.sql_generated, source.database_type, request.database_type)
+    if sql is None:
+        return False
+
+    if state.question_embedding is None:
+        # Exact match: same normalized question, so the source embedding applies
+        if source.embedding_vector is not None:
+            state.question_embedding = decode_embedding(
+                source.embedding_vector, source.embedding_dtype or DEFAULT_EMBEDDING_DTYPE
+            )
+        else:
+            state.question_embedding = source.question_embedding
+
+    sql, is_valid, message = store_generated(db, state, sql)
+    if not is_valid:
+        logger.debug("Transpiled SQL is not valid", extra={
+            "from_dialect": source.database_type, "to_dialect": request.database_type, "error": message
+        })
+        return False
+
+    state.sem_cache.statistics.record("cross_dialect_hit")
+    get_hit_stats().record(source.id)
+    logger.info("Cache hit (cross-dialect)", extra={
+        "entry_id": source.id, "similarity": round(similarity, 4),
+        "from_dialect": source.database_type, "to_dialect": request.database_type
+    })
+
+    state.sql, state.is_valid, state.message = sql, is_valid, message
+    state.from_cache = True
+    state.cache_similarity = similarity
+    state.original_question = source.question
+    return True
+
+
+@timed("cross_dialect_lookup")
+def lookup_cross_dialect_exact(db: Session, state: GenerationState) -> bool:
+    """
+    Exact-match lookup in the other dialects' entries for the same tables.
+
+    Returns:
+        True on a cache hit (state is filled in)
+    """
+    if not _cross_dialect_enabled():
+        return False
+
+    request = state.request
+    source = db.query(SemanticQueryCache).filter(
+        SemanticQueryCache.logical_schema_hash == logical_schema_hash(state),
+        SemanticQueryCache.question_fingerprint == state.sem_cache.generate_question_fingerprint(request.question),
+        SemanticQueryCache.database_type != request.database_type
+    ).order_by(SemanticQueryCache.id).first()
+
+    return source is not None and _use_transpiled(db, state, source, 1.0)
+
+
+@timed("cross_dialect_lookup")
+def lookup_cross_dialect_semantic(db: Session, state: GenerationState) -> bool:
+    """
+    Semantic lookup in the other dialects' similarity indexes for the same tables.
+
+    Returns:
+        True on a cache hit (state is filled in)
+    """
+    if not _cross_dialect_enabled() or state.question_embedding is None:
+        return False
+
+    sem_cache = state.sem_cache
+    request = state.request
+    siblings = db.query(
+        SemanticQueryCache.schema_hash,
+        SemanticQueryCache.database_type
+    ).filter(
+        SemanticQueryCache.logical_schema_hash == logical_schema_hash(state),
+        SemanticQueryCache.database_type != request.database_type
+    ).distinct().all()
+
+    best_id, best_similarity = None, 0.0
+    for schema_hash, database_type in siblings:
+        schema_index = get_similarity_index().sync(db, schema_hash, database_type, table_fingerprints(state))
+        match_result, similarity = sem_cache.find_similar_in_index(
+            request.question,
+            state.question_embedding,
+            schema_index,
+            load_questions=_question_loader(db)
+        )
+        if match_result and similarity > best_similarity:
+            best_id, best_similarity = match_result["id"], similarity
+
+    if best_id is not None:
+        source = db.query(SemanticQueryCache).filter(SemanticQueryCache.id == best_id).first()
+        if source is not None and _use_transpiled(db, state, source, best_similarity):
+            return True
+
+    sem_cache.statistics.record("cross_dialect_miss")
+    return False
+
+
+@timed("template_lookup")
+def lookup_template(db: Session, state: GenerationState) -> bool:
+    """
+    Template lookup: reuse a similar cached query with this question's literal values.
+
+    Runs after a semantic miss. The nearest cached entries that have a
+    template are matched against the question; the first whose pattern fits
+    is filled in, validated and stored as a new entry.
+
+    Returns:
+        True on a template hit (state is filled in)
+    """
+    if not is_cache_enabled() or not get_cache_config("template_cache_enabled"):
+        return False
+    if state.schema_index is None or state.question_embedding is None:
+        return False
+
+    sem_cache = state.sem_cache
+    request = state.request
+    candidates = state.schema_index.nearest(
+        state.question_embedding,
+        min_score=get_cache_config("template_min_similarity") or 0.8,
+        top_k=get_cache_config("index_top_k") or 8
+    )
+    if not candidates:
+        return False
+
+    rows = {row.id: row for row in db.query(
+        SemanticQueryCache.id,
+        SemanticQueryCache.question,
+        SemanticQueryCache.sql_template,
+        SemanticQueryCache.question_pattern,
+        SemanticQueryCache.template_slots
+    ).filter(
+        SemanticQueryCache.id.in_([entry_id for entry_id, _ in candidates]),
+        SemanticQueryCache.sql_template.isnot(None)
+    ).all()}
+
+    for entry_id, similarity in candidates:
+        row = rows.get(entry_id)
+        if row is None:
+            continue
+        sql = fill_template(
+            row.sql_template, row.question_pattern, row.template_slots,
+            request.question, request.database_type
+        )
+        if sql is None:
+            continue
+
+        sql, is_valid, message = store_generated(db, state, sql)
+        if not is_valid:
+            continue
+        sem_cache.statistics.record("template_hit")
+        get_hit_stats().record(entry_id)
+        logger.info("Cache hit (template)", extra={"entry_id": entry_id, "similarity": round(similarity, 4)})
+        state.sql, state.is_valid, state.message = sql, is_valid, message
+        state.from_cache = True
+        state.cache_similarity = similarity
+        state.original_question = row.question
+        return True
+
+    sem_cache.statistics.record("template_miss")
+    return False
+
+
+@timed("schema_pruning")
+def prompt_schema(state: GenerationState) -> str:
+    """
+    Schema text for the LLM prompt, pruned to the tables relevant to the question.
+    """
+    if not get_cache_config("schema_pruning_enabled"):
+        return state.formatted_schema
+
+    result = get_schema_pruner().prune(
+        state.request.question,
+        state.tables,
+        state.relationships,
+        schema_hash=state.schema_hash,
+        question_embedding=state.question_embedding,
+        formatted_schema=state.formatted_schema
+    )
+    if result.dropped:
+        state.sem_cache.statistics.record("schema_pruned")
+        logger.debug("Schema pruned", extra={
+            "tables": len(result.tables), "original_tokens": result.original_tokens,
+            "pruned_tokens": result.pruned_tokens
+        })
+    return result.formatted_schema
+
+
+def store_generated(db: Session, state: GenerationState, sql: str) -> Tuple[str, bool, str]:
+    """
+    Validate generated SQL and store it in the semantic cache if valid.
+
+    Returns:
+        Tuple of (sql, is_valid, message)
+    """
+    request = state.request
+    sem_cache = state.sem_cache
+
+    # Validate the generated SQL (the verdict is stored with the entry)
+    with stage("sql_validation"):
+        is_valid, message = validate_sql(sql, dialect=request.database_type)
+
+    # Store in semantic cache if result is valid
+    if is_cache_enabled() and is_valid and state.question_embedding is not None and state.schema_hash is not None:
+        embedding_dtype = get_cache_config("embedding_storage_dtype") or DEFAULT_EMBEDDING_DTYPE
+        # A zero vector means the embedding model was unavailable: store the
+        # row without an embedding (exact-match and lexical lookups still find
+        # it) so the evictor's backfill can embed it once the model is back
+        embedded = any(state.question_embedding)
+        with stage("sql_analysis"):
+            table_refs = referenced_table_fingerprints(sql, state.tables, request.database_type)
+            template = None
+            if get_cache_config("template_cache_enabled"):
+                template = build_template(sql, request.question, request.database_type)
+        new_cache_entry = SemanticQueryCache(
+            question=request.question,
+            question_fingerprint=sem_cache.generate_question_fingerprint(request.question),
+            embedding_vector=encode_embedding(state.question_embedding, embedding_dtype) if embedded else None,
+            embedding_dtype=embedding_dtype if embedded else None,
+            schema_hash=state.schema_hash,
+            logical_schema_hash=logical_schema_hash(state),
+            sql_generated=sql,
+            sql_valid=is_valid,
+            sql_validation_message=message,
+            table_ref_count=len(table_refs) if table_refs else None,
+            sql_template=template.sql if template else None,
+            question_pattern=template.pattern if template else None,
+            template_slots=template.slots if template else None,
+            database_type=request.database_type,
+            user_id=state.current_user.id if state.current_user else None
+        )
+        # Idempotent insert: the unique (schema, dialect, fingerprint)
+        # constraint rejects rows another worker stored first
+        try:
+            with stage("cache_store"), db.begin_nested():
+                db.add(new_cache_entry)
+                if table_refs:
+                    db.flush()
+                    db.add_all(
+                        CacheTableRef(entry_id=new_cache_entry.id, table_fingerprint=fp)
+                        for fp in table_refs
+                    )
+            with stage("cache_store"):
+                db.commit()
+        except IntegrityError:
+            db.rollback()
+            logger.debug("Question already cached by another worker, skipping insert")
+        else:
+            get_similarity_index().add_entry(
+                state.schema_hash,
+                request.database_type,
+                new_cache_entry.id,
+                new_cache_entry.question,
+                decode_embedding(new_cache_entry.embedding_vector, embedding_dtype) if embedded else None
+            )
+            get_lexical_index().add_entry(
+                state.schema_hash, request.database_type, new_cache_entry.id, new_cache_entry.question
+            )
+            logger.debug("New query stored in semantic cache", extra={"entry_id": new_cache_entry.id})
+
+    return sql, is_valid, message
+
+
+def _store_in_own_session(state: GenerationState, sql: str) -> Tuple[str, bool, str]:
+    db = SessionLocal()
+    try:
+        return store_generated(db, state, sql)
+    finally:
+        db.close()
+
+
+def flight_key(state: GenerationState) -> tuple:
+    """Single-flight key: concurrent identical questions share one LLM call."""
+    return (
+        state.schema_hash,
+        state.request.database_type,
+        state.sem_cache.normalize_question(state.request.question)
+    )
+
+
+def _apply_generation(state: GenerationState, result: Tuple[str, bool, str], shared: bool) -> None:
+    state.sql, state.is_valid, state.message = result
+    if shared:
+        state.sem_cache.statistics.record("llm_coalesced")
+        logger.debug("Reused result of identical in-flight generation")
+
+
+@timed("history")
+def log_history(db: Session, state: GenerationState) -> None:
+    """Log to history if user is logged in (regardless of cache status)."""
+    if not state.current_user:
+        return
+    request = state.request
+    history_entry = QueryHistory(
+        user_id=state.current_user.id,
+        question=request.question,
+        sql_generated=state.sql,
+        database_type=request.database_type,
+        project_id=request.project_id,
+        schema_hash=state.schema_hash
+    )
+    db.add(history_entry)
+    db.commit()
+
+
+def run_sync(request: StructuredSchemaRequest, db: Session, current_user: Optional[User]) -> SQLResponse:
+    """
+    Run the whole pipeline in the calling thread.
+    """
+    state = GenerationState(request, current_user)
+    prepare(db, state)
+
+    if not (lookup_exact(db, state) or lookup_cross_dialect_exact(db, state)):
+        if is_cache_enabled():
+            with stage("embedding"):
+                state.question_embedding = state.sem_cache.generate_embedding(request.question)
+        if not (lookup_semantic(db, state)
+                or lookup_cross_dialect_semantic(db, state)
+                or lookup_template(db, state)):
+            def generate_and_store():
+                schema_text = prompt_schema(state)
+                with stage("llm"):
+                    sql = model_service.generate_sql(
+                        schema_text, request.question, database_type=request.database_type
+                    )
+                return store_generated(db, state, sql)
+
+            result, shared = get_generation_flight().do(flight_key(state), generate_and_store)
+            _apply_generation(state, result, shared)
+
+    log_history(db, state)
+    return state.response()
+
+
+async def run_async(request: StructuredSchemaRequest, db: Session, current_user: Optional[User]) -> SQLResponse:
+    """
+    Run the pipeline without holding a thread across slow stages.
+
+    DB and CPU-bound stages are offloaded to the threadpool; the embedding
+    and the LLM call are awaited.
+    """
+    state = GenerationState(request, current_user)
+
+    def prepare_and_lookup_exact() -> bool:
+        prepare(db, state)
+        return lookup_exact(db, state) or lookup_cross_dialect_exact(db, state)
+
+    if not await run_in_threadpool(prepare_and_lookup_exact):
+        if is_cache_enabled():
+            with stage("embedding"):
+                state.question_embedding = await state.sem_cache.agenerate_embedding(request.question)
+
+        def lookup_similar() -> bool:
+            return (lookup_semantic(db, state)
+                    or lookup_cross_dialect_semantic(db, state)
+                    or lookup_template(db, state))
+
+        if not await run_in_threadpool(lookup_similar):
+            async def generate_and_store():
+                schema_text = await run_in_threadpool(prompt_schema, state)
+                with stage("llm"):
+                    sql = await model_service.agenerate_sql(
+                        schema_text, request.question, database_type=request.database_type
+                    )
+                # This task outlives a cancelled leader, whose request session get_db
+                # then closes: store through a session the task owns
+                return await run_in_threadpool(_store_in_own_session, state, sql)
+
+            result, shared = await get_async_generation_flight().do(flight_key(state), generate_and_store)
+            _apply_generation(state, result, shared)
+
+    await run_in_threadpool(log_history, db, state)
+    return state.response()
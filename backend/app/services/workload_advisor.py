@@ -0,0 +1,275 @@
+"""
+Workload Index Advisor
+
+Recommends a small index set for a whole workload: the QueryHistory of a
+project or schema, instead of one SQL string at a time.
+
+Each history row's sql_generated is analyzed once with the rule-based
+index analysis (index_rules). Per-query candidates are aggregated by
+frequency, candidates that are a leading prefix of a longer one are folded
+into it (the longer index serves both), and the most frequently useful
+indexes are recommended together with the queries they cover.
+
+Analysis is incremental: per workload, the highest history id seen is kept
+so a rerun only parses rows added since. Deleted history triggers a rebuild.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.schemas.payload import TableDef, RelationshipDef
+from app.models.history import QueryHistory
+from app.services.index_rules import extract_usage, build_candidates, index_ddl
+
+# History rows fetched per round trip while streaming a workload
+_STREAM_BATCH_SIZE = 500
+
+# Covered history ids reported per recommendation
+_MAX_REPORTED_QUERIES = 50
+
+
+class _Aggregate:
+    """One candidate index and the history rows that produced it."""
+
+    __slots__ = ("table", "columns", "reasons", "history_ids")
+
+    def __init__(self, table: str, columns: Tuple[str, ...]):
+        self.table = table
+        self.columns = columns
+        self.reasons: List[str] = []
+        self.history_ids: List[int] = []
+
+
+class WorkloadState:
+    """Incremental analysis state for one workload."""
+
+    def __init__(self, tables: List[TableDef], database_type: str):
+        self.tables = tables
+        self.database_type = database_type
+        self.last_id = 0
+        self.analyzed = 0
+        self.unparsed = 0
+        self.candidates: Dict[Tuple[str, Tuple[str, ...]], _Aggregate] = {}
+        self.lock = threading.Lock()
+
+    def add(self, history_id: int, candidates) -> None:
+        """Fold one history row's candidates (False if its SQL did not parse) into the aggregates."""
+        self.analyzed += 1
+        if candidates is False:
+            self.unparsed += 1
+            return
+        for cand in candidates:
+            agg = self.candidates.get(cand.key)
+            if agg is None:
+                agg = self.candidates[cand.key] = _Aggregate(cand.table, cand.columns)
+            agg.history_ids.append(history_id)
+            for reason in cand.reasons:
+                if reason not in agg.reasons:
+                    agg.reasons.append(reason)
+
+
+class WorkloadIndexAdvisor:
+    """
+    Aggregates rule-based index candidates over QueryHistory.
+    """
+
+    def __init__(self, max_workloads: int = 64, max_parsed: int = 5000):
+        """
+        Initialize the advisor.
+
+        Args:
+            max_workloads: Workload states kept in memory (LRU)
+            max_parsed: Parsed (dialect, sql) results kept for reuse across rows (LRU)
+        """
+        self.max_workloads = max(1, max_workloads)
+        self.max_parsed = max(1, max_parsed)
+        self._lock = threading.Lock()
+        self._workloads: "OrderedDict[tuple, WorkloadState]" = OrderedDict()
+        self._parsed_lock = threading.Lock()
+        self._parsed: "OrderedDict[tuple, Any]" = OrderedDict()
+
+    @staticmethod
+    def schema_fingerprint(tables: List[TableDef], relationships: List[RelationshipDef], database_type: str) -> str:
+        """Identity of the schema the workload is analyzed against (a change forces a rebuild)."""
+        payload = json.dumps({
+            "tables": [t.model_dump() for t in tables],
+            "relationships": [r.model_dump() for r in relationships],
+            "dialect": database_type,
+        }, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _candidates(self, schema_key: str, tables: List[TableDef], sql: str, database_type: str):
+        """Index candidates for one SQL string, parsed once per (schema, dialect, sql)."""
+        cache_key = (schema_key, database_type, sql)
+        with self._parsed_lock:
+            if cache_key in self._parsed:
+                self._parsed.move_to_end(cache_key)
+                return self._parsed[cache_key]
+        try:
+            usages = extract_usage(sql, tables, database_type)
+            candidates = build_candidates(usages, tables, database_type)
+        except Exception:
+            candidates = False  # Remember unparseable SQL too
+        with self._parsed_lock:
+            self._parsed[cache_key] = candidates
+            while len(self._parsed) > self.max_parsed:
+                self._parsed.popitem(last=False)
+        return candidates
+
+    def _state(self, key: tuple, tables: List[TableDef], database_type: str) -> WorkloadState:
+        with self._lock:
+            state = self._workloads.get(key)
+            if state is None:
+                state = self._workloads[key] = WorkloadState(tables, database_type)
+            self._workloads.move_to_end(key)
+            while len(self._workloads) > self.max_workloads:
+                self._workloads.popitem(last=False)
+            return state
+
+    def _history_query(self, db: Session, user_id: int, project_id: Optional[int], schema_hash: Optional[str]):
+        query = db.query(QueryHistory).filter(
+            QueryHistory.user_id == user_id,
+            QueryHistory.sql_generated.isnot(None)
+        )
+        if project_id is not None:
+            query = query.filter(QueryHistory.project_id == project_id)
+        if schema_hash is not None:
+            query = query.filter(QueryHistory.schema_hash == schema_hash)
+        return query
+
+    def sync(
+        self,
+        db: Session,
+        user_id: int,
+        tables: List[TableDef],
+        relationships: List[RelationshipDef],
+        database_type: str,
+        project_id: Optional[int] = None,
+        schema_hash: Optional[str] = None
+    ) -> Tuple[WorkloadState, int]:
+        """
+        Bring a workload's analysis up to date with QueryHistory.
+
+        Returns:
+            Tuple of (state, number of history rows parsed in this call)
+        """
+        schema_key = self.schema_fingerprint(tables, relationships, database_type)
+        key = (user_id, project_id, schema_hash, schema_key)
+        state = self._state(key, tables, database_type)
+        base = self._history_query(db, user_id, project_id, schema_hash)
+
+        row_count, max_id = base.with_entities(
+            func.count(QueryHistory.id), func.max(QueryHistory.id)
+        ).one()
+        max_id = max_id or 0
+
+        for attempt in range(2):
+            with state.lock:
+                parsed = 0
+                if max_id > state.last_id:
+                    # Stream only the new rows, just the columns analysis needs
+                    rows = base.filter(
+                        QueryHistory.id > state.last_id,
+                        QueryHistory.id <= max_id
+                    ).with_entities(
+                        QueryHistory.id, QueryHistory.sql_generated, QueryHistory.database_type
+                    ).order_by(QueryHistory.id).yield_per(_STREAM_BATCH_SIZE)
+                    for history_id, sql, row_dialect in rows:
+                        state.add(history_id, self._candidates(schema_key, tables, sql, row_dialect or database_type))
+                        parsed += 1
+                    state.last_id = max_id
+                if state.analyzed == row_count:
+                    return state, parsed
+            # Rows were deleted since the last sync: rebuild from scratch
+            state = self._reset(key, tables, database_type)
+        return state, parsed
+
+    def _reset(self, key: tuple, tables: List[TableDef], database_type: str) -> WorkloadState:
+        with self._lock:
+            self._workloads.pop(key, None)
+        return self._state(key, tables, database_type)
+
+    def recommend(self, state: WorkloadState, limit: int = 10, min_queries: int = 1) -> Dict[str, Any]:
+        """
+        Pick the deduplicated index set covering the most queries.
+
+        Args:
+            state: Synced workload state
+            limit: Maximum indexes to recommend
+            min_queries: Minimum covered queries for an index to be recommended
+
+        Returns:
+            Dict with recommendations and coverage totals
+        """
+        with state.lock:
+            aggregates = list(state.candidates.values())
+            analyzed = state.analyzed
+            unparsed = state.unparsed
+
+        # Fold each candidate into the longest candidate it is a leading prefix of
+        aggregates.sort(key=lambda a: (-len(a.columns), a.table, a.columns))
+        merged: List[Tuple[_Aggregate, set, List[str]]] = []
+        for agg in aggregates:
+            table = agg.table.lower()
+            cols = tuple(c.lower() for c in agg.columns)
+            # Among longer indexes starting with these columns, the busiest one absorbs it
+            target = max(
+                (m for m in merged
+                 if m[0].table.lower() == table and tuple(c.lower() for c in m[0].columns[:len(cols)]) == cols),
+                key=lambda m: len(m[1]),
+                default=None
+            )
+            if target is None:
+                merged.append((agg, set(agg.history_ids), list(agg.reasons)))
+            else:
+                target[1].update(agg.history_ids)
+                for reason in agg.reasons:
+                    if reason not in target[2]:
+                        target[2].append(reason)
+
+        ranked = sorted(
+            (m for m in merged if len(m[1]) >= min_queries),
+            key=lambda m: (-len(m[1]), len(m[0].columns), m[0].table, m[0].columns)
+        )[:limit]
+
+        recommendations = []
+        covered = set()
+        parsed_total = max(analyzed - unparsed, 0)
+        for agg, history_ids, reasons in ranked:
+            covered.update(history_ids)
+            ids = sorted(history_ids)
+            recommendations.append({
+                "table": agg.table,
+                "columns": list(agg.columns),
+                "index_type": "COMPOSITE" if len(agg.columns) > 1 else "B-TREE",
+                "sql": index_ddl(agg.table, agg.columns, state.database_type),
+                "rationale": "; ".join(reasons),
+                "query_count": len(ids),
+                "coverage": round(len(ids) / parsed_total, 4) if parsed_total else 0.0,
+                "history_ids": ids[:_MAX_REPORTED_QUERIES],
+            })
+
+        return {
+            "recommendations": recommendations,
+            "analyzed_queries": analyzed,
+            "unparsed_queries": unparsed,
+            "covered_queries": len(covered),
+        }
+
+
+# Global advisor instance (singleton)
+_workload_advisor_instance = None
+
+
+def get_workload_advisor() -> WorkloadIndexAdvisor:
+    """Get or create global workload index advisor."""
+    global _workload_advisor_instance
+    if _workload_advisor_instance is None:
+        _workload_advisor_instance = WorkloadIndexAdvisor()
+    return _workload_advisor_instance
@@ -0,0 +1,162 @@
+"""
+Benchmark embedding backends: latency, throughput and memory per worker.
+
+Each backend runs in a fresh subprocess (one worker's view) and reports:
+- load time (import + model load)
+- single-question encode latency p50/p95 (the cache lookup path)
+- batch throughput in questions/s (the batcher and backfill path)
+- resident memory after load and peak RSS of the process
+
+Usage:
+    python benchmark_embedding_backend.py                          # sentence_transformers vs onnx (int8)
+    python benchmark_embedding_backend.py --backends onnx onnx-fp32
+    python benchmark_embedding_backend.py --threads 1 --json results.json
+    python benchmark_embedding_backend.py --model path/to/st-model --onnx-dir path/to/onnx-export
+
+Backends: "sentence_transformers" (PyTorch), "onnx" (the int8 model in
+embedding_onnx_dir), "onnx-fp32" (model.onnx in the same directory).
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+QUESTIONS = [
+    "Show all students in class tenth",
+    "Count the number of orders per customer",
+    "What is the average salary of each department?",
+    "List the top 5 products by revenue",
+    "Which employees joined after 2020?",
+    "Find customers who never placed an order",
+    "Total sales for every month this year",
+    "Show all users",
+]
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc; falls back to the peak elsewhere)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load(backend: str, threads: int, model_name: str, onnx_dir: str):
+    if backend == "sentence_transformers":
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+    from app.core.embedding_backend import OnnxEmbeddingBackend
+    return OnnxEmbeddingBackend(
+        onnx_dir,
+        model_file="model.onnx" if backend == "onnx-fp32" else None,
+        intra_op_threads=threads
+    )
+
+
+def run_child(backend: str, queries: int, batch_size: int, batches: int, threads: int,
+              model_name: str, onnx_dir: str) -> dict:
+    """Benchmark one backend in this process."""
+    baseline_mb = rss_mb()
+    start = time.perf_counter()
+    model = load(backend, threads, model_name, onnx_dir)
+    model.encode(QUESTIONS[0], convert_to_numpy=True)  # First inference allocates buffers
+    load_s = time.perf_counter() - start
+    loaded_mb = rss_mb()
+
+    latencies = []
+    for i in range(queries):
+        # Vary the text so no layer can serve a repeat from a cache
+        text = f"{QUESTIONS[i % len(QUESTIONS)]} {i}"
+        t = time.perf_counter()
+        model.encode(text, convert_to_numpy=True)
+        latencies.append((time.perf_counter() - t) * 1000)
+    latencies.sort()
+
+    batch = [f"{QUESTIONS[i % len(QUESTIONS)]} {i}" for i in range(batch_size)]
+    t = time.perf_counter()
+    for _ in range(batches):
+        model.encode(batch, batch_size=batch_size, convert_to_numpy=True)
+    throughput = batch_size * batches / (time.perf_counter() - t)
+
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 3),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+        "batch_size": batch_size,
+        "throughput_qps": round(throughput, 1),
+        "rss_baseline_mb": round(baseline_mb, 1),
+        "rss_loaded_mb": round(loaded_mb, 1),
+        "rss_peak_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    from app.core.cache_config import get_cache_config
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--backends", nargs="+", default=["sentence_transformers", "onnx"],
+                        choices=["sentence_transformers", "onnx", "onnx-fp32"])
+    parser.add_argument("--model", default=get_cache_config("model_name") or "sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-dir", default=get_cache_config("embedding_onnx_dir") or "models/all-MiniLM-L6-v2-onnx")
+    parser.add_argument("--queries", type=int, default=200, help="Single-question encodes")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=0, help="Inference threads per worker (0 = library default)")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.queries, args.batch_size, args.batches, args.threads,
+                                   args.model, args.onnx_dir)))
+        return
+
+    results = []
+    print(f"{'backend':>22} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'batch q/s':>10} {'RSS MB':>7} {'peak MB':>8}")
+    for backend in args.backends:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", backend,
+             "--queries", str(args.queries), "--batch-size", str(args.batch_size),
+             "--batches", str(args.batches), "--threads", str(args.threads),
+             "--model", args.model, "--onnx-dir", args.onnx_dir],
+            capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1:] or ["unknown error"]
+            print(f"{backend:>22} failed: {error[0]}")
+            results.append({"backend": backend, "error": error[0]})
+            continue
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{backend:>22} {result['load_s']:>7.2f} {result['p50_ms']:>7.2f} {result['p95_ms']:>7.2f} "
+              f"{result['throughput_qps']:>10.1f} {result['rss_loaded_mb']:>7.1f} {result['rss_peak_mb']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"threads": args.threads, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: per-request model.encode() vs the micro-batching EmbeddingBatcher.
+
+Runs the same question workload with 1, 8 and 32 concurrent client threads
+and reports throughput plus batcher metrics.
+
+Usage:
+    python benchmark_embedding_batcher.py                 # real SentenceTransformer
+    python benchmark_embedding_batcher.py --stub          # offline, simulated encoder
+    python benchmark_embedding_batcher.py --requests 200 --json results.json
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.core.embedding_batcher import EmbeddingBatcher
+
+QUESTIONS = [
+    "Show all students in class tenth",
+    "Count the number of orders per customer",
+    "What is the average salary of each department?",
+    "List the top 5 products by revenue",
+    "Which employees joined after 2020?",
+    "Find customers who never placed an order",
+    "Total sales for every month this year",
+    "Show all users",
+]
+
+
+class StubEncoder:
+    """
+    Simulated model: fixed per-call overhead plus per-text cost, serialized
+    like a single model instance shared by all threads.
+    """
+
+    def __init__(self, call_overhead_ms: float = 8.0, per_text_ms: float = 0.5, dim: int = 384):
+        self.call_overhead = call_overhead_ms / 1000.0
+        self.per_text = per_text_ms / 1000.0
+        self.dim = dim
+        self._lock = threading.Lock()
+
+    def encode(self, texts, batch_size=None, convert_to_numpy=True):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        with self._lock:
+            time.sleep(self.call_overhead + self.per_text * len(batch))
+        vectors = np.random.default_rng(len(batch)).random((len(batch), self.dim), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def load_model(stub: bool):
+    if stub:
+        return StubEncoder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+
+
+def run_workload(encode_one, clients: int, total_requests: int) -> float:
+    """Return wall-clock seconds to serve total_requests with `clients` threads."""
+    def client(i):
+        encode_one(QUESTIONS[i % len(QUESTIONS)])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(total_requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding micro-batching benchmark")
+    parser.add_argument("--stub", action="store_true", help="Use a simulated encoder (no model download)")
+    parser.add_argument("--requests", type=int, default=256, help="Requests per scenario")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--wait-ms", type=float, default=2.0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    model = load_model(args.stub)
+    model.encode(QUESTIONS[0])  # Warm up
+
+    results = []
+    print(f"{'clients':>8} {'mode':>8} {'req/s':>10} {'speedup':>8} {'avg batch':>10} {'max queue':>10}")
+    for clients in args.clients:
+        direct = run_workload(
+            lambda text: model.encode(text, convert_to_numpy=True), clients, args.requests
+        )
+
+        batcher = EmbeddingBatcher(
+            lambda texts: model.encode(texts, batch_size=len(texts), convert_to_numpy=True),
+            max_batch_size=args.max_batch_size,
+            max_wait_ms=args.wait_ms
+        )
+        batched = run_workload(batcher.encode, clients, args.requests)
+        metrics = batcher.snapshot()
+
+        direct_rps = args.requests / direct
+        batched_rps = args.requests / batched
+        print(f"{clients:>8} {'direct':>8} {direct_rps:>10.1f} {'':>8} {'':>10} {'':>10}")
+        print(f"{clients:>8} {'batched':>8} {batched_rps:>10.1f} {batched_rps / direct_rps:>7.2f}x "
+              f"{metrics['avg_batch_size']:>10} {metrics['max_queue_depth']:>10}")
+
+        results.append({
+            "clients": clients,
+            "requests": args.requests,
+            "direct_rps": round(direct_rps, 2),
+            "batched_rps": round(batched_rps, 2),
+            "speedup": round(batched_rps / direct_rps, 3),
+            "batcher": metrics,
+        })
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"stub": args.stub, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
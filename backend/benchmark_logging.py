@@ -0,0 +1,184 @@
+"""
+Benchmark: per-request logging overhead with large schemas.
+
+Replays the logging done on the /generate path for one request:
+hashing the schema (dialect and logical hash), building the prompt and
+one LLM attempt (the LLM call itself is not made), plus the token checks
+in get_current_user.
+
+    print     the previous behaviour: schema JSON, prompt and token details
+              written to stdout with print() on the request thread
+    logging   the structured logging defaults: INFO through the queue handler,
+              payloads never serialized
+    sampled   DEBUG with LOG_PAYLOAD_SAMPLE_RATE=0.01
+
+Output goes to a pipe drained by a separate process, as stdout is under a
+process manager or container runtime.
+
+Usage:
+    python benchmark_logging.py
+    python benchmark_logging.py --tables 200 500 --columns 20 --clients 1 8 --json results.json
+"""
+
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.schemas.payload import TableDef, ColumnDef, RelationshipDef
+from app.core.schema_validator import format_schema_for_model
+from app.core.semantic_cache import SemanticCache
+from app.core.logging_config import setup_logging, shutdown_logging, get_logging_state, log_payload
+from app.services.prompt_builder import build_prompt
+
+QUESTION = "Show the total order amount per customer for orders placed after 2020"
+TOKEN = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJzdWIiOiI0MiIsImV4cCI6MTcwMDAwMDAwMH0.signature"
+TOKEN_PAYLOAD = {"sub": "42", "exp": 1700000000}
+
+logger = logging.getLogger("app.benchmark")
+
+
+def make_schema(table_count: int, column_count: int):
+    """Synthetic schema: table_count tables with column_count columns, chained by foreign keys."""
+    types = ["INT", "VARCHAR(255)", "DECIMAL(10,2)", "DATE", "BOOLEAN", "TEXT"]
+    tables = []
+    relationships = []
+    for t in range(table_count):
+        columns = [ColumnDef(name="id", type="INT", primaryKey=True)]
+        columns += [
+            ColumnDef(name=f"column_{c}_of_table_{t}", type=types[c % len(types)])
+            for c in range(1, column_count)
+        ]
+        tables.append(TableDef(name=f"table_{t}", columns=columns))
+        if t:
+            relationships.append(RelationshipDef(
+                from_table=f"table_{t}", from_column="column_1_of_table_0",
+                to_table=f"table_{t - 1}", to_column="id"
+            ))
+    return tables, relationships
+
+
+def schema_json(tables, relationships, dialect) -> str:
+    """The JSON generate_schema_hash used to print (same structure it hashes)."""
+    schema_dict = {
+        "tables": sorted([{
+            "name": t.name,
+            "columns": sorted([{"name": c.name, "type": c.type} for c in t.columns], key=lambda x: x["name"])
+        } for t in tables], key=lambda x: x["name"]),
+        "relationships": sorted([{
+            "from": f"{r.from_table}.{r.from_column}",
+            "to": f"{r.to_table}.{r.to_column}"
+        } for r in relationships], key=lambda x: (x["from"], x["to"]))
+    }
+    if dialect is not None:
+        schema_dict["dialect"] = dialect
+    return json.dumps(schema_dict, sort_keys=True, separators=(',', ':'))
+
+
+def request_with_print(cache: SemanticCache, tables, relationships, schema_str: str, sink) -> None:
+    """The request's previous logging: unconditional print() calls."""
+    print(f"DEBUG: verifying token: {TOKEN[:10]}...", file=sink, flush=True)
+    print(f"DEBUG: payload: {TOKEN_PAYLOAD}", file=sink, flush=True)
+    print(f"DEBUG: lookup user_id: 42 (type: {type(42)})", file=sink, flush=True)
+    for dialect in ("MySQL", None):
+        schema_hash = cache.generate_schema_hash(tables, relationships, dialect)
+        print(f"DEBUG: Hashing schema JSON: {schema_json(tables, relationships, dialect)}", file=sink, flush=True)
+    print(f"Cache miss for schema {schema_hash[:12]}", file=sink, flush=True)
+    prompt = build_prompt(schema_str, QUESTION, database_type="MySQL")
+    print("\n--- PROMPT SENT TO AI (Attempt 1) ---", file=sink, flush=True)
+    print(prompt, file=sink, flush=True)
+    print(f"{'-' * 40}\n", file=sink, flush=True)
+
+
+def request_with_logging(cache: SemanticCache, tables, relationships, schema_str: str, sink=None) -> None:
+    """The request's logging as the app now does it (hashing logs through log_payload itself)."""
+    logger.debug("Rejected token", extra={"reason": "decode_error"})
+    for dialect in ("MySQL", None):
+        schema_hash = cache.generate_schema_hash(tables, relationships, dialect)
+    logger.info("Cache miss", extra={"schema_hash": schema_hash[:12], "layers": "exact,semantic"})
+    prompt = build_prompt(schema_str, QUESTION, database_type="MySQL")
+    log_payload(logger, "LLM prompt", lambda: {"attempt": 1, "mode": "sync", "prompt": prompt})
+
+
+def run_scenario(request_fn, args, clients: int, requests: int):
+    """Return sorted per-request latencies in milliseconds."""
+    def one(_):
+        start = time.perf_counter()
+        request_fn(*args)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return sorted(pool.map(one, range(requests)))
+
+
+def percentile(values, p: float) -> float:
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request latency with print() vs structured logging")
+    parser.add_argument("--tables", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--columns", type=int, default=20, help="Columns per table")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    # Drained by another process, like a log collector reading stdout
+    reader = subprocess.Popen(["cat"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, text=True)
+    sink = reader.stdin
+    cache = SemanticCache()
+
+    modes = [
+        ("print", request_with_print, lambda: setup_logging(level="WARNING", stream=sink)),
+        ("logging", request_with_logging, lambda: setup_logging(level="INFO", payload_sample_rate=0.0, stream=sink)),
+        ("sampled", request_with_logging, lambda: setup_logging(level="DEBUG", payload_sample_rate=0.01, stream=sink)),
+    ]
+
+    results = []
+    print(f"{'tables':>7} {'prompt KB':>10} {'clients':>8} {'mode':>8} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'dropped':>8}")
+    for table_count in args.tables:
+        tables, relationships = make_schema(table_count, args.columns)
+        schema_str = format_schema_for_model(tables, relationships)
+        prompt_kb = len(build_prompt(schema_str, QUESTION, database_type="MySQL")) / 1024
+        for clients in args.clients:
+            for mode, request_fn, configure in modes:
+                configure()
+                fn_args = (cache, tables, relationships, schema_str, sink)
+                run_scenario(request_fn, fn_args, clients, 10)  # Warm up
+                latencies = run_scenario(request_fn, fn_args, clients, args.requests)
+                dropped = get_logging_state().snapshot()["dropped_records"]
+                row = {
+                    "tables": table_count,
+                    "columns": args.columns,
+                    "prompt_kb": round(prompt_kb, 1),
+                    "clients": clients,
+                    "mode": mode,
+                    "p50_ms": round(percentile(latencies, 50), 3),
+                    "p95_ms": round(percentile(latencies, 95), 3),
+                    "mean_ms": round(sum(latencies) / len(latencies), 3),
+                    "dropped_records": dropped,
+                }
+                results.append(row)
+                print(f"{table_count:>7} {prompt_kb:>10.1f} {clients:>8} {mode:>8} {row['p50_ms']:>9.3f} "
+                      f"{row['p95_ms']:>9.3f} {row['mean_ms']:>9.3f} {dropped:>8}")
+
+    shutdown_logging()
+    sink.close()
+    reader.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Microbenchmarks for the backend hot paths.
+
+Builds synthetic inputs (N tables x M columns, K cached questions) and
+times the functions every /generate, /schemas and SML request goes
+through. Offline: embeddings are seeded random vectors (the
+SentenceTransformer model is never loaded) and LLM output is synthetic.
+
+Each benchmark runs `--repeat` rounds of `--number` calls. The per-call
+minimum and median are reported in microseconds. The minimum is the
+figure to compare: it is the least affected by other load on the machine.
+
+Usage:
+    python benchmark_suite.py                                  # default sizes
+    python benchmark_suite.py --tables 200 --columns 30 --cached 5000
+    python benchmark_suite.py --json bench/HEAD.json
+    python benchmark_suite.py --json bench/new.json --compare bench/HEAD.json --threshold 1.2
+    python benchmark_suite.py --only schema_hash validate_sql
+
+--compare exits with status 1 if any benchmark's minimum is more than
+--threshold times the baseline's (for the same sizes).
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.schemas.payload import TableDef, ColumnDef, RelationshipDef
+from app.core.semantic_cache import SemanticCache
+from app.core.similarity_index import SchemaIndex
+from app.core.lexical_index import LexicalIndex
+from app.core.schema_validator import validate_schema, format_schema_for_model
+from app.core.sml_parser import parse_sml
+from app.core.sml_generator import generate_sml
+from app.core.security import validate_sql
+from app.services.model_service import ModelService
+
+COLUMN_TYPES = ["INT", "VARCHAR(255)", "DECIMAL(10,2)", "DATE", "BOOLEAN", "TEXT", "TIMESTAMP"]
+SUBJECTS = ["students", "orders", "customers", "employees", "products", "payments", "courses", "invoices"]
+TEMPLATES = [
+    "Show all {s} in class {n}",
+    "Count the number of {s} per department",
+    "What is the average price of {s} created after {n}?",
+    "List the top {n} {s} by revenue",
+    "Find {s} who never placed an order",
+    "Total {s} for every month of {n}",
+    "Which {s} have more than {n} items?",
+    "Show each {s} with its latest payment",
+]
+EMBEDDING_DIM = 384
+
+
+# --- Synthetic generators ---
+
+def letters(i: int) -> str:
+    """0 -> a, 25 -> z, 26 -> ba, ... (table names may only contain letters and underscores)."""
+    name = ""
+    while True:
+        name = chr(ord("a") + i % 26) + name
+        i //= 26
+        if not i:
+            return name
+
+
+def make_schema(table_count: int, column_count: int, seed: int = 0):
+    """
+    table_count tables with column_count columns each; every table after the
+    first has a foreign key to the previous one.
+    """
+    rng = random.Random(seed)
+    tables = []
+    relationships = []
+    names = [f"table_{letters(t)}" for t in range(table_count)]
+    for t, name in enumerate(names):
+        columns = [ColumnDef(name="id", type="INT", primaryKey=True, notNull=True)]
+        if t:
+            columns.append(ColumnDef(
+                name=f"{names[t - 1]}_id", type="INT", isForeignKey=True,
+                fkTable=names[t - 1], fkColumn="id"
+            ))
+            relationships.append(RelationshipDef(
+                from_table=name, from_column=f"{names[t - 1]}_id",
+                to_table=names[t - 1], to_column="id"
+            ))
+        while len(columns) < column_count:
+            columns.append(ColumnDef(
+                name=f"{rng.choice(SUBJECTS)}_{letters(len(columns))}",
+                type=rng.choice(COLUMN_TYPES),
+                notNull=rng.random() < 0.3,
+                unique=rng.random() < 0.05
+            ))
+        tables.append(TableDef(name=name, columns=columns))
+    return tables, relationships
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(s=rng.choice(SUBJECTS), n=rng.randint(2, 2030))
+        for _ in range(count)
+    ]
+
+
+def make_embeddings(count: int, seed: int = 0) -> np.ndarray:
+    """Seeded random unit vectors standing in for model embeddings."""
+    vectors = np.random.default_rng(seed).standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def near(vector: np.ndarray, seed: int = 1, noise: float = 0.01) -> List[float]:
+    """A vector with cosine similarity close to 1 to the given one (a cache hit)."""
+    jitter = np.random.default_rng(seed).standard_normal(vector.shape).astype(np.float32) * noise
+    return (vector + jitter).tolist()
+
+
+def make_join_sql(tables: List[TableDef], joins: int, literal: int = 0) -> str:
+    """SELECT joining `joins` consecutive tables along their foreign keys, with filter and grouping."""
+    joins = max(1, min(joins, len(tables)))
+    sql = f"SELECT t0.id, COUNT(*) AS total FROM {tables[0].name} t0"
+    for i in range(1, joins):
+        sql += f" JOIN {tables[i].name} t{i} ON t{i}.{tables[i - 1].name}_id = t{i - 1}.id"
+    sql += f" WHERE t0.id > {literal} GROUP BY t0.id HAVING COUNT(*) > 1 ORDER BY total DESC LIMIT 10;"
+    return sql
+
+
+def make_llm_output(sql: str) -> str:
+    """LLM-style answer: explanation, fenced SQL and markdown around the query."""
+    return (
+        "Here is the **SQL query** for your question, based on the provided schema:\n\n"
+        f"```sql\n{sql.replace(' JOIN ', chr(10) + 'JOIN ')}\n```\n"
+    )
+
+
+# --- Runner ---
+
+def bench(fn: Callable[[], object], number: int, repeat: int) -> Dict[str, float]:
+    """Per-call min/median/mean in microseconds over `repeat` rounds of `number` calls."""
+    fn()  # Warm up
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "min_us": round(min(rounds), 3),
+        "median_us": round(statistics.median(rounds), 3),
+        "mean_us": round(statistics.fmean(rounds), 3),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def build_benchmarks(args) -> Dict[str, tuple]:
+    """name -> (callable, calls per round)."""
+    tables, relationships = make_schema(args.tables, args.columns)
+    questions = make_questions(args.cached)
+    embeddings = make_embeddings(args.cached)
+
+    cache = SemanticCache()
+    hybrid_cache = SemanticCache(hybrid_prefilter=True)
+    shared_terms_cache = SemanticCache(hybrid_prefilter=True, hybrid_min_shared_terms=1)
+    schema_hash = cache.generate_schema_hash(tables, relationships, "MySQL")
+    cached_queries = [
+        {"id": i, "question": q, "question_embedding": embeddings[i].tolist(), "schema_hash": schema_hash}
+        for i, q in enumerate(questions)
+    ]
+    index = SchemaIndex()
+    index.append(((i, embeddings[i]) for i in range(args.cached)), questions=dict(enumerate(questions)))
+    lexical_index = LexicalIndex()
+    lexical_index.append(enumerate(questions))
+
+    target = args.cached // 2
+    hit_question, hit_embedding = questions[target], near(embeddings[target])
+    miss_embedding = make_embeddings(1, seed=99)[0].tolist()
+    # Shares words with many cached questions, so keyword pruning keeps candidates
+    related_question = "Show all students in class 7"
+
+    formatted = format_schema_for_model(tables, relationships)
+    sml = generate_sml(tables, relationships, "MySQL")
+    sql = make_join_sql(tables, args.joins)
+    llm_output = make_llm_output(sql)
+    model_service = ModelService()
+    literals = iter(range(1, 10 ** 9))
+
+    # Benchmarks must time the success paths, not early error returns
+    checks = {
+        "validate_schema accepts the synthetic schema": validate_schema(tables, relationships)[0],
+        "parse_sml round-trips the schema": len(parse_sml(sml)[0]) == len(tables),
+        "benchmark SQL is valid": validate_sql(sql, "MySQL")[0],
+        "near embedding is a cache hit": cache.find_similar_in_index(hit_question, hit_embedding, index)[0] is not None,
+        "random embedding is a cache miss": cache.find_similar_in_index("Unrelated question", miss_embedding, index)[0] is None,
+        "near embedding is a hybrid hit": hybrid_cache.find_similar_in_index(hit_question, hit_embedding, index)[0] is not None,
+        "random embedding is a hybrid miss": hybrid_cache.find_similar_in_index(related_question, miss_embedding, index)[0] is None,
+        "cached question is a lexical hit": cache.find_similar_lexical(hit_question, lexical_index, 0.9)[0] is not None,
+        "unrelated question is a lexical miss": cache.find_similar_lexical("Unrelated question", lexical_index, 0.9)[0] is None,
+        "clean_sql_output extracts the query": model_service.clean_sql_output(llm_output).startswith("SELECT"),
+    }
+    failed = [name for name, passed in checks.items() if not passed]
+    if failed:
+        raise RuntimeError(f"Benchmark inputs are not representative: {'; '.join(failed)}")
+
+    # Small-call benchmarks run more times per round than whole-schema ones
+    n = args.number
+    return {
+        "find_similar_query_hit": (lambda: cache.find_similar_query(hit_question, hit_embedding, schema_hash, cached_queries), n),
+        "find_similar_query_miss": (lambda: cache.find_similar_query("Unrelated question", miss_embedding, schema_hash, cached_queries), n),
+        "index_search_hit": (lambda: cache.find_similar_in_index(hit_question, hit_embedding, index), n * 10),
+        "index_search_miss": (lambda: cache.find_similar_in_index("Unrelated question", miss_embedding, index), n * 10),
+        "index_hybrid_hit": (lambda: hybrid_cache.find_similar_in_index(hit_question, hit_embedding, index), n * 10),
+        "index_hybrid_miss": (lambda: hybrid_cache.find_similar_in_index(related_question, miss_embedding, index), n * 10),
+        "hybrid_terms_hit": (lambda: shared_terms_cache.find_similar_in_index(hit_question, hit_embedding, index), n * 10),
+        "hybrid_terms_miss": (lambda: shared_terms_cache.find_similar_in_index(related_question, miss_embedding, index), n * 10),
+        "hybrid_terms_unrelated": (lambda: shared_terms_cache.find_similar_in_index("Unrelated question", miss_embedding, index), n * 10),
+        "lexical_search_hit": (lambda: cache.find_similar_lexical(hit_question, lexical_index, 0.9), n),
+        "lexical_search_miss": (lambda: cache.find_similar_lexical("Unrelated question", lexical_index, 0.9), n),
+        "schema_hash": (lambda: cache.generate_schema_hash(tables, relationships, "MySQL"), n),
+        "validate_schema": (lambda: validate_schema(tables, relationships), n),
+        "format_schema_for_model": (lambda: format_schema_for_model(tables, relationships), n),
+        "generate_sml": (lambda: generate_sml(tables, relationships, "MySQL"), max(1, n // 10)),
+        "parse_sml": (lambda: parse_sml(sml), max(1, n // 10)),
+        "clean_sql_output": (lambda: model_service.clean_sql_output(llm_output), n * 10),
+        # A new literal per call defeats the validation memo: the cost of a fresh query
+        "validate_sql_cold": (lambda: validate_sql(make_join_sql(tables, args.joins, next(literals)), "MySQL"), n),
+        "validate_sql_memoized": (lambda: validate_sql(sql, "MySQL"), n * 10),
+        "question_fingerprint": (lambda: cache.generate_question_fingerprint(hit_question), n * 10),
+    }, {"schema_prompt_chars": len(formatted), "sml_chars": len(sml), "sql_chars": len(sql)}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results: Dict[str, dict], baseline_path: str, params: dict, threshold: float) -> bool:
+    """Print min-time ratios against a baseline file; return True if nothing regressed."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if baseline.get("params") != params:
+        print(f"\nWARNING: baseline sizes {baseline.get('params')} differ from {params}")
+
+    ok = True
+    print(f"\nCompared to {baseline_path} ({baseline.get('revision', 'unknown')}):")
+    print(f"{'benchmark':<26} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            print(f"{name:<26} {'-':>12} {result['min_us']:>12.2f} {'new':>7}")
+            continue
+        ratio = result["min_us"] / previous["min_us"] if previous["min_us"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:<26} {previous['min_us']:>12.2f} {result['min_us']:>12.2f} {ratio:>6.2f}x{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend hot-path microbenchmarks (offline)")
+    parser.add_argument("--tables", type=int, default=50, help="Tables in the synthetic schema")
+    parser.add_argument("--columns", type=int, default=15, help="Columns per table")
+    parser.add_argument("--cached", type=int, default=2000, help="Cached questions for similarity search")
+    parser.add_argument("--joins", type=int, default=4, help="Tables joined by the benchmark SQL")
+    parser.add_argument("--number", type=int, default=20, help="Base calls per round")
+    parser.add_argument("--repeat", type=int, default=5, help="Rounds per benchmark")
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file from an earlier run")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Regression ratio for --compare")
+    args = parser.parse_args()
+
+    # Keep the hot paths' debug logging out of the measurements
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    params = {"tables": args.tables, "columns": args.columns, "cached": args.cached, "joins": args.joins}
+    benchmarks, input_sizes = build_benchmarks(args)
+    if args.only:
+        unknown = set(args.only) - set(benchmarks)
+        if unknown:
+            parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+        benchmarks = {name: benchmarks[name] for name in args.only}
+
+    print(f"tables={args.tables} columns={args.columns} cached={args.cached} joins={args.joins}")
+    print(f"{'benchmark':<26} {'min us':>12} {'median us':>12}")
+    results = {}
+    for name, (fn, number) in benchmarks.items():
+        results[name] = bench(fn, number, args.repeat)
+        print(f"{name:<26} {results[name]['min_us']:>12.2f} {results[name]['median_us']:>12.2f}")
+
+    if args.json:
+        directory = os.path.dirname(args.json)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump({
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "params": params,
+                "input_sizes": input_sizes,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nResults written to {args.json}")
+
+    if args.compare and not compare(results, args.compare, params, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Build or verify an offline embedding model bundle (see app/core/model_bundle.py).
+
+Building copies a sentence-transformers model directory, converts pickle
+weights (pytorch_model.bin) to model.safetensors if needed, and writes
+bundle.json with the pinned model id, revision and per-file checksums. The
+source is either a local directory or, on a machine with hub access, a
+download pinned to --revision. Copy the finished directory to the
+air-gapped host and set model_bundle_path in cache_config.
+
+Usage:
+    python build_model_bundle.py --model-id sentence-transformers/all-MiniLM-L6-v2 --revision <commit> --output models/minilm-bundle
+    python build_model_bundle.py --source /path/to/saved/model --model-id sentence-transformers/all-MiniLM-L6-v2 --output models/minilm-bundle
+    python build_model_bundle.py --source /path/to/saved/model --output models/minilm-bundle --onnx-dir models/all-MiniLM-L6-v2-onnx
+    python build_model_bundle.py --verify models/minilm-bundle --json bundle.json
+"""
+
+import sys
+import os
+import json
+import shutil
+import argparse
+from datetime import datetime, timezone
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.core.cache_config import get_cache_config
+from app.core.model_bundle import (
+    BUNDLE_FORMAT_VERSION, MANIFEST_FILE, WEIGHTS_FILE, ModelBundleError, file_sha256, verify_bundle
+)
+
+# Weight formats the bundle does not ship (pickle, other frameworks, hub's own exports)
+SKIPPED = ("pytorch_model.bin", "tf_model.h5", "flax_model.msgpack", "rust_model.ot", "onnx", "openvino", ".git")
+
+
+def fetch_source(model_id: str, revision: str) -> str:
+    """Download the pinned snapshot into the local hub cache and return its path."""
+    from huggingface_hub import snapshot_download
+    return snapshot_download(model_id, revision=revision)
+
+
+def copy_model(source: str, output: str) -> None:
+    for root, dirs, files in os.walk(source):
+        rel = os.path.relpath(root, source)
+        dirs[:] = [d for d in dirs if d not in SKIPPED]
+        os.makedirs(os.path.join(output, rel), exist_ok=True)
+        for name in files:
+            if name in SKIPPED or name == MANIFEST_FILE:
+                continue
+            # Hub snapshots are symlinks into the blob store: copy the content
+            shutil.copyfile(os.path.join(root, name), os.path.join(output, rel, name))
+
+
+def convert_weights(source: str, output: str) -> None:
+    """Write model.safetensors from pytorch_model.bin (needs torch and safetensors)."""
+    import torch
+    from safetensors.torch import save_file
+    state = torch.load(os.path.join(source, "pytorch_model.bin"), map_location="cpu", weights_only=True)
+    # safetensors rejects tensors that share storage (tied weights): give each its own copy
+    save_file({name: tensor.contiguous().clone() for name, tensor in state.items()},
+              os.path.join(output, WEIGHTS_FILE), metadata={"format": "pt"})
+
+
+def write_manifest(output: str, model_id: str, revision: str) -> dict:
+    files = {}
+    for root, _, names in os.walk(output):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, output).replace(os.sep, "/")
+            if rel == MANIFEST_FILE:
+                continue
+            files[rel] = {"sha256": file_sha256(path), "bytes": os.path.getsize(path)}
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model_id": model_id,
+        "revision": revision,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "files": dict(sorted(files.items())),
+    }
+    with open(os.path.join(output, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify an offline embedding model bundle")
+    parser.add_argument("--model-id", default=get_cache_config("model_name") or "sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--revision", help="Hub commit to pin (required when downloading)")
+    parser.add_argument("--source", help="Local model directory instead of downloading")
+    parser.add_argument("--output", help="Bundle directory to write")
+    parser.add_argument("--onnx-dir", help="Also ship this export_onnx_embedding.py directory as onnx/")
+    parser.add_argument("--verify", metavar="BUNDLE", help="Only verify an existing bundle")
+    parser.add_argument("--json", help="Write the manifest summary to this JSON file")
+    args = parser.parse_args()
+
+    if args.verify:
+        try:
+            manifest = verify_bundle(args.verify, model_id=args.model_id, revision=args.revision)
+        except ModelBundleError as e:
+            print(f"FAIL: {e}")
+            sys.exit(1)
+        output = args.verify
+        print(f"OK: {manifest['model_id']} @ {manifest.get('revision')} ({len(manifest['files'])} files verified)")
+    else:
+        if not args.output:
+            parser.error("--output is required when building")
+        if args.source:
+            source = args.source
+        elif args.revision:
+            source = fetch_source(args.model_id, args.revision)
+        else:
+            parser.error("pin a --revision to download, or give a local --source")
+
+        if os.path.exists(os.path.join(args.output, MANIFEST_FILE)):
+            shutil.rmtree(args.output)  # Rebuild of an earlier bundle
+        elif os.path.isdir(args.output) and os.listdir(args.output):
+            sys.exit(f"{args.output} exists and is not a bundle; refusing to overwrite it")
+        copy_model(source, args.output)
+        if not os.path.exists(os.path.join(args.output, WEIGHTS_FILE)):
+            if not os.path.exists(os.path.join(source, "pytorch_model.bin")):
+                sys.exit(f"No {WEIGHTS_FILE} or pytorch_model.bin in {source}")
+            print("Converting pytorch_model.bin to safetensors...")
+            convert_weights(source, args.output)
+        if args.onnx_dir:
+            shutil.copytree(args.onnx_dir, os.path.join(args.output, "onnx"), dirs_exist_ok=True)
+
+        manifest = write_manifest(args.output, args.model_id, args.revision or "local")
+        output = args.output
+        print(f"Built {output}: {manifest['model_id']} @ {manifest['revision']}")
+
+    total_mb = sum(f["bytes"] for f in manifest["files"].values()) / (1024 * 1024)
+    print(f"  {len(manifest['files'])} files, {total_mb:.1f} MB")
+    print(f"  Set \"model_bundle_path\": \"{output}\" in cache_config to load it offline.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"path": output, **manifest}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Parity check: ONNX embedding backend vs the PyTorch SentenceTransformer.
+
+Encodes a question set with both backends and reports:
+- cosine between the two vectors of each question (min, mean)
+- agreement on cache decisions: for question pairs (paraphrases and
+  unrelated questions), whether both backends put the pair on the same
+  side of the similarity threshold
+
+Exits with status 1 if the minimum cosine is below --min-cosine or any
+decision flips, so it can gate switching embedding_backend to "onnx".
+
+The PyTorch vectors can be saved on a machine with torch and checked later
+where only onnxruntime is installed:
+
+Usage:
+    python check_embedding_parity.py
+    python check_embedding_parity.py --onnx-dir models/all-MiniLM-L6-v2-onnx --model-file model.onnx
+    python check_embedding_parity.py --save-reference reference.npz   # PyTorch only
+    python check_embedding_parity.py --reference reference.npz --json parity.json
+"""
+
+import sys
+import os
+import json
+import argparse
+
+import numpy as np
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.core.cache_config import get_cache_config, get_similarity_threshold
+from app.core.embedding_backend import OnnxEmbeddingBackend
+
+# (question, paraphrase or related question, should hit)
+PAIRS = [
+    ("Show all students in class tenth", "List every student in the tenth class", True),
+    ("Count the number of orders per customer", "How many orders does each customer have?", True),
+    ("What is the average salary of each department?", "Average salary by department", True),
+    ("List the top 5 products by revenue", "Top five products ranked by revenue", True),
+    ("Which employees joined after 2020?", "Employees hired after 2020", True),
+    ("Find customers who never placed an order", "Customers without any orders", True),
+    ("Total sales for every month this year", "Monthly sales totals for this year", True),
+    ("Show all users", "Display all users", True),
+    ("Show all students in class tenth", "Show all teachers in class tenth", False),
+    ("Count the number of orders per customer", "Count the number of products per category", False),
+    ("What is the average salary of each department?", "Which department has the most employees?", False),
+    ("List the top 5 products by revenue", "List the 5 cheapest products", False),
+    ("Which employees joined after 2020?", "Which customers signed up after 2020?", False),
+    ("Find customers who never placed an order", "Find orders that were never shipped", False),
+    ("Total sales for every month this year", "Delete all sales from last year", False),
+    ("Show all users", "Show all orders placed yesterday", False),
+]
+
+
+def questions() -> list:
+    seen = []
+    for first, second, _ in PAIRS:
+        for text in (first, second):
+            if text not in seen:
+                seen.append(text)
+    return seen
+
+
+def pair_similarities(vectors: dict) -> list:
+    # Both backends return L2-normalized vectors: the dot product is the cosine
+    return [float(np.dot(vectors[a], vectors[b])) for a, b, _ in PAIRS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check ONNX vs PyTorch embedding parity")
+    parser.add_argument("--model", default=get_cache_config("model_name") or "sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-dir", default=get_cache_config("embedding_onnx_dir") or "models/all-MiniLM-L6-v2-onnx")
+    parser.add_argument("--model-file", default=None, help="ONNX file in --onnx-dir (default: the config's int8 model)")
+    parser.add_argument("--threshold", type=float, default=get_similarity_threshold())
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument("--reference", help="Load PyTorch vectors from this .npz instead of running torch")
+    parser.add_argument("--save-reference", help="Only encode with PyTorch and save the vectors to this .npz")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    texts = questions()
+    if args.reference:
+        saved = np.load(args.reference)
+        if list(saved["texts"]) != texts:
+            sys.exit("Reference file was saved for a different question set")
+        reference = saved["vectors"]
+    else:
+        from sentence_transformers import SentenceTransformer
+        reference = SentenceTransformer(args.model).encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    if args.save_reference:
+        np.savez(args.save_reference, texts=np.array(texts), vectors=reference)
+        print(f"Saved {len(texts)} reference vectors to {args.save_reference}")
+        return
+
+    onnx = OnnxEmbeddingBackend(args.onnx_dir, model_file=args.model_file)
+    candidate = onnx.encode(texts)
+    if candidate.shape != reference.shape:
+        sys.exit(f"Dimension mismatch: PyTorch {reference.shape}, ONNX {candidate.shape}")
+
+    cosines = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    ref_sims = pair_similarities(dict(zip(texts, reference)))
+    onnx_sims = pair_similarities(dict(zip(texts, candidate)))
+
+    print(f"ONNX model: {os.path.join(args.onnx_dir, onnx.model_file)}")
+    print(f"Vector cosine (PyTorch vs ONNX) over {len(texts)} questions: "
+          f"min {cosines.min():.5f}, mean {cosines.mean():.5f}")
+    print(f"\n{'pytorch':>8} {'onnx':>8} {'same':>5}  pair (threshold {args.threshold})")
+    flips = 0
+    pairs = []
+    for (a, b, expected), ref_sim, onnx_sim in zip(PAIRS, ref_sims, onnx_sims):
+        same = (ref_sim >= args.threshold) == (onnx_sim >= args.threshold)
+        flips += not same
+        print(f"{ref_sim:>8.4f} {onnx_sim:>8.4f} {'yes' if same else 'NO':>5}  {a!r} / {b!r}")
+        pairs.append({"a": a, "b": b, "paraphrase": expected, "pytorch": round(ref_sim, 5), "onnx": round(onnx_sim, 5), "same_decision": same})
+    max_delta = max(abs(r - o) for r, o in zip(ref_sims, onnx_sims))
+    print(f"\nDecision agreement: {len(PAIRS) - flips}/{len(PAIRS)}; max pair similarity delta {max_delta:.5f}")
+
+    passed = bool(cosines.min() >= args.min_cosine and flips == 0)
+    print("PASS" if passed else "FAIL")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "onnx_model": os.path.join(args.onnx_dir, onnx.model_file),
+                "min_cosine": round(float(cosines.min()), 6),
+                "mean_cosine": round(float(cosines.mean()), 6),
+                "threshold": args.threshold,
+                "decision_flips": flips,
+                "max_pair_delta": round(max_delta, 6),
+                "passed": passed,
+                "pairs": pairs,
+            }, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Evaluate relevance-based schema pruning on a sample set.
+
+Builds a 24-table sample schema, prunes it for a set of questions with
+known required tables, and reports:
+- prompt-size reduction (estimated schema tokens, full vs pruned)
+- accuracy: share of questions whose pruned schema still contains every
+  table the answer needs (including join tables)
+
+Usage:
+    python evaluate_schema_pruning.py                   # embeddings + lexical (loads SentenceTransformer)
+    python evaluate_schema_pruning.py --lexical-only    # offline, no model
+    python evaluate_schema_pruning.py --top-k 4 --budget 800 --json results.json
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.schemas.payload import TableDef, ColumnDef, RelationshipDef
+from app.core.schema_pruner import SchemaPruner, estimate_tokens
+from app.core.schema_validator import format_schema_for_model
+
+# table -> (columns, {fk_column: referenced_table})
+SAMPLE_TABLES = {
+    "customers": (["id", "first_name", "last_name", "email", "city", "country", "created_at"], {}),
+    "addresses": (["id", "customer_id", "street", "city", "postal_code", "country"], {"customer_id": "customers"}),
+    "categories": (["id", "name", "parent_id"], {}),
+    "suppliers": (["id", "name", "contact_email", "country"], {}),
+    "products": (["id", "name", "category_id", "supplier_id", "price", "stock"], {"category_id": "categories", "supplier_id": "suppliers"}),
+    "orders": (["id", "customer_id", "order_date", "status", "total_amount"], {"customer_id": "customers"}),
+    "order_items": (["id", "order_id", "product_id", "quantity", "unit_price"], {"order_id": "orders", "product_id": "products"}),
+    "payments": (["id", "order_id", "amount", "method", "paid_at"], {"order_id": "orders"}),
+    "shipments": (["id", "order_id", "carrier", "shipped_at", "delivered_at"], {"order_id": "orders"}),
+    "reviews": (["id", "product_id", "customer_id", "rating", "comment", "created_at"], {"product_id": "products", "customer_id": "customers"}),
+    "coupons": (["id", "code", "discount_percent", "valid_until"], {}),
+    "warehouses": (["id", "name", "city", "capacity"], {}),
+    "inventory": (["id", "warehouse_id", "product_id", "quantity"], {"warehouse_id": "warehouses", "product_id": "products"}),
+    "departments": (["id", "name", "budget", "location"], {}),
+    "employees": (["id", "first_name", "last_name", "department_id", "salary", "hire_date", "manager_id"], {"department_id": "departments"}),
+    "salaries_history": (["id", "employee_id", "salary", "changed_at"], {"employee_id": "employees"}),
+    "projects": (["id", "name", "department_id", "start_date", "end_date"], {"department_id": "departments"}),
+    "project_assignments": (["id", "project_id", "employee_id", "role"], {"project_id": "projects", "employee_id": "employees"}),
+    "students": (["id", "name", "class", "birth_date", "email"], {}),
+    "teachers": (["id", "name", "subject", "email"], {}),
+    "courses": (["id", "title", "teacher_id", "credits"], {"teacher_id": "teachers"}),
+    "enrollments": (["id", "student_id", "course_id", "grade", "enrolled_at"], {"student_id": "students", "course_id": "courses"}),
+    "support_tickets": (["id", "customer_id", "subject", "priority", "opened_at", "closed_at"], {"customer_id": "customers"}),
+    "audit_log": (["id", "table_name", "action", "changed_by", "changed_at"], {}),
+}
+
+# (question, tables the SQL needs)
+SAMPLE_QUESTIONS = [
+    ("Show all customers from Germany", {"customers"}),
+    ("Count the number of orders per customer", {"customers", "orders"}),
+    ("List the top 5 products by revenue", {"products", "order_items"}),
+    ("What is the average salary of each department?", {"employees", "departments"}),
+    ("Which employees joined after 2020?", {"employees"}),
+    ("Find customers who never placed an order", {"customers", "orders"}),
+    ("Total payments received per payment method", {"payments"}),
+    ("Show products that are out of stock", {"products"}),
+    ("Average rating of products in each category", {"reviews", "products", "categories"}),
+    ("Which suppliers provide products priced above 100?", {"suppliers", "products"}),
+    ("List students enrolled in the course taught by teacher Smith", {"students", "enrollments", "courses", "teachers"}),
+    ("How many students are in class tenth?", {"students"}),
+    ("Orders that were shipped but not delivered yet", {"orders", "shipments"}),
+    ("Stock of each product per warehouse", {"inventory", "products", "warehouses"}),
+    ("Employees working on project Apollo", {"employees", "project_assignments", "projects"}),
+    ("Open support tickets with high priority", {"support_tickets"}),
+    ("Customers who wrote a review with rating 1", {"customers", "reviews"}),
+    ("Monthly order totals for this year", {"orders"}),
+    ("Salary changes for employee 42", {"salaries_history"}),
+    ("Which coupons expire this month?", {"coupons"}),
+]
+
+
+def build_sample_schema():
+    tables = []
+    relationships = []
+    for name, (columns, fks) in SAMPLE_TABLES.items():
+        cols = []
+        for col in columns:
+            fk_table = fks.get(col)
+            cols.append(ColumnDef(
+                name=col,
+                type="INT" if col == "id" or col.endswith("_id") else "VARCHAR(100)",
+                primaryKey=(col == "id"),
+                isForeignKey=fk_table is not None,
+                fkTable=fk_table,
+                fkColumn="id" if fk_table else None
+            ))
+            if fk_table:
+                relationships.append(RelationshipDef(
+                    from_table=name, from_column=col, to_table=fk_table, to_column="id"
+                ))
+        tables.append(TableDef(name=name, columns=cols))
+    return tables, relationships
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate schema pruning on a sample set")
+    parser.add_argument("--lexical-only", action="store_true", help="Do not load the embedding model")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--budget", type=int, default=1500, help="Token budget for the pruned schema")
+    parser.add_argument("--lexical-weight", type=float, default=0.4)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    embed = None
+    if not args.lexical_only:
+        from app.core.semantic_cache import get_semantic_cache
+        sem_cache = get_semantic_cache()
+        if not sem_cache.model:
+            print("❌ Embedding model unavailable, use --lexical-only")
+            return 1
+        embed = sem_cache._encode_batch
+
+    tables, relationships = build_sample_schema()
+    full_schema = format_schema_for_model(tables, relationships)
+    pruner = SchemaPruner(
+        top_k=args.top_k,
+        token_budget=args.budget,
+        min_tables=1,
+        lexical_weight=1.0 if args.lexical_only else args.lexical_weight,
+        embed=embed
+    )
+
+    start = time.perf_counter()
+    pruner.profile("sample", tables)
+    profile_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Schema: {len(tables)} tables, {len(relationships)} relationships, "
+          f"~{estimate_tokens(full_schema)} tokens")
+    print(f"Mode: {'lexical only' if args.lexical_only else 'embeddings + lexical'}, "
+          f"top_k={args.top_k}, budget={args.budget}")
+    print(f"Profile build: {profile_ms:.1f} ms (once per schema)\n")
+
+    rows = []
+    for question, required in SAMPLE_QUESTIONS:
+        q_embedding = embed([question])[0] if embed else None
+        start = time.perf_counter()
+        result = pruner.prune(
+            question, tables, relationships,
+            schema_hash="sample", question_embedding=q_embedding, formatted_schema=full_schema
+        )
+        prune_ms = (time.perf_counter() - start) * 1000
+        kept = {t.name for t in result.tables}
+        missing = sorted(required - kept)
+        rows.append({
+            "question": question,
+            "kept": sorted(kept),
+            "missing": missing,
+            "ok": not missing,
+            "original_tokens": result.original_tokens,
+            "pruned_tokens": result.pruned_tokens,
+            "reduction": round(result.reduction, 4),
+            "prune_ms": round(prune_ms, 3),
+        })
+        status = "✅" if not missing else f"❌ missing {missing}"
+        print(f"{status} [{len(kept):2d} tables, -{result.reduction:.0%}] {question}")
+
+    accuracy = sum(r["ok"] for r in rows) / len(rows)
+    avg_reduction = sum(r["reduction"] for r in rows) / len(rows)
+    avg_prune_ms = sum(r["prune_ms"] for r in rows) / len(rows)
+    print(f"\nAccuracy (all required tables kept): {accuracy:.0%} ({sum(r['ok'] for r in rows)}/{len(rows)})")
+    print(f"Average prompt schema reduction:     {avg_reduction:.0%}")
+    print(f"Average pruning time:                {avg_prune_ms:.2f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "mode": "lexical" if args.lexical_only else "hybrid",
+                "top_k": args.top_k,
+                "budget": args.budget,
+                "accuracy": accuracy,
+                "avg_reduction": avg_reduction,
+                "avg_prune_ms": avg_prune_ms,
+                "profile_ms": profile_ms,
+                "questions": rows,
+            }, f, indent=2)
+        print(f"Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
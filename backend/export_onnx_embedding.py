@@ -0,0 +1,129 @@
+"""
+Export the semantic cache's embedding model to ONNX with int8 quantization.
+
+Writes a directory the "onnx" embedding backend loads without network access
+or torch (embedding_onnx_dir in cache_config):
+
+    model.onnx              float32 export (input_ids, attention_mask,
+                            token_type_ids -> last_hidden_state)
+    model_quantized.onnx    dynamic int8 quantization of model.onnx
+    tokenizer.json          fast tokenizer
+    embedding_config.json   model file, pooling, max length, dimension, checksums
+
+Needs torch, transformers and onnxruntime, and the model in the local
+HuggingFace cache (or network access) at export time only.
+
+Usage:
+    python export_onnx_embedding.py
+    python export_onnx_embedding.py --model sentence-transformers/all-MiniLM-L6-v2 --output models/all-MiniLM-L6-v2-onnx
+    python export_onnx_embedding.py --no-quantize
+"""
+
+import sys
+import os
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.core.cache_config import get_cache_config
+from app.core.embedding_backend import ONNX_CONFIG_FILE
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export(model_name: str, output: str, max_seq_length: int, opset: int) -> dict:
+    """Export the transformer to output/model.onnx and save its tokenizer."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["warmup query", "a longer warmup query for the export"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            os.path.join(output, "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+    tokenizer.save_pretrained(output)
+    return {
+        "dimension": int(model.config.hidden_size),
+        "max_seq_length": min(max_seq_length, int(tokenizer.model_max_length)),
+        "pad_token": tokenizer.pad_token,
+    }
+
+
+def quantize(output: str) -> None:
+    """Dynamic int8 quantization of model.onnx (weights int8, activations quantized at run time)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantize_dynamic(
+        os.path.join(output, "model.onnx"),
+        os.path.join(output, "model_quantized.onnx"),
+        weight_type=QuantType.QInt8
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (int8)")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output", default=get_cache_config("embedding_onnx_dir") or "models/all-MiniLM-L6-v2-onnx")
+    # all-MiniLM-L6-v2's sentence-transformers config truncates at 256 tokens
+    parser.add_argument("--max-seq-length", type=int, default=256)
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no-quantize", action="store_true", help="Only write the float32 model")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    print(f"Exporting {args.model} to {args.output}...")
+    info = export(args.model, args.output, args.max_seq_length, args.opset)
+
+    model_file = "model.onnx"
+    if not args.no_quantize:
+        print("Quantizing to int8...")
+        quantize(args.output)
+        model_file = "model_quantized.onnx"
+
+    files = [name for name in ("model.onnx", "model.onnx.data", "model_quantized.onnx", "tokenizer.json")
+             if os.path.exists(os.path.join(args.output, name))]
+    config = {
+        "source_model": args.model,
+        "model_file": model_file,
+        "pooling": "mean",
+        "normalize": True,
+        **info,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "sha256": {name: file_sha256(os.path.join(args.output, name)) for name in files},
+    }
+    with open(os.path.join(args.output, ONNX_CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+
+    for name in files:
+        size_mb = os.path.getsize(os.path.join(args.output, name)) / (1024 * 1024)
+        print(f"  {name}: {size_mb:.1f} MB")
+    print(f"Done. Set \"embedding_backend\": \"onnx\" and \"embedding_onnx_dir\": \"{args.output}\" in cache_config,")
+    print("then run check_embedding_parity.py against the PyTorch model.")
+
+
+if __name__ == "__main__":
+    main()
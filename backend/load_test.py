@@ -0,0 +1,349 @@
+"""
+Load test for /api/generate and related endpoints, offline.
+
+Sends a mixed workload and reports throughput and p50/p95/p99 latency per
+request kind:
+
+    hit      /api/generate with a question that was cached during warm-up
+    miss     /api/generate with a new question over a new table (LLM call)
+    index    /api/suggest-indexes with use_llm (rules plus one LLM call)
+    history  /api/history for the load-test user
+
+LLM calls go to the replay provider (app.services.llm_provider). Without
+--recording every prompt gets a stub answer, so no network is needed. Pass
+a file recorded with LLM_PROVIDER=record to replay real answers.
+--latency and --error-rate simulate the provider.
+
+Targets:
+    (default)        the app in-process (httpx ASGI transport, lifespan included)
+    --uvicorn        spawns `uvicorn app.main:app` with LLM_PROVIDER=replay
+    --url URL        an already running server (start it with LLM_PROVIDER=replay)
+
+The database is the one in DATABASE_URL. The test registers a throwaway
+user and adds cache and history rows.
+
+Usage:
+    python load_test.py --requests 1000 --concurrency 32
+    python load_test.py --mix hit=50,miss=30,index=10,history=10 --latency lognormal:900,0.5 --error-rate 0.05
+    python load_test.py --uvicorn --workers 2 --duration 60 --json load.json
+    python load_test.py --url http://localhost:8000 --requests 500
+
+Requires httpx (pip install httpx).
+"""
+
+import sys
+import os
+import json
+import time
+import random
+import string
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+import httpx
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+BASE_TABLES = [
+    {"name": "customers", "columns": [
+        {"name": "id", "type": "INT", "primaryKey": True},
+        {"name": "name", "type": "VARCHAR(100)"},
+        {"name": "city", "type": "VARCHAR(50)"},
+        {"name": "created_at", "type": "DATE"},
+    ]},
+    {"name": "orders", "columns": [
+        {"name": "id", "type": "INT", "primaryKey": True},
+        {"name": "customer_id", "type": "INT", "isForeignKey": True, "fkTable": "customers", "fkColumn": "id"},
+        {"name": "order_date", "type": "DATE"},
+        {"name": "status", "type": "VARCHAR(20)"},
+        {"name": "total_amount", "type": "DECIMAL(10,2)"},
+    ]},
+    {"name": "products", "columns": [
+        {"name": "id", "type": "INT", "primaryKey": True},
+        {"name": "name", "type": "VARCHAR(100)"},
+        {"name": "price", "type": "DECIMAL(10,2)"},
+        {"name": "stock", "type": "INT"},
+    ]},
+    {"name": "order_items", "columns": [
+        {"name": "id", "type": "INT", "primaryKey": True},
+        {"name": "order_id", "type": "INT", "isForeignKey": True, "fkTable": "orders", "fkColumn": "id"},
+        {"name": "product_id", "type": "INT", "isForeignKey": True, "fkTable": "products", "fkColumn": "id"},
+        {"name": "quantity", "type": "INT"},
+    ]},
+]
+BASE_RELATIONSHIPS = [
+    {"from_table": "orders", "from_column": "customer_id", "to_table": "customers", "to_column": "id"},
+    {"from_table": "order_items", "from_column": "order_id", "to_table": "orders", "to_column": "id"},
+    {"from_table": "order_items", "from_column": "product_id", "to_table": "products", "to_column": "id"},
+]
+HIT_QUESTIONS = [
+    "Show all customers from Berlin",
+    "Count the number of orders per customer",
+    "List the top 5 products by revenue",
+    "Total order amount for each month",
+    "Find customers who never placed an order",
+    "Which products are out of stock?",
+    "Average order value per city",
+    "Show pending orders with their customer names",
+]
+INDEX_SQL = (
+    "SELECT c.name, SUM(o.total_amount) AS total FROM customers c "
+    "JOIN orders o ON o.customer_id = c.id WHERE o.status = 'shipped' AND o.order_date >= '2024-01-01' "
+    "GROUP BY c.name ORDER BY total DESC;"
+)
+KINDS = ("hit", "miss", "index", "history")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in spec.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Unknown request kind '{kind}' (expected {', '.join(KINDS)})")
+        mix[kind] = float(weight)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+def random_word(rng: random.Random, length: int = 8) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(values) + 0.5)))
+    return values[min(rank, len(values)) - 1]
+
+
+class Workload:
+    """Builds requests for each kind and sends them with the load-test user's token."""
+
+    def __init__(self, client: httpx.AsyncClient, rng: random.Random):
+        self.client = client
+        self.rng = rng
+        self.headers = {}
+
+    async def setup(self) -> None:
+        """Register and log in a throwaway user, then cache the hit questions."""
+        email = f"loadtest-{random_word(self.rng, 12)}@example.com"
+        password = random_word(self.rng, 16)
+        response = await self.client.post("/api/auth/register", json={"email": email, "password": password})
+        response.raise_for_status()
+        response = await self.client.post("/api/auth/login", json={"email": email, "password": password})
+        response.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        for question in HIT_QUESTIONS:
+            response = await self.generate(question, BASE_TABLES)
+            response.raise_for_status()
+
+    def generate(self, question: str, tables: List[dict]):
+        return self.client.post("/api/generate", headers=self.headers, json={
+            "question": question,
+            "tables": tables,
+            "relationships": BASE_RELATIONSHIPS,
+            "database_type": "MySQL",
+        })
+
+    async def send(self, kind: str) -> Tuple[int, bool]:
+        """Send one request; returns (status code, served from cache)."""
+        if kind == "hit":
+            response = await self.generate(self.rng.choice(HIT_QUESTIONS), BASE_TABLES)
+        elif kind == "miss":
+            # A table no earlier request has seen gives a new schema hash, so
+            # neither the exact, semantic, template nor subset layer can match
+            table = f"scratch_{random_word(self.rng)}"
+            tables = BASE_TABLES + [{"name": table, "columns": [
+                {"name": "id", "type": "INT", "primaryKey": True},
+                {"name": "label", "type": "VARCHAR(50)"},
+            ]}]
+            response = await self.generate(f"List every label in {table} containing {random_word(self.rng)}", tables)
+        elif kind == "index":
+            response = await self.client.post("/api/suggest-indexes", json={
+                "sql": INDEX_SQL, "tables": BASE_TABLES, "database_type": "MySQL", "use_llm": True
+            })
+        else:
+            response = await self.client.get("/api/history", headers=self.headers, params={"limit": 20})
+        from_cache = False
+        if kind in ("hit", "miss") and response.status_code == 200:
+            from_cache = bool(response.json().get("from_cache"))
+        return response.status_code, from_cache
+
+
+async def run_load(workload: Workload, mix: Dict[str, float], args) -> Dict[str, list]:
+    """Run the workload with args.concurrency workers; returns samples per kind."""
+    kinds, weights = zip(*mix.items())
+    samples: Dict[str, list] = {kind: [] for kind in kinds}
+    sent = 0
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    async def worker():
+        nonlocal sent
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif sent >= args.requests:
+                return
+            sent += 1
+            kind = workload.rng.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            try:
+                status, from_cache = await workload.send(kind)
+            except httpx.HTTPError as e:
+                status, from_cache = type(e).__name__, False
+            samples[kind].append(((time.perf_counter() - start) * 1000, status, from_cache))
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return samples
+
+
+def summarize(samples: Dict[str, list], elapsed: float) -> dict:
+    def stats(rows):
+        latencies = sorted(r[0] for r in rows)
+        errors = sum(1 for r in rows if not (isinstance(r[1], int) and r[1] < 400))
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "throughput_rps": round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        }
+
+    summary = {"elapsed_s": round(elapsed, 3), "overall": stats([r for rows in samples.values() for r in rows]), "kinds": {}}
+    for kind, rows in samples.items():
+        summary["kinds"][kind] = stats(rows)
+        if kind in ("hit", "miss") and rows:
+            summary["kinds"][kind]["cache_hit_ratio"] = round(sum(1 for r in rows if r[2]) / len(rows), 3)
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    print(f"\n{'kind':<9} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'cached':>7}")
+    rows = list(summary["kinds"].items()) + [("overall", summary["overall"])]
+    for kind, s in rows:
+        cached = f"{s['cache_hit_ratio']:.0%}" if "cache_hit_ratio" in s else ""
+        print(f"{kind:<9} {s['requests']:>9} {s['errors']:>7} {s['throughput_rps']:>9.1f} "
+              f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {cached:>7}")
+    print(f"\nElapsed: {summary['elapsed_s']}s")
+
+
+async def run_against(client: httpx.AsyncClient, mix: Dict[str, float], args) -> dict:
+    workload = Workload(client, random.Random(args.seed))
+    await workload.setup()
+    start = time.perf_counter()
+    samples = await run_load(workload, mix, args)
+    summary = summarize(samples, time.perf_counter() - start)
+    stats = await client.get("/api/cache/stats")
+    if stats.status_code == 200:
+        summary["server_llm_provider"] = stats.json().get("llm_provider")
+    return summary
+
+
+async def run_in_process(mix: Dict[str, float], args) -> dict:
+    from app.services.llm_provider import ReplayProvider, set_llm_provider
+    set_llm_provider(ReplayProvider(
+        path=args.recording, latency=args.latency, error_rate=args.error_rate, seed=args.seed
+    ))
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await run_against(client, mix, args)
+
+
+async def run_remote(url: str, mix: Dict[str, float], args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        return await run_against(client, mix, args)
+
+
+def spawn_uvicorn(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "replay",
+        "LLM_REPLAY_LATENCY": args.latency,
+        "LLM_REPLAY_ERROR_RATE": str(args.error_rate),
+        "LLM_REPLAY_SEED": str(args.seed),
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    # No recording: every prompt gets a stub answer
+    env["LLM_RECORDING_PATH"] = args.recording or ""
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, env=env)
+
+    url = f"http://127.0.0.1:{args.port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/api/cache/stats", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 120s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the NL2SQL API")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base URL of a running server")
+    target.add_argument("--uvicorn", action="store_true", help="Spawn a uvicorn server for the test")
+    parser.add_argument("--port", type=int, default=8765, help="Port for --uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --uvicorn")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--mix", default="hit=60,miss=20,index=10,history=10", help="Weights per request kind")
+    parser.add_argument("--recording", help="LLM recording (JSON lines) to replay")
+    parser.add_argument("--latency", default="lognormal:800,0.5", help="Simulated LLM latency spec")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Simulated LLM error rate (0-1)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per request (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Write the summary to this JSON file")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        summary = asyncio.run(run_remote(args.url.rstrip("/"), mix, args))
+        target_name = args.url
+    elif args.uvicorn:
+        process = spawn_uvicorn(args)
+        try:
+            summary = asyncio.run(run_remote(f"http://127.0.0.1:{args.port}", mix, args))
+        finally:
+            process.terminate()
+            process.wait()
+        target_name = f"uvicorn ({args.workers} workers)"
+    else:
+        summary = asyncio.run(run_in_process(mix, args))
+        target_name = "in-process"
+
+    summary["config"] = {
+        "target": target_name, "mix": mix, "concurrency": args.concurrency,
+        "requests": args.requests, "duration": args.duration, "latency": args.latency,
+        "error_rate": args.error_rate, "recording": args.recording, "seed": args.seed,
+    }
+    print(f"Target: {target_name}, concurrency {args.concurrency}, LLM latency {args.latency}, error rate {args.error_rate}")
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Measure cold-start cost: import time and time to first response.
+
+For a checkout of the backend (default: this directory) it reports:
+- import time of app.main (median of fresh interpreter runs)
+- time until a fresh uvicorn worker accepts connections
+- latency of the first /api/generate sent as soon as the worker listens,
+  and the time from process start to that response
+- time until /ready answers 200, and the first /api/generate latency
+  after that (checkouts without /ready report null)
+
+LLM calls use the replay provider's stub answers, so only the app's own
+startup work is measured. Run it against an older checkout to get before/after
+numbers:
+
+    git worktree add /tmp/nl2sql-before <commit>
+    python measure_startup.py --repo /tmp/nl2sql-before/backend --json before.json
+    python measure_startup.py --json after.json
+
+DATABASE_URL and the rest of the environment are passed through.
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Optional
+
+import httpx
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+GENERATE_BODY = {
+    "question": "Count the number of orders per customer",
+    "tables": [
+        {"name": "customers", "columns": [{"name": "id", "type": "INT", "primaryKey": True}, {"name": "name", "type": "VARCHAR(100)"}]},
+        {"name": "orders", "columns": [{"name": "id", "type": "INT", "primaryKey": True}, {"name": "customer_id", "type": "INT"}]},
+    ],
+    "relationships": [{"from_table": "orders", "from_column": "customer_id", "to_table": "customers", "to_column": "id"}],
+    "database_type": "MySQL",
+}
+
+
+def server_env() -> dict:
+    env = dict(os.environ)
+    env.update({"LLM_PROVIDER": "replay", "LLM_RECORDING_PATH": "", "LLM_REPLAY_LATENCY": "0"})
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def measure_import(repo: str, runs: int) -> float:
+    """Median import time of app.main in seconds."""
+    times = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], cwd=repo, env=server_env(),
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()
+        times.append(float(output[-1]))
+    return statistics.median(times)
+
+
+def wait_for(client: httpx.Client, path: str, process: subprocess.Popen, timeout: float) -> Optional[int]:
+    """Poll path until it answers; returns the first non-503 status, None on timeout."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            status = client.get(path).status_code
+            if status != 503:
+                return status
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def generate_ms(client: httpx.Client, question_suffix: str) -> float:
+    body = dict(GENERATE_BODY, question=f"{GENERATE_BODY['question']} {question_suffix}")
+    start = time.perf_counter()
+    # /generate accepts any bearer token and treats invalid ones as anonymous
+    response = client.post("/api/generate", json=body, headers={"Authorization": "Bearer anonymous"})
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_server(repo: str, port: int, wait_ready: bool, timeout: float) -> dict:
+    """Start one uvicorn worker and time listen, ready and the first /api/generate."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=repo, env=server_env()
+    )
+    result = {}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            if wait_for(client, "/", process, timeout) is None:
+                raise RuntimeError("Server did not start")
+            result["listen_s"] = round(time.perf_counter() - start, 3)
+
+            if wait_ready:
+                status = wait_for(client, "/ready", process, timeout)
+                result["ready_s"] = round(time.perf_counter() - start, 3) if status == 200 else None
+                result["first_generate_after_ready_ms"] = (
+                    round(generate_ms(client, "after ready"), 1) if status == 200 else None
+                )
+            else:
+                result["first_generate_ms"] = round(generate_ms(client, "at boot"), 1)
+                result["first_response_s"] = round(time.perf_counter() - start, 3)
+                result["second_generate_ms"] = round(generate_ms(client, "second"), 1)
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and time to first response")
+    parser.add_argument("--repo", default=os.getcwd(), help="Backend directory to measure")
+    parser.add_argument("--import-runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = {"repo": os.path.abspath(args.repo)}
+    results["import_app_main_s"] = round(measure_import(args.repo, args.import_runs), 3)
+    print(f"import app.main: {results['import_app_main_s']:.3f}s (median of {args.import_runs})")
+
+    at_boot = measure_server(args.repo, args.port, wait_ready=False, timeout=args.timeout)
+    results.update(at_boot)
+    print(f"listening after {at_boot['listen_s']:.3f}s")
+    print(f"first /api/generate sent at boot: {at_boot['first_generate_ms']:.1f} ms "
+          f"(response {at_boot['first_response_s']:.3f}s after start; next request {at_boot['second_generate_ms']:.1f} ms)")
+
+    after_ready = measure_server(args.repo, args.port, wait_ready=True, timeout=args.timeout)
+    results["ready_s"] = after_ready.get("ready_s")
+    results["first_generate_after_ready_ms"] = after_ready.get("first_generate_after_ready_ms")
+    if results["ready_s"] is None:
+        print("/ready: not available")
+    else:
+        print(f"/ready after {results['ready_s']:.3f}s; first /api/generate then: "
+              f"{results['first_generate_after_ready_ms']:.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Migration: make (schema_hash, database_type, question_fingerprint) unique in
+semantic_query_cache so concurrent workers cannot store duplicate entries.
+
+Run after migrate_question_fingerprint.py. Existing duplicates are merged
+into the oldest row (hit counts are summed) before the unique index is
+built concurrently; the old non-unique idx_schema_fingerprint is dropped.
+
+Usage:
+    python migrate_cache_unique_fingerprint.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not found in .env file.")
+    sys.exit(1)
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+
+
+def run_migration():
+    print("Connecting to database to deduplicate semantic_query_cache...")
+    try:
+        with engine.connect() as conn:
+            print("Merging hit counts of duplicate entries into the oldest row...")
+            conn.execute(text("""
+                UPDATE semantic_query_cache AS keep
+                SET hit_count = COALESCE(keep.hit_count, 0) + d.extra_hits,
+                    last_hit_at = GREATEST(keep.last_hit_at, d.last_hit)
+                FROM (
+                    SELECT MIN(id) AS keep_id,
+                           SUM(COALESCE(hit_count, 0)) - COALESCE(
+                               (ARRAY_AGG(COALESCE(hit_count, 0) ORDER BY id))[1], 0
+                           ) AS extra_hits,
+                           MAX(last_hit_at) AS last_hit
+                    FROM semantic_query_cache
+                    WHERE question_fingerprint IS NOT NULL
+                    GROUP BY schema_hash, database_type, question_fingerprint
+                    HAVING COUNT(*) > 1
+                ) AS d
+                WHERE keep.id = d.keep_id;
+            """))
+
+            print("Deleting duplicate entries...")
+            result = conn.execute(text("""
+                DELETE FROM semantic_query_cache AS c
+                USING semantic_query_cache AS older
+                WHERE c.question_fingerprint IS NOT NULL
+                  AND older.schema_hash = c.schema_hash
+                  AND older.database_type = c.database_type
+                  AND older.question_fingerprint = c.question_fingerprint
+                  AND older.id < c.id;
+            """))
+            conn.commit()
+            print(f"Removed {result.rowcount} duplicate rows.")
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            print("Creating unique index 'uq_schema_fingerprint'...")
+            conn.execute(text("""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_schema_fingerprint
+                ON semantic_query_cache (schema_hash, database_type, question_fingerprint);
+            """))
+            print("Dropping non-unique index 'idx_schema_fingerprint'...")
+            conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS idx_schema_fingerprint;"))
+
+        print("✅ Migration Successful!")
+    except Exception as e:
+        print(f"❌ Migration Failed: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
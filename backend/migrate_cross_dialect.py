@@ -0,0 +1,85 @@
+"""
+Online migration: store a dialect-agnostic schema hash with each
+semantic_query_cache entry, so a question cached for one dialect can be
+transpiled for another.
+
+Cache rows do not store their tables, so existing rows are backfilled only
+for schemas registered via POST /schemas. Other rows are simply not reused
+across dialects; entries stored from now on always carry the hash.
+
+Usage:
+    python migrate_cross_dialect.py [--skip-backfill]
+"""
+
+import os
+import sys
+import argparse
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from app.schemas.payload import TableDef, RelationshipDef
+from app.core.semantic_cache import SemanticCache
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not found in .env file.")
+    sys.exit(1)
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+
+
+def run_migration():
+    parser = argparse.ArgumentParser(description="Record dialect-agnostic schema hashes for cached queries")
+    parser.add_argument("--skip-backfill", action="store_true", help="Only add the column and index")
+    args = parser.parse_args()
+
+    print("Connecting to database to migrate semantic_query_cache...")
+    try:
+        with engine.connect() as conn:
+            print("Adding logical_schema_hash column and index...")
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS logical_schema_hash VARCHAR(64);"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_logical_fingerprint "
+                "ON semantic_query_cache (logical_schema_hash, question_fingerprint);"
+            ))
+            conn.commit()
+
+        if args.skip_backfill:
+            print("✅ Migration Successful! Column added, backfill skipped.")
+            return
+
+        # The embedding model loads lazily and is not needed for hashing
+        hasher = SemanticCache()
+        updated = 0
+        with engine.connect() as conn:
+            schemas = conn.execute(text(
+                "SELECT schema_hash, tables, relationships FROM registered_schemas"
+            )).fetchall()
+            for schema_hash, tables, relationships in schemas:
+                logical_hash = hasher.generate_schema_hash(
+                    [TableDef(**t) for t in tables],
+                    [RelationshipDef(**r) for r in relationships],
+                    None
+                )
+                result = conn.execute(text("""
+                    UPDATE semantic_query_cache
+                    SET logical_schema_hash = :logical_hash
+                    WHERE schema_hash = :schema_hash AND logical_schema_hash IS NULL
+                """), {"logical_hash": logical_hash, "schema_hash": schema_hash})
+                conn.commit()
+                updated += result.rowcount
+
+        print(f"✅ Migration Successful! {updated} rows from {len(schemas)} registered schemas backfilled.")
+    except Exception as e:
+        print(f"❌ Migration Failed: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,117 @@
+"""
+Online migration: move semantic_query_cache embeddings from JSON arrays to
+packed binary columns.
+
+Safe to run while the API is serving traffic: rows are converted in small
+batches, each committed on its own, and the API reads both formats until
+every row has been converted. Re-running only touches rows that still lack
+a binary embedding.
+
+Usage:
+    python migrate_embedding_blob.py [--batch-size 500] [--dtype float32|float16] [--keep-json]
+"""
+
+import os
+import sys
+import time
+import argparse
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from app.core.embedding_codec import encode_embedding, load_embedding, EMBEDDING_DTYPES
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not found in .env file.")
+    sys.exit(1)
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+
+
+def add_columns():
+    print("Checking semantic_query_cache columns...")
+    with engine.connect() as conn:
+        conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS embedding_vector BYTEA;"))
+        conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS embedding_dtype VARCHAR(10);"))
+        # New rows only write the binary column
+        conn.execute(text("ALTER TABLE semantic_query_cache ALTER COLUMN question_embedding DROP NOT NULL;"))
+        conn.commit()
+    print("Columns 'embedding_vector' and 'embedding_dtype' are present.")
+
+
+def convert_rows(batch_size: int, dtype: str, keep_json: bool, pause: float):
+    converted = 0
+    skipped = 0
+    last_id = 0
+
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT id, question_embedding
+                FROM semantic_query_cache
+                WHERE embedding_vector IS NULL AND id > :last_id
+                ORDER BY id
+                LIMIT :batch_size
+            """), {"last_id": last_id, "batch_size": batch_size}).fetchall()
+
+            if not rows:
+                break
+
+            updates = []
+            for row_id, legacy in rows:
+                vector = load_embedding(None, legacy=legacy)
+                if vector is None:
+                    skipped += 1
+                    continue
+                updates.append({
+                    "id": row_id,
+                    "blob": encode_embedding(vector, dtype),
+                    "dtype": dtype,
+                })
+
+            if updates:
+                clear_json = "" if keep_json else ", question_embedding = NULL"
+                conn.execute(text(f"""
+                    UPDATE semantic_query_cache
+                    SET embedding_vector = :blob, embedding_dtype = :dtype{clear_json}
+                    WHERE id = :id AND embedding_vector IS NULL
+                """), updates)
+            conn.commit()
+
+        last_id = rows[-1][0]
+        converted += len(updates)
+        print(f"Converted {converted} rows (last id {last_id}, skipped {skipped})...")
+
+        # Give concurrent writers room between batches
+        if pause:
+            time.sleep(pause)
+
+    return converted, skipped
+
+
+def run_migration():
+    parser = argparse.ArgumentParser(description="Convert JSON embeddings to binary storage")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dtype", choices=sorted(EMBEDDING_DTYPES), default="float32")
+    parser.add_argument("--keep-json", action="store_true", help="Keep the legacy JSON column populated")
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+
+    print("Connecting to database to migrate semantic_query_cache embeddings...")
+    try:
+        add_columns()
+        converted, skipped = convert_rows(args.batch_size, args.dtype, args.keep_json, args.pause)
+        print(f"✅ Migration Successful! {converted} rows converted, {skipped} rows without a usable embedding.")
+    except Exception as e:
+        print(f"❌ Migration Failed: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,94 @@
+"""
+Online migration: add and backfill semantic_query_cache.question_fingerprint.
+
+The fingerprint backs the exact-match fast path in /api/generate. Rows are
+backfilled in small committed batches so the API can keep serving; rows
+without a fingerprint simply fall through to the semantic lookup until
+they are converted.
+
+Usage:
+    python migrate_question_fingerprint.py [--batch-size 1000]
+"""
+
+import os
+import sys
+import argparse
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from app.core.semantic_cache import SemanticCache
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not found in .env file.")
+    sys.exit(1)
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+
+
+def run_migration():
+    parser = argparse.ArgumentParser(description="Backfill question fingerprints")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Only the normalization helpers are used; the embedding model is never loaded
+    cache = SemanticCache()
+
+    print("Connecting to database to migrate semantic_query_cache...")
+    try:
+        with engine.connect() as conn:
+            print("Adding 'question_fingerprint' column...")
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS question_fingerprint VARCHAR(64);"))
+            conn.commit()
+
+        backfilled = 0
+        last_id = 0
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(text("""
+                    SELECT id, question
+                    FROM semantic_query_cache
+                    WHERE question_fingerprint IS NULL AND id > :last_id
+                    ORDER BY id
+                    LIMIT :batch_size
+                """), {"last_id": last_id, "batch_size": args.batch_size}).fetchall()
+
+                if not rows:
+                    break
+
+                conn.execute(text("""
+                    UPDATE semantic_query_cache
+                    SET question_fingerprint = :fingerprint
+                    WHERE id = :id
+                """), [
+                    {"id": row_id, "fingerprint": cache.generate_question_fingerprint(question)}
+                    for row_id, question in rows
+                ])
+                conn.commit()
+
+            last_id = rows[-1][0]
+            backfilled += len(rows)
+            print(f"Backfilled {backfilled} rows (last id {last_id})...")
+
+        print("Creating index for 'question_fingerprint'...")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # CONCURRENTLY avoids blocking writes while the index builds
+            conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schema_fingerprint
+                ON semantic_query_cache (schema_hash, database_type, question_fingerprint);
+            """))
+
+        print(f"✅ Migration Successful! {backfilled} rows backfilled.")
+    except Exception as e:
+        print(f"❌ Migration Failed: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
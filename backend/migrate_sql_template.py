@@ -0,0 +1,106 @@
+"""
+Online migration: store a parameterized SQL template with each
+semantic_query_cache entry.
+
+Entries with a template can serve questions that differ only in literal
+values ("class tenth" vs "class twelfth") without an LLM call. Rows are
+backfilled in small committed batches; rows without a template are simply
+not used as templates, so the API keeps working throughout.
+
+Usage:
+    python migrate_sql_template.py [--batch-size 500] [--skip-backfill]
+"""
+
+import os
+import sys
+import json
+import argparse
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from app.core.sql_template import build_template
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not found in .env file.")
+    sys.exit(1)
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+
+
+def run_migration():
+    parser = argparse.ArgumentParser(description="Build SQL templates for cached queries")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--skip-backfill", action="store_true", help="Only add the columns")
+    args = parser.parse_args()
+
+    print("Connecting to database to migrate semantic_query_cache...")
+    try:
+        with engine.connect() as conn:
+            print("Adding template columns...")
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS sql_template TEXT;"))
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS question_pattern JSON;"))
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS template_slots JSON;"))
+            conn.commit()
+
+        if args.skip_backfill:
+            print("✅ Migration Successful! Columns added, backfill skipped.")
+            return
+
+        scanned = 0
+        templated = 0
+        last_id = 0
+        while True:
+            with engine.connect() as conn:
+                # Only entries known to be valid are used as templates
+                rows = conn.execute(text("""
+                    SELECT id, question, sql_generated, database_type
+                    FROM semantic_query_cache
+                    WHERE sql_template IS NULL AND sql_valid IS NOT FALSE AND id > :last_id
+                    ORDER BY id
+                    LIMIT :batch_size
+                """), {"last_id": last_id, "batch_size": args.batch_size}).fetchall()
+
+                if not rows:
+                    break
+
+                updates = []
+                for row_id, question, sql, database_type in rows:
+                    template = build_template(sql, question, database_type)
+                    if template is not None:
+                        updates.append({
+                            "id": row_id,
+                            "template": template.sql,
+                            "pattern": json.dumps(template.pattern),
+                            "slots": json.dumps(template.slots),
+                        })
+
+                if updates:
+                    conn.execute(text("""
+                        UPDATE semantic_query_cache
+                        SET sql_template = :template,
+                            question_pattern = CAST(:pattern AS JSON),
+                            template_slots = CAST(:slots AS JSON)
+                        WHERE id = :id
+                    """), updates)
+                    conn.commit()
+
+            last_id = rows[-1][0]
+            scanned += len(rows)
+            templated += len(updates)
+            print(f"Scanned {scanned} rows, {templated} templates (last id {last_id})...")
+
+        print(f"✅ Migration Successful! {templated} of {scanned} rows have a template.")
+    except Exception as e:
+        print(f"❌ Migration Failed: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,98 @@
+"""
+Online migration: store the validation verdict with each
+semantic_query_cache entry.
+
+Cache hits on entries with a recorded verdict skip sqlglot parsing. Rows are
+backfilled in small committed batches; rows not yet backfilled are still
+validated on hit (memoized per worker), so the API keeps working throughout.
+
+Usage:
+    python migrate_sql_validation.py [--batch-size 500] [--skip-backfill]
+"""
+
+import os
+import sys
+import argparse
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from app.core.security import validate_sql
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not found in .env file.")
+    sys.exit(1)
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+
+
+def run_migration():
+    parser = argparse.ArgumentParser(description="Record SQL validation verdicts for cached queries")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--skip-backfill", action="store_true", help="Only add the columns")
+    args = parser.parse_args()
+
+    print("Connecting to database to migrate semantic_query_cache...")
+    try:
+        with engine.connect() as conn:
+            print("Adding validation columns...")
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS sql_valid BOOLEAN;"))
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS sql_validation_message VARCHAR(500);"))
+            # Written by earlier versions of this migration but never read
+            conn.execute(text("ALTER TABLE semantic_query_cache DROP COLUMN IF EXISTS sql_canonical;"))
+            conn.commit()
+
+        if args.skip_backfill:
+            print("✅ Migration Successful! Columns added, backfill skipped.")
+            return
+
+        backfilled = 0
+        last_id = 0
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(text("""
+                    SELECT id, sql_generated, database_type
+                    FROM semantic_query_cache
+                    WHERE sql_valid IS NULL AND id > :last_id
+                    ORDER BY id
+                    LIMIT :batch_size
+                """), {"last_id": last_id, "batch_size": args.batch_size}).fetchall()
+
+                if not rows:
+                    break
+
+                updates = []
+                for row_id, sql, database_type in rows:
+                    is_valid, message = validate_sql(sql, dialect=database_type)
+                    updates.append({
+                        "id": row_id,
+                        "valid": is_valid,
+                        "message": message[:500],
+                    })
+
+                conn.execute(text("""
+                    UPDATE semantic_query_cache
+                    SET sql_valid = :valid,
+                        sql_validation_message = :message
+                    WHERE id = :id
+                """), updates)
+                conn.commit()
+
+            last_id = rows[-1][0]
+            backfilled += len(rows)
+            print(f"Backfilled {backfilled} rows (last id {last_id})...")
+
+        print(f"✅ Migration Successful! {backfilled} rows backfilled.")
+    except Exception as e:
+        print(f"❌ Migration Failed: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
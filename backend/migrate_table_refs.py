@@ -0,0 +1,104 @@
+"""
+Online migration: record which schema tables each semantic_query_cache
+entry's SQL references (table-subset cache keys).
+
+Entries with recorded references keep matching after edits to tables they
+do not use. Cache rows do not store their tables, so existing rows are
+backfilled only for schemas registered via POST /schemas; other rows keep
+matching their exact schema hash as before.
+
+Usage:
+    python migrate_table_refs.py [--skip-backfill]
+"""
+
+import os
+import sys
+import argparse
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from app.schemas.payload import TableDef
+from app.core.schema_subset import referenced_table_fingerprints
+
+# Load environment variables
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+if not DATABASE_URL:
+    print("Error: DATABASE_URL not found in .env file.")
+    sys.exit(1)
+
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+engine = create_engine(DATABASE_URL)
+
+
+def run_migration():
+    parser = argparse.ArgumentParser(description="Record referenced tables for cached queries")
+    parser.add_argument("--skip-backfill", action="store_true", help="Only create the table and column")
+    args = parser.parse_args()
+
+    print("Connecting to database to migrate semantic_query_cache...")
+    try:
+        with engine.connect() as conn:
+            print("Creating semantic_cache_table_refs and table_ref_count...")
+            conn.execute(text("ALTER TABLE semantic_query_cache ADD COLUMN IF NOT EXISTS table_ref_count INTEGER;"))
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS semantic_cache_table_refs (
+                    entry_id INTEGER NOT NULL REFERENCES semantic_query_cache(id) ON DELETE CASCADE,
+                    table_fingerprint VARCHAR(64) NOT NULL,
+                    PRIMARY KEY (entry_id, table_fingerprint)
+                );
+            """))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_table_ref_fingerprint "
+                "ON semantic_cache_table_refs (table_fingerprint, entry_id);"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_question_fingerprint "
+                "ON semantic_query_cache (question_fingerprint);"
+            ))
+            conn.commit()
+
+        if args.skip_backfill:
+            print("✅ Migration Successful! Table created, backfill skipped.")
+            return
+
+        backfilled = 0
+        with engine.connect() as conn:
+            schemas = conn.execute(text(
+                "SELECT schema_hash, tables FROM registered_schemas"
+            )).fetchall()
+            for schema_hash, tables in schemas:
+                tables = [TableDef(**t) for t in tables]
+                rows = conn.execute(text("""
+                    SELECT id, sql_generated, database_type
+                    FROM semantic_query_cache
+                    WHERE schema_hash = :schema_hash AND table_ref_count IS NULL
+                """), {"schema_hash": schema_hash}).fetchall()
+
+                for row_id, sql, database_type in rows:
+                    refs = referenced_table_fingerprints(sql, tables, database_type)
+                    if not refs:
+                        continue
+                    conn.execute(text("""
+                        INSERT INTO semantic_cache_table_refs (entry_id, table_fingerprint)
+                        VALUES (:entry_id, :fingerprint)
+                        ON CONFLICT DO NOTHING
+                    """), [{"entry_id": row_id, "fingerprint": fp} for fp in refs])
+                    conn.execute(text(
+                        "UPDATE semantic_query_cache SET table_ref_count = :count WHERE id = :id"
+                    ), {"count": len(refs), "id": row_id})
+                    backfilled += 1
+                conn.commit()
+                print(f"Backfilled {backfilled} rows (schema {schema_hash[:12]})...")
+
+        print(f"✅ Migration Successful! {backfilled} rows from {len(schemas)} registered schemas backfilled.")
+    except Exception as e:
+        print(f"❌ Migration Failed: {e}")
+
+
+if __name__ == "__main__":
+    run_migration()
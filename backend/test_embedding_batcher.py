@@ -0,0 +1,66 @@
+import sys
+import os
+import asyncio
+import threading
+
+import numpy as np
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.core.embedding_batcher import EmbeddingBatcher
+
+
+def make_batcher(release: threading.Event, started: threading.Event) -> EmbeddingBatcher:
+    def encode_batch(texts):
+        started.set()
+        release.wait(5)
+        return [np.full(4, len(text), dtype=np.float32) for text in texts]
+    return EmbeddingBatcher(encode_batch, max_batch_size=8, max_wait_ms=50)
+
+
+def test_cancelled_caller_in_batch():
+    """A caller cancelled mid-batch must not stop the others (or the worker)."""
+    release, started = threading.Event(), threading.Event()
+    batcher = make_batcher(release, started)
+
+    async def scenario():
+        first = asyncio.ensure_future(batcher.encode_async("a"))
+        second = asyncio.ensure_future(batcher.encode_async("bb"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        first.cancel()
+        release.set()
+        vector = await asyncio.wait_for(second, 5)
+        assert first.cancelled()
+        assert vector[0] == 2
+        # The worker is still alive and serves later callers
+        return await asyncio.wait_for(batcher.encode_async("ccc"), 5)
+
+    assert asyncio.run(scenario())[0] == 3
+    print("PASS: cancelled caller in a running batch")
+
+
+def test_cancelled_caller_while_queued():
+    """A caller cancelled before its batch starts is dropped from the batch."""
+    release, started = threading.Event(), threading.Event()
+    batcher = make_batcher(release, started)
+
+    async def scenario():
+        blocker = asyncio.ensure_future(batcher.encode_async("x"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        queued = asyncio.ensure_future(batcher.encode_async("dropped"))
+        kept = asyncio.ensure_future(batcher.encode_async("kept"))
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        release.set()
+        await asyncio.wait_for(blocker, 5)
+        return await asyncio.wait_for(kept, 5)
+
+    assert asyncio.run(scenario())[0] == 4
+    assert batcher.snapshot()["items"] == 2
+    print("PASS: cancelled caller while queued")
+
+
+if __name__ == "__main__":
+    test_cancelled_caller_in_batch()
+    test_cancelled_caller_while_queued()
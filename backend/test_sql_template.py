@@ -0,0 +1,46 @@
+import sys
+import os
+
+# Add the current directory to sys.path so we can import app modules
+sys.path.append(os.getcwd())
+
+from app.core.sql_template import build_template, fill_template
+
+
+def fill(cached_sql: str, cached_question: str, question: str):
+    template = build_template(cached_sql, cached_question)
+    if template is None:
+        return None
+    return fill_template(template.sql, template.pattern, template.slots, question)
+
+
+def test_repeated_number_is_not_a_slot():
+    """A value that appears twice can't be aligned by position, so no slot is made."""
+    sql = "SELECT * FROM users WHERE age > 30 LIMIT 30"
+    assert fill(sql, "users older than 30, first 30", "users older than 60, first 5") is None
+    # The same value twice in the SQL (once in the question) is just as ambiguous
+    sql = "SELECT * FROM users WHERE age >= 30 AND age <= 30"
+    assert fill(sql, "users aged 30", "users aged 40") is None
+    print("PASS: repeated numbers are not templated")
+
+
+def test_repeated_string_is_not_a_slot():
+    sql = "SELECT * FROM people WHERE city = 'Paris' AND birthplace = 'Paris'"
+    assert fill(sql, "people living in Paris born in Paris", "people living in Rome born in Oslo") is None
+    print("PASS: repeated strings are not templated")
+
+
+def test_distinct_values_still_fill():
+    sql = "SELECT * FROM users WHERE age > 30 LIMIT 10"
+    assert fill(sql, "users older than 30, first 10", "users older than 60, first 5") == \
+        "SELECT * FROM users WHERE age > 60 LIMIT 5;"
+    sql = "SELECT * FROM students WHERE class = 'tenth'"
+    assert fill(sql, "Show all students in class tenth", "Show all students in class twelfth") == \
+        "SELECT * FROM students WHERE class = 'twelfth';"
+    print("PASS: distinct values are filled")
+
+
+if __name__ == "__main__":
+    test_repeated_number_is_not_a_slot()
+    test_repeated_string_is_not_a_slot()
+    test_distinct_values_still_fill()